@@ -1,5 +1,62 @@
 #!/bin/sh
 set -ex
 
-# We clean the lock files and temp files that could prevent correct startup
-rm -rfv /data/ipfs/repo.lock /data/ipfs/datastore/LOCK /data/ipfs/blocks/.temp /data/ipfs/datastore/LOG
+# The entrypoint holds the repo lease (repo-lease.sh): the lock files that
+# could prevent correct startup were left by a task that is gone
+/usr/local/bin/repo-lease.sh clean_locks
+
+# Partial block writes of a crashed task are set aside and removed once the
+# daemon is up. The LevelDB files are kept: LevelDB replays its own logs.
+if [ -d /data/ipfs/blocks/.temp ]; then
+    mv /data/ipfs/blocks/.temp "/data/ipfs/blocks/.temp.stale.$(date +%s)"
+fi
+
+# The flatfs blocks live in ${IPFS_PATH}/blocks on EFS. With the block
+# cache enabled, the blockcache datastore of the Kubo image (blockcache/)
+# wraps the flatfs datastore: blocks are written to EFS only and the
+# recently read ones are also kept on the task ephemeral storage.
+_flatfs="{
+    \"path\": \"blocks\",
+    \"shardFunc\": \"/repo/flatfs/shard/v1/next-to-last/2\",
+    \"sync\": true,
+    \"type\": \"flatfs\"
+}"
+if [ "${KUBO_BLOCK_CACHE}" = "true" ]; then
+    _blocks="{
+        \"child\": ${_flatfs},
+        \"path\": \"${KUBO_BLOCK_CACHE_PATH:-/data/ipfs-cache}\",
+        \"sizeGiB\": ${KUBO_BLOCK_CACHE_SIZE_GIB:-20},
+        \"type\": \"blockcache\"
+    }"
+else
+    _blocks="${_flatfs}"
+fi
+
+# Only the default flatfs datastore is updated. The block cache is not part
+# of the datastore_spec: it can be turned on and off on the same repo.
+if grep -q '"type":"flatfs"' ${IPFS_PATH}/datastore_spec; then
+    ipfs config --json Datastore.Spec "{
+        \"mounts\": [
+            {
+                \"child\": ${_blocks},
+                \"mountpoint\": \"/blocks\",
+                \"prefix\": \"flatfs.datastore\",
+                \"type\": \"measure\"
+            },
+            {
+                \"child\": {
+                    \"compression\": \"none\",
+                    \"path\": \"datastore\",
+                    \"type\": \"levelds\"
+                },
+                \"mountpoint\": \"/\",
+                \"prefix\": \"leveldb.datastore\",
+                \"type\": \"measure\"
+            }
+        ],
+        \"type\": \"mount\"
+    }"
+
+    # We override the ${IPFS_PATH}/datastore_spec file
+    echo "{\"mounts\":[{\"mountpoint\":\"/blocks\",\"path\":\"blocks\",\"shardFunc\":\"/repo/flatfs/shard/v1/next-to-last/2\",\"type\":\"flatfs\"},{\"mountpoint\":\"/\",\"path\":\"datastore\",\"type\":\"levelds\"}],\"type\":\"mount\"}" > ${IPFS_PATH}/datastore_spec
+fi
@@ -3,16 +3,24 @@ set -ex
 
 echo "IPFS PATH: ${IPFS_PATH}"
 
+# S3 datastore tuning, see docker/README.md
+# Number of parallel S3 requests of the go-ds-s3 plugin
+CLUSTER_S3_WORKERS=${CLUSTER_S3_WORKERS:-100}
+# S3 key layout: default, suffix or next-to-last/2
+# next-to-last/2 spreads the blocks over 1024 prefixes to avoid per-prefix
+# throttling. Changing it makes the blocks already in the bucket unreachable.
+CLUSTER_S3_KEY_TRANSFORM=${CLUSTER_S3_KEY_TRANSFORM:-default}
+# Custom S3 endpoint, e.g. a MinIO server
+CLUSTER_S3_REGION_ENDPOINT=${CLUSTER_S3_REGION_ENDPOINT:-}
+
 # We backup old config file
 cp ${IPFS_PATH}/config ${IPFS_PATH}/config_bak
 
-# We inject ResourceMgr JSON object in IPFS config
-# See: https://github.com/ipfs/kubo/blob/master/docs/config.md#swarmresourcemgr
-# We also inject the S3 plugin datastore
+# We inject the S3 plugin datastore
+# The resource manager, connection manager and bloom filter are sized
+# from the task resources by 002-config_resources.sh
 # Important: Make sure your fill out the optionnal parameters $CLUSTER_S3_BUCKET, $CLUSTER_AWS_KEY, $CLUSTER_AWS_SECRET in the cloudformation parameters
 cat ${IPFS_PATH}/config_bak | \
-jq ".Swarm.ResourceMgr = {}" | \
-jq ".Swarm.ConnMgr = {}" | \
 jq ".Datastore.Spec = { 
     mounts: [
         {
@@ -22,7 +30,10 @@ jq ".Datastore.Spec = {
             bucket: \"${CLUSTER_S3_BUCKET}\",
             rootDirectory: \"${CLUSTER_PEERNAME}\",
             accessKey: \"${CLUSTER_AWS_KEY}\",
-            secretKey: \"${CLUSTER_AWS_SECRET}\"
+            secretKey: \"${CLUSTER_AWS_SECRET}\",
+            regionEndpoint: \"${CLUSTER_S3_REGION_ENDPOINT}\",
+            workers: ${CLUSTER_S3_WORKERS},
+            keyTransform: \"${CLUSTER_S3_KEY_TRANSFORM}\"
           },
           mountpoint: \"/blocks\",
           prefix: \"s3.datastore\",
@@ -0,0 +1,67 @@
+#!/bin/sh
+set -ex
+
+# We size the Kubo resource manager, connection manager, bloom filter and
+# reprovider from the Fargate task resources given to the Kubo container.
+# The CDK stack sets KUBO_TASK_CPU (cpu units) and KUBO_MEMORY_MIB.
+# Every value can be overridden with the KUBO_* variables below.
+# See: https://github.com/ipfs/kubo/blob/master/docs/config.md
+KUBO_TASK_CPU=${KUBO_TASK_CPU:-1024}
+KUBO_MEMORY_MIB=${KUBO_MEMORY_MIB:-2048}
+
+# Leave a quarter of the memory to the Go runtime, the blockstore caches
+# and the page cache
+KUBO_RESOURCEMGR_MAX_MEMORY=${KUBO_RESOURCEMGR_MAX_MEMORY:-$(( KUBO_MEMORY_MIB * 3 / 4 ))MiB}
+
+# 4 file descriptors per MiB, at most half of the open files limit
+_nofile=$(ulimit -n)
+_max_fds=$(( KUBO_MEMORY_MIB * 4 ))
+if [ "${_nofile}" != "unlimited" ] && [ ${_max_fds} -gt $(( _nofile / 2 )) ]; then
+    _max_fds=$(( _nofile / 2 ))
+fi
+KUBO_RESOURCEMGR_MAX_FDS=${KUBO_RESOURCEMGR_MAX_FDS:-${_max_fds}}
+
+# 96 connections (the Kubo default) per vCPU and per 2 GiB, whichever is lower
+_high_water=$(( KUBO_TASK_CPU * 96 / 1024 ))
+if [ ${_high_water} -gt $(( KUBO_MEMORY_MIB * 96 / 2048 )) ]; then
+    _high_water=$(( KUBO_MEMORY_MIB * 96 / 2048 ))
+fi
+if [ ${_high_water} -lt 96 ]; then
+    _high_water=96
+fi
+KUBO_CONNMGR_HIGH_WATER=${KUBO_CONNMGR_HIGH_WATER:-${_high_water}}
+KUBO_CONNMGR_LOW_WATER=${KUBO_CONNMGR_LOW_WATER:-$(( KUBO_CONNMGR_HIGH_WATER / 3 ))}
+KUBO_CONNMGR_GRACE_PERIOD=${KUBO_CONNMGR_GRACE_PERIOD:-20s}
+
+# 1 MiB of bloom filter per GiB of memory (~800k blocks per MiB)
+KUBO_BLOOM_FILTER_SIZE=${KUBO_BLOOM_FILTER_SIZE:-$(( KUBO_MEMORY_MIB * 1024 ))}
+
+# The accelerated DHT client (KUBO_ACCELERATED_DHT_CLIENT=true) reprovides
+# large pinsets within the reprovide interval, see ipfs_cluster/routing.py
+# for the task size it needs
+KUBO_ACCELERATED_DHT_CLIENT=${KUBO_ACCELERATED_DHT_CLIENT:-false}
+
+# Small tasks only announce the pin roots
+if [ ${KUBO_MEMORY_MIB} -lt 4096 ]; then
+    KUBO_REPROVIDER_STRATEGY=${KUBO_REPROVIDER_STRATEGY:-roots}
+else
+    KUBO_REPROVIDER_STRATEGY=${KUBO_REPROVIDER_STRATEGY:-pinned}
+fi
+
+ipfs config --json Swarm.ResourceMgr.Enabled true
+ipfs config Swarm.ResourceMgr.MaxMemory "${KUBO_RESOURCEMGR_MAX_MEMORY}"
+ipfs config --json Swarm.ResourceMgr.MaxFileDescriptors "${KUBO_RESOURCEMGR_MAX_FDS}"
+
+ipfs config Swarm.ConnMgr.Type basic
+ipfs config --json Swarm.ConnMgr.LowWater "${KUBO_CONNMGR_LOW_WATER}"
+ipfs config --json Swarm.ConnMgr.HighWater "${KUBO_CONNMGR_HIGH_WATER}"
+ipfs config Swarm.ConnMgr.GracePeriod "${KUBO_CONNMGR_GRACE_PERIOD}"
+
+ipfs config --json Datastore.BloomFilterSize "${KUBO_BLOOM_FILTER_SIZE}"
+ipfs config Reprovider.Strategy "${KUBO_REPROVIDER_STRATEGY}"
+ipfs config --json Routing.AcceleratedDHTClient "${KUBO_ACCELERATED_DHT_CLIENT}"
+
+# StorageMax is only used by the repo garbage collector
+if [ -n "${KUBO_STORAGE_MAX}" ]; then
+    ipfs config Datastore.StorageMax "${KUBO_STORAGE_MAX}"
+fi
@@ -0,0 +1,75 @@
+#!/bin/sh
+set -ex
+
+# We configure the swarm transports from KUBO_SWARM_TRANSPORTS, set by the
+# CDK stack: tcp, quic and webtransport. They all listen on port 4001,
+# TCP or UDP. QUIC and WebTransport connect in one round-trip.
+# See: https://github.com/ipfs/kubo/blob/master/docs/config.md#swarmtransports
+KUBO_SWARM_TRANSPORTS=${KUBO_SWARM_TRANSPORTS:-tcp}
+KUBO_SWARM_PORT=${KUBO_SWARM_PORT:-4001}
+
+_has_transport() {
+    case ",${KUBO_SWARM_TRANSPORTS}," in
+        *",$1,"*) return 0 ;;
+    esac
+    return 1
+}
+
+# Multiaddr suffixes of the enabled transports on a port
+_quic=false
+_webtransport=false
+_has_transport quic && _quic=true
+_has_transport webtransport && _webtransport=true
+
+_suffixes() {
+    echo "tcp/$1"
+    if [ "${_quic}" = "true" ]; then
+        echo "udp/$1/quic-v1"
+    fi
+    if [ "${_webtransport}" = "true" ]; then
+        echo "udp/$1/quic-v1/webtransport"
+    fi
+}
+
+# JSON list of the multiaddrs of the prefixes ($1) on a port ($2)
+_addresses() {
+    _list=""
+    for _prefix in $1; do
+        for _suffix in $(_suffixes "$2"); do
+            _list="${_list:+${_list}, }\"${_prefix}/${_suffix}\""
+        done
+    done
+    echo "[${_list}]"
+}
+
+ipfs config --json Addresses.Swarm "$(_addresses '/ip4/0.0.0.0 /ip6/::' "${KUBO_SWARM_PORT}")"
+ipfs config --json Swarm.Transports.Network.QUIC "${_quic}"
+ipfs config --json Swarm.Transports.Network.WebTransport "${_webtransport}"
+
+# Tasks in private subnets are reached through the listener of the swarm
+# load balancer set by the CDK stack (KUBO_SWARM_ANNOUNCE_HOST and _PORT).
+# Tasks in public subnets listen on their private IP, the public IP is
+# mapped to it by the VPC. We announce these addresses right away instead
+# of waiting for AutoNAT to confirm the addresses observed by the other
+# peers. Kubo adds the certificate hashes to the WebTransport addresses.
+if [ -n "${KUBO_SWARM_ANNOUNCE_HOST}" ]; then
+    _announce_prefix="/dns4/${KUBO_SWARM_ANNOUNCE_HOST}"
+    _announce_port="${KUBO_SWARM_ANNOUNCE_PORT:-${KUBO_SWARM_PORT}}"
+else
+    _public_ip="${KUBO_SWARM_PUBLIC_IP}"
+    if [ -z "${_public_ip}" ] && [ "${KUBO_SWARM_ANNOUNCE_PUBLIC_IP}" = "true" ]; then
+        _public_ip=$(wget -q -T 5 -O - \
+            "${KUBO_SWARM_PUBLIC_IP_URL:-http://checkip.amazonaws.com}" \
+            | tr -d '[:space:]') || _public_ip=""
+    fi
+    if echo "${_public_ip}" | grep -Eq '^[0-9]{1,3}(\.[0-9]{1,3}){3}$'; then
+        _announce_prefix="/ip4/${_public_ip}"
+        _announce_port="${KUBO_SWARM_PORT}"
+    fi
+fi
+
+if [ -n "${_announce_prefix}" ]; then
+    ipfs config --json Addresses.AppendAnnounce "$(_addresses "${_announce_prefix}" "${_announce_port}")"
+else
+    ipfs config --json Addresses.AppendAnnounce "[]"
+fi
@@ -0,0 +1,43 @@
+#!/bin/sh
+set -ex
+
+# The gateway replicas (GATEWAY_TIER) peer with the Kubo nodes of the
+# cluster peers, so bitswap asks them for the content first and the
+# connections are kept open. The CDK stack sets KUBO_PEERING_HOSTS to the
+# Cloud Map names of the nodes. Kubo peering needs the peer ID of each
+# node: it is read from its RPC API (port 5001, open to the VPC). The
+# nodes that do not answer within KUBO_PEERING_TIMEOUT_SECONDS are left
+# out until the next start of the task.
+# See: https://github.com/ipfs/kubo/blob/master/docs/config.md#peering
+KUBO_PEERING_TIMEOUT_SECONDS=${KUBO_PEERING_TIMEOUT_SECONDS:-30}
+KUBO_PEERING_RPC_PORT=${KUBO_PEERING_RPC_PORT:-5001}
+KUBO_SWARM_PORT=${KUBO_SWARM_PORT:-4001}
+
+# The server profile (IPFS_PROFILE=server) filters out the private
+# ranges. The CDK stack sets KUBO_SWARM_ADDR_FILTERS to the same filters
+# without the VPC CIDR, the nodes are dialed on their private IPs.
+if [ -n "${KUBO_SWARM_ADDR_FILTERS}" ]; then
+    ipfs config --json Swarm.AddrFilters "${KUBO_SWARM_ADDR_FILTERS}"
+fi
+
+if [ -n "${KUBO_PEERING_HOSTS}" ]; then
+    _deadline=$(( $(date +%s) + KUBO_PEERING_TIMEOUT_SECONDS ))
+    _peers=""
+    for _host in $(echo "${KUBO_PEERING_HOSTS}" | tr ',' ' '); do
+        while true; do
+            _id=$(wget -q -T 5 -O - --post-data '' \
+                "http://${_host}:${KUBO_PEERING_RPC_PORT}/api/v0/id" \
+                | grep -o '"ID": *"[^"]*"' | head -n 1 | cut -d '"' -f 4) || _id=""
+            if [ -n "${_id}" ] || [ "$(date +%s)" -ge ${_deadline} ]; then
+                break
+            fi
+            sleep 2
+        done
+        if [ -n "${_id}" ]; then
+            _peers="${_peers:+${_peers}, }{\"ID\": \"${_id}\", \"Addrs\": [\"/dns4/${_host}/tcp/${KUBO_SWARM_PORT}\"]}"
+        else
+            echo "No peer ID for ${_host}, not peering with it"
+        fi
+    done
+    ipfs config --json Peering.Peers "[${_peers}]"
+fi
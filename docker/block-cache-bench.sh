@@ -0,0 +1,59 @@
+#!/bin/sh
+# Cold vs warm block read latency through the Kubo blockcache datastore.
+#
+# Adds BLOCKS raw blocks of BLOCK_KIB KiB to the running Kubo node, then
+# reads all of them twice through the node: cold (from the flatfs blocks,
+# the cache only keeps the blocks read) and warm (from the cache
+# directory). Kubo keeps no block data in memory, both passes go to the
+# datastore.
+#
+# Run it in a container of the Dockerfile_efs image with the repo on an
+# EFS or NFS mount, once with KUBO_BLOCK_CACHE=true and once without to
+# compare with plain flatfs reads:
+#
+#   docker cp block-cache-bench.sh <container>:/tmp/
+#   docker exec <container> sh /tmp/block-cache-bench.sh 2000 256
+#
+# Usage: block-cache-bench.sh [blocks] [block KiB]
+set -e
+
+BLOCKS=${1:-2000}
+BLOCK_KIB=${2:-256}
+WORKDIR=$(mktemp -d)
+
+now_ms(){
+    echo $(( $(date +%s%N) / 1000000 ))
+}
+
+# Read every block of the directory and print the average latency per
+# block in microseconds
+read_blocks(){
+    _start=$(now_ms)
+    ipfs get -o "${WORKDIR}/get" "$1" > /dev/null
+    rm -rf "${WORKDIR}/get"
+    echo $(( ($(now_ms) - _start) * 1000 / BLOCKS ))
+}
+
+mkdir -p "${WORKDIR}/blocks"
+_i=0
+while [ ${_i} -lt ${BLOCKS} ]; do
+    head -c $(( BLOCK_KIB * 1024 )) /dev/urandom > "${WORKDIR}/blocks/${_i}"
+    _i=$(( _i + 1 ))
+done
+# One raw leaf per file, the directory is a single block
+_root=$(ipfs add -Q -r --pin=false --raw-leaves --chunker="size-$(( BLOCK_KIB * 1024 ))" "${WORKDIR}/blocks")
+rm -rf "${WORKDIR}/blocks"
+
+# Drop the page cache if allowed so the cold reads hit the durable store
+sync
+echo 3 > /proc/sys/vm/drop_caches 2>/dev/null || true
+
+_cold=$(read_blocks "${_root}")
+_warm=$(read_blocks "${_root}")
+
+echo "blocks=${BLOCKS} block_kib=${BLOCK_KIB}"
+echo "cold_read_us_per_block=${_cold}"
+echo "warm_read_us_per_block=${_warm}"
+
+{ ipfs refs -r "${_root}"; echo "${_root}"; } | xargs ipfs block rm -q > /dev/null
+rm -rf "${WORKDIR}"
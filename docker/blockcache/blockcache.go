@@ -0,0 +1,266 @@
+// Package blockcache is a Kubo datastore keeping the recently read blocks
+// on a local disk in front of a durable child datastore.
+//
+// Puts and deletes only go to the child and return once the child returns:
+// the cache never holds a block the child does not have. Gets are served
+// from the cache directory and, on a miss, read from the child and copied
+// into it. The least recently used blocks are removed from the cache
+// directory, never from the child, when it grows over its size.
+package blockcache
+
+import (
+	"container/list"
+	"context"
+	"os"
+	"path/filepath"
+	"strings"
+	"sync"
+
+	ds "github.com/ipfs/go-datastore"
+	logging "github.com/ipfs/go-log/v2"
+)
+
+var log = logging.Logger("blockcache")
+
+type entry struct {
+	name string
+	size int64
+}
+
+// Datastore is a read-through cache of the blocks of a child datastore.
+type Datastore struct {
+	ds.Batching
+
+	dir      string
+	capacity int64
+
+	mu      sync.Mutex
+	entries map[string]*list.Element
+	lru     *list.List
+	used    int64
+	// Incremented by every delete: a block read from the child before a
+	// delete is not cached after it
+	deletes uint64
+}
+
+// NewDatastore caches the blocks of child in a new directory of path, up
+// to capacity bytes. The cache directories of the previous runs are
+// removed: the cache index is only kept in memory.
+func NewDatastore(child ds.Batching, path string, capacity int64) (*Datastore, error) {
+	if err := os.MkdirAll(path, 0755); err != nil {
+		return nil, err
+	}
+	previous, err := filepath.Glob(filepath.Join(path, "blocks-*"))
+	if err != nil {
+		return nil, err
+	}
+	for _, dir := range previous {
+		if err := os.RemoveAll(dir); err != nil {
+			return nil, err
+		}
+	}
+	dir, err := os.MkdirTemp(path, "blocks-")
+	if err != nil {
+		return nil, err
+	}
+	return &Datastore{
+		Batching: child,
+		dir:      dir,
+		capacity: capacity,
+		entries:  make(map[string]*list.Element),
+		lru:      list.New(),
+	}, nil
+}
+
+// name of the cache file of a block key, false for the keys not cached
+func blockName(key ds.Key) (string, bool) {
+	name := strings.TrimPrefix(key.String(), "/")
+	if len(name) < 3 || strings.ContainsAny(name, `/\.`) {
+		return "", false
+	}
+	return name, true
+}
+
+// Cache files are sharded like the flatfs next-to-last/2 shard function
+func (d *Datastore) filePath(name string) string {
+	return filepath.Join(d.dir, name[len(name)-3:len(name)-1], name+".data")
+}
+
+// load returns the cached block name and marks it recently used
+func (d *Datastore) load(name string) ([]byte, bool) {
+	d.mu.Lock()
+	element, ok := d.entries[name]
+	if ok {
+		d.lru.MoveToFront(element)
+	}
+	d.mu.Unlock()
+	if !ok {
+		return nil, false
+	}
+	value, err := os.ReadFile(d.filePath(name))
+	if err != nil {
+		// Evicted since the index lookup
+		return nil, false
+	}
+	return value, true
+}
+
+// store copies a block read from the child into the cache and evicts the
+// least recently used blocks over the cache size
+func (d *Datastore) store(name string, value []byte, deletes uint64) {
+	if int64(len(value)) > d.capacity {
+		return
+	}
+	path := d.filePath(name)
+	if err := writeFile(d.dir, path, value); err != nil {
+		log.Warnf("not caching block %s: %s", name, err)
+		return
+	}
+
+	d.mu.Lock()
+	defer d.mu.Unlock()
+	if _, ok := d.entries[name]; ok {
+		return
+	}
+	if d.deletes != deletes {
+		os.Remove(path)
+		return
+	}
+	d.entries[name] = d.lru.PushFront(&entry{name: name, size: int64(len(value))})
+	d.used += int64(len(value))
+	for d.used > d.capacity {
+		oldest := d.lru.Remove(d.lru.Back()).(*entry)
+		delete(d.entries, oldest.name)
+		d.used -= oldest.size
+		os.Remove(d.filePath(oldest.name))
+	}
+}
+
+// writeFile writes a cache file through a temporary file so readers never
+// see a partial block
+func writeFile(dir string, path string, value []byte) error {
+	tmp, err := os.CreateTemp(dir, "tmp-")
+	if err != nil {
+		return err
+	}
+	_, err = tmp.Write(value)
+	if closeErr := tmp.Close(); err == nil {
+		err = closeErr
+	}
+	if err == nil {
+		err = os.MkdirAll(filepath.Dir(path), 0755)
+	}
+	if err == nil {
+		err = os.Rename(tmp.Name(), path)
+	}
+	if err != nil {
+		os.Remove(tmp.Name())
+	}
+	return err
+}
+
+// uncache removes a block deleted from the child from the cache
+func (d *Datastore) uncache(key ds.Key) {
+	name, ok := blockName(key)
+	if !ok {
+		return
+	}
+	d.mu.Lock()
+	d.deletes++
+	if element, ok := d.entries[name]; ok {
+		d.lru.Remove(element)
+		delete(d.entries, name)
+		d.used -= element.Value.(*entry).size
+	}
+	d.mu.Unlock()
+	os.Remove(d.filePath(name))
+}
+
+func (d *Datastore) cachedSize(key ds.Key) (int64, bool) {
+	name, ok := blockName(key)
+	if !ok {
+		return 0, false
+	}
+	d.mu.Lock()
+	defer d.mu.Unlock()
+	element, ok := d.entries[name]
+	if !ok {
+		return 0, false
+	}
+	return element.Value.(*entry).size, true
+}
+
+func (d *Datastore) Get(ctx context.Context, key ds.Key) ([]byte, error) {
+	name, ok := blockName(key)
+	if !ok {
+		return d.Batching.Get(ctx, key)
+	}
+	if value, ok := d.load(name); ok {
+		return value, nil
+	}
+	d.mu.Lock()
+	deletes := d.deletes
+	d.mu.Unlock()
+	value, err := d.Batching.Get(ctx, key)
+	if err != nil {
+		return nil, err
+	}
+	d.store(name, value, deletes)
+	return value, nil
+}
+
+func (d *Datastore) Has(ctx context.Context, key ds.Key) (bool, error) {
+	if _, ok := d.cachedSize(key); ok {
+		return true, nil
+	}
+	return d.Batching.Has(ctx, key)
+}
+
+func (d *Datastore) GetSize(ctx context.Context, key ds.Key) (int, error) {
+	if size, ok := d.cachedSize(key); ok {
+		return int(size), nil
+	}
+	return d.Batching.GetSize(ctx, key)
+}
+
+func (d *Datastore) Delete(ctx context.Context, key ds.Key) error {
+	err := d.Batching.Delete(ctx, key)
+	d.uncache(key)
+	return err
+}
+
+func (d *Datastore) Batch(ctx context.Context) (ds.Batch, error) {
+	b, err := d.Batching.Batch(ctx)
+	if err != nil {
+		return nil, err
+	}
+	return &batch{Batch: b, datastore: d}, nil
+}
+
+// DiskUsage is the disk usage of the child, the cache is not counted in
+// the repo size
+func (d *Datastore) DiskUsage(ctx context.Context) (uint64, error) {
+	return ds.DiskUsage(ctx, d.Batching)
+}
+
+// batch removes the deleted blocks from the cache once committed
+type batch struct {
+	ds.Batch
+
+	datastore *Datastore
+	deleted   []ds.Key
+}
+
+func (b *batch) Delete(ctx context.Context, key ds.Key) error {
+	b.deleted = append(b.deleted, key)
+	return b.Batch.Delete(ctx, key)
+}
+
+func (b *batch) Commit(ctx context.Context) error {
+	err := b.Batch.Commit(ctx)
+	for _, key := range b.deleted {
+		b.datastore.uncache(key)
+	}
+	b.deleted = nil
+	return err
+}
@@ -0,0 +1,100 @@
+package blockcache
+
+import (
+	"bytes"
+	"context"
+	"os"
+	"testing"
+
+	ds "github.com/ipfs/go-datastore"
+	dssync "github.com/ipfs/go-datastore/sync"
+)
+
+func newDatastore(t *testing.T, capacity int64) (*Datastore, ds.Batching) {
+	child := dssync.MutexWrap(ds.NewMapDatastore())
+	d, err := NewDatastore(child, t.TempDir(), capacity)
+	if err != nil {
+		t.Fatal(err)
+	}
+	return d, child
+}
+
+func TestPutOnlyWritesTheChild(t *testing.T) {
+	ctx := context.Background()
+	d, child := newDatastore(t, 1<<20)
+	key := ds.NewKey("CIQAAAB")
+	if err := d.Put(ctx, key, []byte("a")); err != nil {
+		t.Fatal(err)
+	}
+	if value, err := child.Get(ctx, key); err != nil || string(value) != "a" {
+		t.Fatalf("child has %q, %v", value, err)
+	}
+	if _, err := os.Stat(d.filePath("CIQAAAB")); !os.IsNotExist(err) {
+		t.Fatalf("block cached on put: %v", err)
+	}
+}
+
+func TestGetReadsThrough(t *testing.T) {
+	ctx := context.Background()
+	d, child := newDatastore(t, 1<<20)
+	key := ds.NewKey("CIQAAAB")
+	if err := child.Put(ctx, key, []byte("a")); err != nil {
+		t.Fatal(err)
+	}
+	for i := 0; i < 2; i++ {
+		if value, err := d.Get(ctx, key); err != nil || string(value) != "a" {
+			t.Fatalf("get %d: %q, %v", i, value, err)
+		}
+	}
+	if cached, err := os.ReadFile(d.filePath("CIQAAAB")); err != nil || string(cached) != "a" {
+		t.Fatalf("cached %q, %v", cached, err)
+	}
+	if size, err := d.GetSize(ctx, key); err != nil || size != 1 {
+		t.Fatalf("size %d, %v", size, err)
+	}
+}
+
+func TestDeleteRemovesTheCachedBlock(t *testing.T) {
+	ctx := context.Background()
+	d, child := newDatastore(t, 1<<20)
+	key := ds.NewKey("CIQAAAB")
+	child.Put(ctx, key, []byte("a"))
+	d.Get(ctx, key)
+
+	if err := d.Delete(ctx, key); err != nil {
+		t.Fatal(err)
+	}
+	if has, err := d.Has(ctx, key); err != nil || has {
+		t.Fatalf("has %v, %v", has, err)
+	}
+	if _, err := d.Get(ctx, key); err != ds.ErrNotFound {
+		t.Fatalf("get after delete: %v", err)
+	}
+}
+
+func TestEvictionKeepsTheChild(t *testing.T) {
+	ctx := context.Background()
+	d, child := newDatastore(t, 2048)
+	block := bytes.Repeat([]byte("b"), 1024)
+	keys := []ds.Key{ds.NewKey("CIQAAAB"), ds.NewKey("CIQBBAB"), ds.NewKey("CIQCCCD")}
+	for _, key := range keys {
+		child.Put(ctx, key, block)
+	}
+	d.Get(ctx, keys[0])
+	d.Get(ctx, keys[1])
+	// The first block is now the most recently used
+	d.Get(ctx, keys[0])
+	d.Get(ctx, keys[2])
+
+	if d.used != 2048 {
+		t.Fatalf("cache uses %d bytes", d.used)
+	}
+	if _, err := os.Stat(d.filePath("CIQBBAB")); !os.IsNotExist(err) {
+		t.Fatalf("least recently used block not evicted: %v", err)
+	}
+	for _, key := range keys {
+		if has, err := child.Has(ctx, key); err != nil || !has {
+			t.Fatalf("child lost %s: %v", key, err)
+		}
+	}
+}
@@ -0,0 +1,9 @@
+module github.com/aws-samples/ipfs-cluster-fargate/docker/blockcache
+
+go 1.20
+
+require (
+	github.com/ipfs/go-datastore v0.6.0
+	github.com/ipfs/go-log/v2 v2.5.1
+	github.com/ipfs/kubo v0.23.0
+)
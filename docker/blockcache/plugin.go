@@ -0,0 +1,101 @@
+package blockcache
+
+import (
+	"fmt"
+	"path/filepath"
+
+	"github.com/ipfs/kubo/plugin"
+	"github.com/ipfs/kubo/repo"
+	"github.com/ipfs/kubo/repo/fsrepo"
+)
+
+// Plugins is the list of plugins loaded by the Kubo plugin loader
+// (plugin/loader/preload_list)
+var Plugins = []plugin.Plugin{
+	&Plugin{},
+}
+
+// Plugin registers the "blockcache" datastore type:
+//
+//	{
+//	    "type": "blockcache",
+//	    "path": "/data/ipfs-cache",
+//	    "sizeGiB": 20,
+//	    "child": {"type": "flatfs", ...}
+//	}
+type Plugin struct{}
+
+var _ plugin.PluginDatastore = (*Plugin)(nil)
+
+func (*Plugin) Name() string {
+	return "ds-blockcache"
+}
+
+func (*Plugin) Version() string {
+	return "0.1.0"
+}
+
+func (*Plugin) Init(*plugin.Environment) error {
+	return nil
+}
+
+func (*Plugin) DatastoreTypeName() string {
+	return "blockcache"
+}
+
+func (*Plugin) DatastoreConfigParser() fsrepo.ConfigFromMap {
+	return parseConfig
+}
+
+type config struct {
+	path     string
+	capacity int64
+	child    fsrepo.DatastoreConfig
+}
+
+func parseConfig(params map[string]interface{}) (fsrepo.DatastoreConfig, error) {
+	path, ok := params["path"].(string)
+	if !ok || path == "" {
+		return nil, fmt.Errorf("blockcache: 'path' field is missing or not a string")
+	}
+	sizeGiB, ok := params["sizeGiB"].(float64)
+	if !ok || sizeGiB <= 0 {
+		return nil, fmt.Errorf("blockcache: 'sizeGiB' field is missing or not a positive number")
+	}
+	childParams, ok := params["child"].(map[string]interface{})
+	if !ok {
+		return nil, fmt.Errorf("blockcache: 'child' field is missing or not a map")
+	}
+	child, err := fsrepo.AnyDatastoreConfig(childParams)
+	if err != nil {
+		return nil, err
+	}
+	return &config{
+		path:     path,
+		capacity: int64(sizeGiB * (1 << 30)),
+		child:    child,
+	}, nil
+}
+
+// DiskSpec is the one of the child: the cache is not part of the repo on
+// disk and can be turned on and off without changing the datastore_spec
+func (c *config) DiskSpec() fsrepo.DiskSpec {
+	return c.child.DiskSpec()
+}
+
+func (c *config) Create(path string) (repo.Datastore, error) {
+	child, err := c.child.Create(path)
+	if err != nil {
+		return nil, err
+	}
+	cachePath := c.path
+	if !filepath.IsAbs(cachePath) {
+		cachePath = filepath.Join(path, cachePath)
+	}
+	d, err := NewDatastore(child, cachePath, c.capacity)
+	if err != nil {
+		child.Close()
+		return nil, err
+	}
+	return d, nil
+}
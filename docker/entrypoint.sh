@@ -1,9 +1,80 @@
 #!/bin/sh
 set -ex
 
+_started=$(date +%s)
+
+# Wait until the previous task of this peer has released the repo on EFS,
+# or has been gone for KUBO_LEASE_TTL_SECONDS (repo-lease.sh)
+KUBO_LEASE_OWNER=$(/usr/local/bin/repo-lease.sh owner)
+export KUBO_LEASE_OWNER
+_downtime=$(/usr/local/bin/repo-lease.sh acquire)
+_lease_wait=$(( $(date +%s) - _started ))
+
 start(){
     echo "Starting IPFS daemon"
-    /usr/local/bin/start_ipfs daemon --migrate=true --agent-version-suffix=docker
+    /usr/local/bin/start_ipfs daemon --migrate=true --agent-version-suffix=docker &
+    IPFS_PID=$!
+}
+
+# Forward the ECS stop signal to the IPFS daemon so it shuts down cleanly
+stop(){
+    echo "Stopping IPFS daemon"
+    kill -TERM "${IPFS_PID}"
+}
+
+# Log the restart-to-ready time once the gateway answers, as a JSON event
+# turned into a CloudWatch metric by the CDK stack, then run the repo
+# maintenance in the background of the serving daemon
+ready(){
+    until wget -q -T 2 -O /dev/null http://127.0.0.1:8080/ipfs/bafkqaaa 2>/dev/null; do
+        kill -0 "${IPFS_PID}" 2>/dev/null || return 0
+        sleep 1
+    done
+    echo "{\"event\":\"kubo_ready\",\"owner\":\"${KUBO_LEASE_OWNER}\"," \
+         "\"restart_to_ready_seconds\":$(( $(date +%s) - _started ))," \
+         "\"lease_wait_seconds\":${_lease_wait}," \
+         "\"stale_lease_age_seconds\":${_downtime:-null}}"
+
+    # Partial block writes of a crashed task, set aside by 001-config_efs.sh
+    rm -rf "${IPFS_PATH:-/data/ipfs}"/blocks/.temp.stale.*
+
+    if [ "${KUBO_REPO_VERIFY}" = "true" ]; then
+        if nice -n 19 ipfs repo verify > /tmp/repo-verify.log 2>&1; then
+            echo "repo verify: $(tail -n 1 /tmp/repo-verify.log)"
+        else
+            echo "repo verify failed:"
+            grep -v '^block ' /tmp/repo-verify.log | tail -n 20 || true
+        fi
+    fi
 }
 
+if [ "${KUBO_PREFETCH}" = "true" ]; then
+    # The health check fails until the hot content is fetched
+    touch "${KUBO_PREFETCH_MARKER:-/tmp/kubo-prefetch}"
+fi
+
+trap stop TERM INT
 start
+
+# Stops the daemon if another task ever takes the lease
+/usr/local/bin/repo-lease.sh heartbeat "${IPFS_PID}" &
+LEASE_PID=$!
+
+ready &
+
+if [ "${KUBO_PREFETCH}" = "true" ]; then
+    /usr/local/bin/prefetch.sh &
+fi
+
+# wait returns early when the trap runs, wait until the daemon is gone
+_status=0
+while kill -0 "${IPFS_PID}" 2>/dev/null; do
+    wait "${IPFS_PID}" && _status=0 || _status=$?
+done
+
+kill "${LEASE_PID}" 2>/dev/null || true
+
+# The next task of this peer can open the repo right away
+/usr/local/bin/repo-lease.sh release
+
+exit ${_status}
@@ -0,0 +1,74 @@
+#!/bin/sh
+# Warm the Kubo blockstore with the hot content of the gateway.
+#
+# Requests every path of the hot list from the local gateway, so the
+# blocks a user request would need are fetched (over bitswap, from EFS or
+# into the block cache) before the task reports healthy. The hot list is
+# made of:
+#   - the paths or CIDs of KUBO_PREFETCH_CIDS (space separated), set by an
+#     S3 environment file of the task (python -m ipfs_cluster.prefetch)
+#   - the lines of the text file at the KUBO_PREFETCH_LIST IPFS path
+# and is cut to KUBO_PREFETCH_MAX_CIDS entries, fetched
+# KUBO_PREFETCH_CONCURRENCY at a time.
+#
+# The Kubo container health check fails while KUBO_PREFETCH_MARKER exists.
+# It is removed after KUBO_PREFETCH_TIMEOUT_SECONDS whatever the progress,
+# a cold task is better than a task replaced for being unhealthy.
+#
+# Usage: prefetch.sh
+set -e
+
+MARKER=${KUBO_PREFETCH_MARKER:-/tmp/kubo-prefetch}
+CONCURRENCY=${KUBO_PREFETCH_CONCURRENCY:-8}
+MAX_CIDS=${KUBO_PREFETCH_MAX_CIDS:-1000}
+TIMEOUT=${KUBO_PREFETCH_TIMEOUT_SECONDS:-180}
+GATEWAY=${KUBO_PREFETCH_GATEWAY:-http://127.0.0.1:8080}
+STATE=/tmp/kubo-prefetch.d
+
+log(){
+    echo "prefetch: $*"
+}
+
+trap 'rm -rf "${MARKER}" "${STATE}"' EXIT
+_deadline=$(( $(date +%s) + TIMEOUT ))
+
+remaining(){
+    echo $(( _deadline - $(date +%s) ))
+}
+
+# Identity CID: answers as soon as the gateway is up
+until wget -q -T 2 -O /dev/null "${GATEWAY}/ipfs/bafkqaaa" 2>/dev/null; do
+    if [ "$(remaining)" -le 0 ]; then
+        log "gateway not up after ${TIMEOUT}s, skipping the warm-up"
+        exit 0
+    fi
+    sleep 1
+done
+
+mkdir -p "${STATE}"
+{
+    for _path in ${KUBO_PREFETCH_CIDS}; do
+        echo "${_path}"
+    done
+    if [ -n "${KUBO_PREFETCH_LIST}" ]; then
+        ipfs --timeout="$(remaining)s" cat "${KUBO_PREFETCH_LIST}" || \
+            log "cannot read ${KUBO_PREFETCH_LIST}"
+    fi
+} | sed -e 's/^[[:space:]]*//' -e 's/[[:space:]]*$//' -e '/^#/d' -e '/^$/d' \
+  | sed -e '/^\/ip[fn]s\//!s/^/\/ipfs\//' \
+  | head -n "${MAX_CIDS}" > "${STATE}/paths"
+
+_total=$(wc -l < "${STATE}/paths")
+log "fetching ${_total} paths, ${CONCURRENCY} at a time, for ${TIMEOUT}s at most"
+
+# Each fetch stops at the deadline, xargs runs CONCURRENCY of them
+export GATEWAY STATE _deadline
+timeout "$(remaining)" xargs -r -P "${CONCURRENCY}" -n 1 sh -c '
+    _left=$(( _deadline - $(date +%s) ))
+    [ "${_left}" -gt 0 ] || exit 0
+    if timeout "${_left}" wget -q -O /dev/null "${GATEWAY}$1" 2>/dev/null; then
+        echo "$1" >> "${STATE}/done"
+    fi
+' _ < "${STATE}/paths" || true
+
+log "warmed $(cat "${STATE}/done" 2>/dev/null | wc -l)/${_total} paths in $(( TIMEOUT - $(remaining) ))s"
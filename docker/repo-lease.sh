@@ -0,0 +1,132 @@
+#!/bin/sh
+# Lease of the Kubo repo on EFS.
+#
+# Only one task may open a repo. The lease file ${IPFS_PATH}/.lease holds
+# the owner (ECS task ARN) and the time of its last heartbeat. A task
+# takes the lease when it is free, its own or stale (no heartbeat for
+# KUBO_LEASE_TTL_SECONDS), and then owns the repo locks: repo.lock and
+# datastore/LOCK are only removed once the lease is held (clean_locks).
+#
+# The lease file is replaced with a rename, which is atomic on NFS. Two
+# tasks taking a stale lease at once both read it back after
+# KUBO_LEASE_SETTLE_SECONDS and only the last writer keeps it.
+#
+# Usage: repo-lease.sh owner|acquire|heartbeat <pid>|release|clean_locks
+set -e
+
+IPFS_PATH=${IPFS_PATH:-/data/ipfs}
+LEASE=${IPFS_PATH}/.lease
+TTL=${KUBO_LEASE_TTL_SECONDS:-30}
+HEARTBEAT=${KUBO_LEASE_HEARTBEAT_SECONDS:-10}
+WAIT=${KUBO_LEASE_WAIT_SECONDS:-300}
+SETTLE=${KUBO_LEASE_SETTLE_SECONDS:-2}
+
+log(){
+    echo "repo-lease: $*"
+}
+
+# The ECS task ARN, or the hostname outside ECS
+owner(){
+    if [ -n "${KUBO_LEASE_OWNER}" ]; then
+        echo "${KUBO_LEASE_OWNER}"
+        return
+    fi
+    _arn=""
+    if [ -n "${ECS_CONTAINER_METADATA_URI_V4}" ]; then
+        _arn=$(wget -q -T 2 -O - "${ECS_CONTAINER_METADATA_URI_V4}/task" 2>/dev/null | \
+            sed -n 's/.*"TaskARN": *"\([^"]*\)".*/\1/p')
+    fi
+    echo "${_arn:-$(hostname)}"
+}
+
+write_lease(){
+    echo "$1 $(date +%s)" > "${LEASE}.$$"
+    mv -f "${LEASE}.$$" "${LEASE}"
+}
+
+# Sets _holder and _age (seconds since the last heartbeat)
+read_lease(){
+    _holder=""
+    _age=""
+    if [ -f "${LEASE}" ]; then
+        read -r _holder _beat < "${LEASE}" || true
+        _age=$(( $(date +%s) - ${_beat:-0} ))
+    fi
+}
+
+# Prints the seconds since the last heartbeat of the previous owner, empty
+# when the repo had no lease or was released cleanly
+acquire(){
+    _me=$(owner)
+    _start=$(date +%s)
+    _downtime=""
+    mkdir -p "${IPFS_PATH}"
+    while true; do
+        read_lease
+        if [ -z "${_holder}" ] || [ "${_holder}" = "${_me}" ] || \
+           [ "${_age}" -ge "${TTL}" ]; then
+            if [ -n "${_holder}" ] && [ "${_holder}" != "${_me}" ]; then
+                log "taking the stale lease of ${_holder} (no heartbeat for ${_age}s)" >&2
+                _downtime=${_age}
+            fi
+            write_lease "${_me}"
+            sleep "${SETTLE}"
+            read_lease
+            if [ "${_holder}" = "${_me}" ]; then
+                log "lease held by ${_me}" >&2
+                echo "${_downtime}"
+                return 0
+            fi
+            log "lease taken by ${_holder} in the meantime" >&2
+        fi
+        if [ $(( $(date +%s) - _start )) -ge "${WAIT}" ]; then
+            log "repo still held by ${_holder} after ${WAIT}s, giving up" >&2
+            return 1
+        fi
+        log "repo held by ${_holder} (heartbeat ${_age}s ago), waiting" >&2
+        sleep "${HEARTBEAT}"
+    done
+}
+
+# Renew the lease until the process exits. Stop it if another task has
+# taken the lease: two daemons must never write the same repo.
+heartbeat(){
+    _me=$(owner)
+    while kill -0 "$1" 2>/dev/null; do
+        sleep "${HEARTBEAT}"
+        read_lease
+        if [ -n "${_holder}" ] && [ "${_holder}" != "${_me}" ]; then
+            log "lease lost to ${_holder}, stopping the daemon"
+            kill -TERM "$1" 2>/dev/null || true
+            return 1
+        fi
+        write_lease "${_me}"
+    done
+}
+
+release(){
+    read_lease
+    if [ "${_holder}" = "$(owner)" ]; then
+        rm -f "${LEASE}"
+        log "lease released"
+    fi
+}
+
+# Locks left by a task that is gone. Only called with the lease held.
+clean_locks(){
+    read_lease
+    if [ "${_holder}" != "$(owner)" ]; then
+        log "lease not held, keeping the repo locks" >&2
+        return 1
+    fi
+    rm -fv "${IPFS_PATH}/repo.lock" "${IPFS_PATH}/datastore/LOCK"
+}
+
+case "$1" in
+    owner) owner ;;
+    acquire) acquire ;;
+    heartbeat) heartbeat "$2" ;;
+    release) release ;;
+    clean_locks) clean_locks ;;
+    *) echo "usage: $0 owner|acquire|heartbeat <pid>|release|clean_locks" >&2; exit 1 ;;
+esac
@@ -0,0 +1,88 @@
+#!/bin/sh
+# Count the S3 GET and HEAD requests of a fixed Kubo workload.
+#
+# Starts a MinIO server as a local stand-in for S3 and runs an image built
+# from Dockerfile_s3 against it twice: with the untuned settings (no bloom
+# filter, default workers) and with the settings given on the command line
+# (the 001-config_s3.sh defaults otherwise). The workload adds FILES files,
+# reads them back and checks FILES blocks the node does not have.
+#
+# Usage: s3-bench.sh <image> [files] [KEY=VALUE ...]
+# Example: s3-bench.sh my-ipfs-s3 200 CLUSTER_S3_KEY_TRANSFORM=next-to-last/2
+set -e
+
+IMAGE=${1:?usage: $0 <image> [files] [KEY=VALUE ...]}
+FILES=${2:-200}
+shift; [ $# -gt 0 ] && shift
+NETWORK=ipfs-s3-bench
+MINIO_USER=minioadmin
+MINIO_PASSWORD=minioadmin
+
+cleanup(){
+    docker rm -f ipfs-s3-bench-kubo ipfs-s3-bench-minio > /dev/null 2>&1 || true
+    docker network rm ${NETWORK} > /dev/null 2>&1 || true
+}
+trap cleanup EXIT
+
+# Sum of the MinIO request counter of an S3 API call
+requests(){
+    docker run --rm --network ${NETWORK} curlimages/curl -s \
+        http://ipfs-s3-bench-minio:9000/minio/v2/metrics/cluster | \
+        awk -v api="$1" '$1 ~ "^minio_s3_requests_total" && $1 ~ "api=\""api"\"" { n += $2 } END { print n + 0 }'
+}
+
+# Run the workload with the given settings, print the GET and HEAD deltas
+run_workload(){
+    _bucket=bench-$(date +%s%N)
+    docker run --rm --network ${NETWORK} --entrypoint sh minio/mc -c \
+        "mc alias set local http://ipfs-s3-bench-minio:9000 ${MINIO_USER} ${MINIO_PASSWORD} > /dev/null && mc mb -q local/${_bucket}"
+
+    _env=""
+    for _setting in "$@"; do
+        _env="${_env} -e ${_setting}"
+    done
+
+    # shellcheck disable=SC2086
+    docker run -d --name ipfs-s3-bench-kubo --network ${NETWORK} \
+        -e AWS_REGION=us-east-1 \
+        -e CLUSTER_S3_BUCKET=${_bucket} \
+        -e CLUSTER_PEERNAME=bench \
+        -e CLUSTER_AWS_KEY=${MINIO_USER} \
+        -e CLUSTER_AWS_SECRET=${MINIO_PASSWORD} \
+        -e CLUSTER_S3_REGION_ENDPOINT=http://ipfs-s3-bench-minio:9000 \
+        ${_env} "${IMAGE}" > /dev/null
+    until docker exec ipfs-s3-bench-kubo ipfs id > /dev/null 2>&1; do
+        sleep 1
+    done
+
+    _get=$(requests getobject)
+    _head=$(requests headobject)
+    docker exec ipfs-s3-bench-kubo sh -c "
+        i=0
+        while [ \$i -lt ${FILES} ]; do
+            cid=\$(head -c 65536 /dev/urandom | ipfs add -q --pin=false)
+            ipfs cat \$cid > /dev/null
+            missing=\$(head -c 65536 /dev/urandom | ipfs add -q --only-hash)
+            ipfs block stat --offline \$missing > /dev/null 2>&1 || true
+            i=\$((i + 1))
+        done"
+    echo "get=$(( $(requests getobject) - _get )) head=$(( $(requests headobject) - _head ))"
+
+    docker rm -f ipfs-s3-bench-kubo > /dev/null
+}
+
+cleanup
+docker network create ${NETWORK} > /dev/null
+docker run -d --name ipfs-s3-bench-minio --network ${NETWORK} \
+    -e MINIO_ROOT_USER=${MINIO_USER} \
+    -e MINIO_ROOT_PASSWORD=${MINIO_PASSWORD} \
+    -e MINIO_PROMETHEUS_AUTH_TYPE=public \
+    minio/minio server /data > /dev/null
+until docker run --rm --network ${NETWORK} curlimages/curl -sf \
+    http://ipfs-s3-bench-minio:9000/minio/health/live > /dev/null; do
+    sleep 1
+done
+
+echo "files=${FILES}"
+echo "before: $(run_workload KUBO_BLOOM_FILTER_SIZE=0 CLUSTER_S3_WORKERS=100 CLUSTER_S3_KEY_TRANSFORM=default)"
+echo "after:  $(run_workload "$@")"
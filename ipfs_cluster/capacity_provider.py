@@ -0,0 +1,64 @@
+from typing import NamedTuple
+
+CAPACITY_PROVIDER_ROLES = ('FOLLOWER', 'GATEWAY')
+
+# Fargate stops the containers at most 2 minutes after SIGTERM, which is
+# also the notice of a Fargate Spot interruption
+FARGATE_MAX_STOP_TIMEOUT_SECONDS = 120
+
+
+class CapacityProviderWeights(NamedTuple):
+    """FARGATE / FARGATE_SPOT capacity provider strategy of a service."""
+    fargate_base: int = 0
+    fargate_weight: int = 1
+    fargate_spot_weight: int = 0
+
+    @property
+    def uses_spot(self) -> bool:
+        return self.fargate_spot_weight > 0
+
+
+def _non_negative_int(ipfs_cluster_env: dict, key: str, default: int) -> int:
+    value = int(ipfs_cluster_env.get(key) or default)
+    if value < 0:
+        raise ValueError(f'Invalid {key} {value}, expected 0 or more')
+    return value
+
+
+def get_capacity_provider_weights(ipfs_cluster_env: dict,
+                                  role: str) -> CapacityProviderWeights:
+    """Read the <role>_FARGATE_BASE, <role>_FARGATE_WEIGHT and
+    <role>_FARGATE_SPOT_WEIGHT settings of ipfscluster.env.
+
+    The bootstrap peer has no role: it always runs on on-demand Fargate.
+    """
+    role = role.upper()
+    if role not in CAPACITY_PROVIDER_ROLES:
+        raise ValueError(f'Unknown capacity provider role {role!r}, '
+                         f'expected one of {list(CAPACITY_PROVIDER_ROLES)}')
+
+    weights = CapacityProviderWeights(
+        fargate_base=_non_negative_int(
+            ipfs_cluster_env, f'{role}_FARGATE_BASE', 0),
+        fargate_weight=_non_negative_int(
+            ipfs_cluster_env, f'{role}_FARGATE_WEIGHT', 1),
+        fargate_spot_weight=_non_negative_int(
+            ipfs_cluster_env, f'{role}_FARGATE_SPOT_WEIGHT', 0),
+    )
+
+    if weights.fargate_weight == 0 and weights.fargate_spot_weight == 0:
+        raise ValueError(f'{role}_FARGATE_WEIGHT and '
+                         f'{role}_FARGATE_SPOT_WEIGHT cannot both be 0')
+
+    return weights
+
+
+def get_stop_timeout_seconds(ipfs_cluster_env: dict) -> int:
+    """Time given to Kubo and ipfs-cluster to shut down after SIGTERM."""
+    stop_timeout = int(ipfs_cluster_env.get('CONTAINER_STOP_TIMEOUT_SECONDS')
+                       or FARGATE_MAX_STOP_TIMEOUT_SECONDS)
+    if not 1 <= stop_timeout <= FARGATE_MAX_STOP_TIMEOUT_SECONDS:
+        raise ValueError(
+            f'Invalid CONTAINER_STOP_TIMEOUT_SECONDS {stop_timeout}, '
+            f'expected 1 to {FARGATE_MAX_STOP_TIMEOUT_SECONDS}')
+    return stop_timeout
@@ -0,0 +1,108 @@
+from typing import Optional
+
+import aws_cdk as cdk
+from constructs import Construct
+
+PREFIX_LIST_NAME = 'com.amazonaws.global.cloudfront.origin-facing'
+
+# IDs of the AWS-managed CloudFront origin-facing prefix list. They never
+# change for a region, the table is used when the lookup is not possible
+# (no credentials or network).
+CLOUDFRONT_PREFIX_LIST_IDS = {
+    'af-south-1': 'pl-c0aa4fa9',
+    'ap-east-1': 'pl-14b2577d',
+    'ap-northeast-1': 'pl-58a04531',
+    'ap-northeast-2': 'pl-22a6434b',
+    'ap-northeast-3': 'pl-31a14458',
+    'ap-south-1': 'pl-9aa247f3',
+    'ap-southeast-1': 'pl-31a34658',
+    'ap-southeast-2': 'pl-b8a742d1',
+    'ca-central-1': 'pl-38a64351',
+    'eu-central-1': 'pl-a3a144ca',
+    'eu-north-1': 'pl-fab65393',
+    'eu-south-1': 'pl-1bbc5972',
+    'eu-west-1': 'pl-4fa04526',
+    'eu-west-2': 'pl-93a247fa',
+    'eu-west-3': 'pl-75b1541c',
+    'me-south-1': 'pl-17b2577e',
+    'sa-east-1': 'pl-5da64334',
+    'us-east-1': 'pl-3b927c52',
+    'us-east-2': 'pl-b6a144df',
+    'us-west-1': 'pl-4ea04527',
+    'us-west-2': 'pl-82a045eb',
+}
+
+
+def context_key(region_name: str) -> str:
+    # No '=' in the key, so it can be set with `cdk synth -c key=value`
+    return f'cloudfront-prefix-list:{region_name}'
+
+
+def lookup_cloudfront_prefix_id(region_name: str) -> str:
+    """Look the prefix list up with the EC2 API.
+
+    Raises LookupError when the API cannot be called or returns no list.
+    """
+    # boto3 is slow to import and only needed on a cache miss
+    import boto3
+    from botocore.exceptions import BotoCoreError, ClientError
+
+    try:
+        client = boto3.client('ec2', region_name=region_name)
+        resp = client.describe_managed_prefix_lists(
+            Filters=[
+                {
+                    'Name': 'prefix-list-name',
+                    'Values': [PREFIX_LIST_NAME]
+                },
+                {
+                    'Name': 'owner-id',
+                    'Values': ['AWS']
+                }
+            ]
+        )
+    except (BotoCoreError, ClientError) as e:
+        raise LookupError(str(e)) from e
+    if not resp['PrefixLists']:
+        raise LookupError(f'No {PREFIX_LIST_NAME} prefix list')
+    return resp['PrefixLists'][0]['PrefixListId']
+
+
+def get_cloudfront_prefix_id(scope: Construct, region_name: str,
+                             override: Optional[str] = None) -> str:
+    """Resolve the CloudFront origin-facing prefix list of a region.
+
+    In order: the explicit override, the cdk context (cdk.json,
+    cdk.context.json or -c), the EC2 API and the static table. The app
+    never writes the context itself: a lookup or a fallback to the table
+    gets a synth warning with the value to set in the context.
+    """
+    if override:
+        return override
+
+    if cdk.Token.is_unresolved(region_name):
+        raise ValueError('The CloudFront prefix list cannot be resolved for '
+                         'an environment-agnostic stack, set '
+                         'CLOUDFRONT_PREFIX_LIST_ID')
+
+    key = context_key(region_name)
+    cached = scope.node.try_get_context(key)
+    if cached:
+        return cached
+
+    try:
+        prefix_list_id = lookup_cloudfront_prefix_id(region_name)
+        source = 'looked up with the EC2 API'
+    except LookupError as e:
+        if region_name not in CLOUDFRONT_PREFIX_LIST_IDS:
+            raise ValueError(
+                f'Cannot look up the CloudFront prefix list of {region_name} '
+                f'({e}), set CLOUDFRONT_PREFIX_LIST_ID') from e
+        prefix_list_id = CLOUDFRONT_PREFIX_LIST_IDS[region_name]
+        source = f'taken from the built-in table, the lookup failed ({e})'
+
+    cdk.Annotations.of(scope).add_warning(
+        f'CloudFront prefix list {prefix_list_id} of {region_name} {source}. '
+        f'Pin it with "-c {key}={prefix_list_id}", a "{key}" entry in the '
+        f'context of cdk.json or CLOUDFRONT_PREFIX_LIST_ID')
+    return prefix_list_id
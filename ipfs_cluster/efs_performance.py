@@ -0,0 +1,64 @@
+from typing import NamedTuple, Optional
+
+THROUGHPUT_MODES = ('bursting', 'elastic', 'provisioned')
+PERFORMANCE_MODES = ('generalPurpose', 'maxIO')
+LIFECYCLE_POLICIES = ('AFTER_7_DAYS', 'AFTER_14_DAYS', 'AFTER_30_DAYS',
+                      'AFTER_60_DAYS', 'AFTER_90_DAYS')
+OUT_OF_INFREQUENT_ACCESS_POLICIES = ('AFTER_1_ACCESS',)
+
+
+class EfsPerformance(NamedTuple):
+    """Throughput, performance and lifecycle settings of the EFS file systems."""
+    throughput_mode: str = 'bursting'
+    provisioned_throughput_mibps: Optional[int] = None
+    performance_mode: str = 'generalPurpose'
+    lifecycle_policy: Optional[str] = None
+    out_of_infrequent_access_policy: Optional[str] = None
+
+
+def _choice(ipfs_cluster_env: dict, key: str, choices: tuple,
+            default: Optional[str] = None) -> Optional[str]:
+    value = ipfs_cluster_env.get(key) or default
+    if value is None:
+        return None
+    for choice in choices:
+        if value.lower() == choice.lower():
+            return choice
+    raise ValueError(f'Invalid {key} {value!r}, expected one of {list(choices)}')
+
+
+def get_efs_performance(ipfs_cluster_env: dict, one_zone: bool) -> EfsPerformance:
+    """Read and validate the EFS_* settings of ipfscluster.env."""
+    efs_performance = EfsPerformance(
+        throughput_mode=_choice(ipfs_cluster_env, 'EFS_THROUGHPUT_MODE',
+                                THROUGHPUT_MODES, 'bursting'),
+        provisioned_throughput_mibps=int(
+            ipfs_cluster_env['EFS_PROVISIONED_THROUGHPUT_MIBPS'])
+        if ipfs_cluster_env.get('EFS_PROVISIONED_THROUGHPUT_MIBPS') else None,
+        performance_mode=_choice(ipfs_cluster_env, 'EFS_PERFORMANCE_MODE',
+                                 PERFORMANCE_MODES, 'generalPurpose'),
+        lifecycle_policy=_choice(ipfs_cluster_env, 'EFS_LIFECYCLE_POLICY',
+                                 LIFECYCLE_POLICIES),
+        out_of_infrequent_access_policy=_choice(
+            ipfs_cluster_env, 'EFS_OUT_OF_IA_POLICY',
+            OUT_OF_INFREQUENT_ACCESS_POLICIES),
+    )
+
+    if efs_performance.throughput_mode == 'provisioned':
+        if not efs_performance.provisioned_throughput_mibps or \
+                efs_performance.provisioned_throughput_mibps < 1:
+            raise ValueError('EFS_PROVISIONED_THROUGHPUT_MIBPS must be at '
+                             'least 1 with the provisioned throughput mode')
+    elif efs_performance.provisioned_throughput_mibps is not None:
+        raise ValueError('EFS_PROVISIONED_THROUGHPUT_MIBPS requires the '
+                         'provisioned throughput mode')
+
+    if efs_performance.performance_mode == 'maxIO':
+        if one_zone:
+            raise ValueError('The maxIO performance mode is not supported '
+                             'by One Zone EFS')
+        if efs_performance.throughput_mode == 'elastic':
+            raise ValueError('The maxIO performance mode is not supported '
+                             'with the elastic throughput mode')
+
+    return efs_performance
@@ -0,0 +1,125 @@
+from typing import NamedTuple
+
+TARGET_GROUP_ROLES = ('GATEWAY', 'CLUSTER', 'RPC')
+
+# Empty directory added to every Kubo repo at init: fetching it through the
+# gateway reads a block from the datastore
+EMPTY_DIR_CID = 'QmUNLLsPACCz1vLxQVkXqqLX5R1X345qqfHbsf67hvA3Nn'
+# Identity CID of empty content: served from the CID itself, without any
+# datastore read or network request
+EMPTY_IDENTITY_CID = 'bafkqaaa'
+
+# ALB health check limits
+INTERVAL_SECONDS = (5, 300)
+TIMEOUT_SECONDS = (2, 120)
+THRESHOLD_COUNT = (2, 10)
+# ECS health check grace period limit
+MAX_GRACE_PERIOD_SECONDS = 2147483647
+
+# Liveness of the containers: a local HTTP request run by the busybox
+# wget of the Kubo and ipfs-cluster images. 127.0.0.1 is a path gateway,
+# localhost would redirect to a subdomain gateway.
+KUBO_LIVENESS_COMMAND = (
+    'wget -q -T 5 -O /dev/null '
+    f'http://127.0.0.1:8080/ipfs/{EMPTY_IDENTITY_CID} || exit 1')
+# docker/prefetch.sh keeps the marker while it warms the blockstore up, the
+# task only reports healthy once it is warm
+PREFETCH_MARKER = '/tmp/kubo-prefetch'
+KUBO_WARM_COMMAND = f'test ! -e {PREFETCH_MARKER} && {KUBO_LIVENESS_COMMAND}'
+# /health answers without the REST API credentials
+CLUSTER_LIVENESS_COMMAND = (
+    'wget -q -T 5 -O /dev/null http://127.0.0.1:9094/health || exit 1')
+
+
+class TargetHealthCheck(NamedTuple):
+    """ALB health check of a target group."""
+    path: str
+    healthy_http_codes: str
+    interval_seconds: int = 30
+    timeout_seconds: int = 5
+    healthy_threshold: int = 5
+    unhealthy_threshold: int = 2
+
+
+# GATEWAY is the readiness of the gateways: a task gets requests once it
+# has served a block from its datastore within the timeout several times
+# in a row, and is only pulled out after several slow or failed reads.
+# CLUSTER and RPC only check that the API answers.
+TARGET_HEALTH_CHECKS = {
+    'GATEWAY': TargetHealthCheck(
+        path=f'/ipfs/{EMPTY_DIR_CID}',
+        healthy_http_codes='200,301,302,303,304,307,308',
+        interval_seconds=30, timeout_seconds=5,
+        healthy_threshold=3, unhealthy_threshold=3,
+    ),
+    'CLUSTER': TargetHealthCheck(
+        path='/health',
+        healthy_http_codes='204',
+        interval_seconds=30, timeout_seconds=10,
+        healthy_threshold=2, unhealthy_threshold=2,
+    ),
+    # The RPC API only accepts POST, GET requests get a 405
+    'RPC': TargetHealthCheck(
+        path='/api/v0/version',
+        healthy_http_codes='200,405',
+    ),
+}
+
+
+def _int_in_range(ipfs_cluster_env: dict, key: str, default: int,
+                  limits: tuple) -> int:
+    value = int(ipfs_cluster_env.get(key) or default)
+    if not limits[0] <= value <= limits[1]:
+        raise ValueError(
+            f'Invalid {key} {value}, expected {limits[0]} to {limits[1]}')
+    return value
+
+
+def get_target_health_check(ipfs_cluster_env: dict,
+                            role: str) -> TargetHealthCheck:
+    """Read the <role>_HEALTH_CHECK_PATH, _HTTP_CODES, _INTERVAL_SECONDS,
+    _TIMEOUT_SECONDS, _HEALTHY_THRESHOLD and _UNHEALTHY_THRESHOLD settings
+    of ipfscluster.env on top of the role defaults."""
+    role = role.upper()
+    if role not in TARGET_GROUP_ROLES:
+        raise ValueError(f'Unknown target group role {role!r}, '
+                         f'expected one of {list(TARGET_GROUP_ROLES)}')
+    default = TARGET_HEALTH_CHECKS[role]
+    prefix = f'{role}_HEALTH_CHECK'
+
+    health_check = TargetHealthCheck(
+        path=ipfs_cluster_env.get(f'{prefix}_PATH') or default.path,
+        healthy_http_codes=ipfs_cluster_env.get(f'{prefix}_HTTP_CODES') or
+        default.healthy_http_codes,
+        interval_seconds=_int_in_range(
+            ipfs_cluster_env, f'{prefix}_INTERVAL_SECONDS',
+            default.interval_seconds, INTERVAL_SECONDS),
+        timeout_seconds=_int_in_range(
+            ipfs_cluster_env, f'{prefix}_TIMEOUT_SECONDS',
+            default.timeout_seconds, TIMEOUT_SECONDS),
+        healthy_threshold=_int_in_range(
+            ipfs_cluster_env, f'{prefix}_HEALTHY_THRESHOLD',
+            default.healthy_threshold, THRESHOLD_COUNT),
+        unhealthy_threshold=_int_in_range(
+            ipfs_cluster_env, f'{prefix}_UNHEALTHY_THRESHOLD',
+            default.unhealthy_threshold, THRESHOLD_COUNT),
+    )
+
+    if not health_check.path.startswith('/'):
+        raise ValueError(
+            f'Invalid {prefix}_PATH {health_check.path!r}, expected an '
+            f'absolute path')
+    if health_check.timeout_seconds >= health_check.interval_seconds:
+        raise ValueError(
+            f'{prefix}_TIMEOUT_SECONDS {health_check.timeout_seconds} must '
+            f'be lower than {prefix}_INTERVAL_SECONDS '
+            f'{health_check.interval_seconds}')
+    return health_check
+
+
+def get_health_check_grace_period_seconds(ipfs_cluster_env: dict) -> int:
+    """Time ECS ignores the load balancer health checks of a new task, so
+    a task mounting EFS and opening its repo is not replaced before it
+    gets ready."""
+    return _int_in_range(ipfs_cluster_env, 'HEALTH_CHECK_GRACE_PERIOD_SECONDS',
+                         60, (0, MAX_GRACE_PERIOD_SECONDS))
@@ -6,32 +6,52 @@ from aws_cdk import (
     aws_ecs as ecs,
     aws_efs as efs,
     aws_elasticloadbalancingv2 as elbv2,
+    aws_iam as iam,
+    aws_logs as logs,
     aws_servicediscovery as cloudmap,
     aws_cloudfront as cloudfront,
     aws_cloudfront_origins as origins,
+    aws_cloudwatch as cloudwatch,
+    aws_s3 as s3,
     aws_secretsmanager as secretsmanager,
     SecretValue,
 )
 from constructs import Construct
 
-import boto3
+from ipfs_cluster.capacity_provider import (CapacityProviderWeights,
+                                           get_capacity_provider_weights,
+                                           get_stop_timeout_seconds)
+from ipfs_cluster.cloudfront_prefix_list import get_cloudfront_prefix_id
+from ipfs_cluster.efs_performance import get_efs_performance
+from ipfs_cluster.health_check import (CLUSTER_LIVENESS_COMMAND,
+                                       KUBO_LIVENESS_COMMAND,
+                                       KUBO_WARM_COMMAND,
+                                       TargetHealthCheck,
+                                       get_health_check_grace_period_seconds,
+                                       get_target_health_check)
+from ipfs_cluster.ipfs_peer import (PEER_RESOURCES, SWARM_LISTENER_RESOURCES,
+                                    IpfsPeer, SharedPeerDefinitions,
+                                    add_metrics_sidecar, count_resources,
+                                    kubo_resources_environment,
+                                    max_peers_per_stack)
+from ipfs_cluster.metrics import cluster_metrics_environment
+from ipfs_cluster.network import get_network_config, validate_network_config
+from ipfs_cluster.peer_layout import get_peer_layout
+from ipfs_cluster.peering import (gateway_peering_environment,
+                                  peering_hosts_environment)
+from ipfs_cluster.pinning import (get_pinning_config, pinning_environment,
+                                  pinning_profile)
+from ipfs_cluster.prefetch import get_prefetch_config, prefetch_environment
+from ipfs_cluster.routing import (RoutingConfig, get_routing_config,
+                                  routing_environment,
+                                  routing_task_size_warning)
+from ipfs_cluster.swarm import (SWARM_PORT, SwarmConfig, get_swarm_config,
+                                swarm_environment)
+from ipfs_cluster.task_size import get_task_size, with_ephemeral_storage
 
-
-def get_cloudfront_prefix_id(region_name) -> str:
-    client = boto3.client('ec2', region_name=region_name)
-    resp = client.describe_managed_prefix_lists(
-        Filters=[
-            {
-                'Name': 'prefix-list-name',
-                'Values': ['com.amazonaws.global.cloudfront.origin-facing']
-            },
-            {
-                'Name': 'owner-id',
-                'Values': ['AWS']
-            }
-        ]
-    )
-    return resp['PrefixLists'][0]['PrefixListId']
+# Repositories of the stock Kubo image, which has none of the docker/
+# entrypoint and init scripts
+STOCK_KUBO_IMAGE_REPOSITORIES = ('ipfs/kubo', 'docker.io/ipfs/kubo')
 
 
 class IpfsClusterFargateStack(Stack):
@@ -44,20 +64,67 @@ class IpfsClusterFargateStack(Stack):
 
         self._define_parameter()
 
-        _cf_prefix_list_id = get_cloudfront_prefix_id(self.region)
+        # From the cdk context, the EC2 API or the built-in table
+        _cf_prefix_list_id = get_cloudfront_prefix_id(
+            self, self.region,
+            override=ipfs_cluster_env.get('CLOUDFRONT_PREFIX_LIST_ID')
+        )
 
-        # Create A VPC with 3 public subnet on 3 diff AZs
-        _vpc = ec2.Vpc(
-            self, "IpfsFargateVpc",
-            subnet_configuration=[
+        # Create A VPC with 3 public subnet on 3 diff AZs. With
+        # TASK_SUBNETS=private the tasks run in private subnets behind
+        # NAT gateways and only the load balancers stay public.
+        _network = get_network_config(ipfs_cluster_env)
+        _subnet_configuration = [
+            ec2.SubnetConfiguration(
+                cidr_mask=24,
+                name='public',
+                subnet_type=ec2.SubnetType.PUBLIC
+            )
+        ]
+        if _network.private_subnets:
+            _subnet_configuration.append(
                 ec2.SubnetConfiguration(
                     cidr_mask=24,
-                    name='public',
-                    subnet_type=ec2.SubnetType.PUBLIC
+                    name='private',
+                    subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
                 )
-            ],
+            )
+        _vpc_cidr = ec2.Vpc.DEFAULT_CIDR_RANGE
+        _vpc = ec2.Vpc(
+            self, "IpfsFargateVpc",
+            cidr=_vpc_cidr,
+            subnet_configuration=_subnet_configuration,
+            nat_gateways=_network.nat_gateways,
             max_azs=3
         )
+        _task_subnet_type = ec2.SubnetType.PRIVATE_WITH_EGRESS \
+            if _network.private_subnets else ec2.SubnetType.PUBLIC
+
+        # The S3 datastore (docker/Dockerfile_s3) and the ECR image layers
+        # are read through the S3 gateway endpoint, the image pulls, logs
+        # and secrets of the tasks through interface endpoints
+        if _network.vpc_endpoints:
+            _vpc.add_gateway_endpoint(
+                'S3GatewayEndpoint',
+                service=ec2.GatewayVpcEndpointAwsService.S3
+            )
+            for _endpoint_id, _service in [
+                ('EcrApiEndpoint', ec2.InterfaceVpcEndpointAwsService.ECR),
+                ('EcrDockerEndpoint',
+                 ec2.InterfaceVpcEndpointAwsService.ECR_DOCKER),
+                ('LogsEndpoint',
+                 ec2.InterfaceVpcEndpointAwsService.CLOUDWATCH_LOGS),
+                ('SecretsManagerEndpoint',
+                 ec2.InterfaceVpcEndpointAwsService.SECRETS_MANAGER),
+            ]:
+                _vpc.add_interface_endpoint(
+                    _endpoint_id,
+                    service=_service,
+                    subnets=ec2.SubnetSelection(
+                        subnet_type=_task_subnet_type,
+                        one_per_az=True
+                    )
+                )
 
         # Create Secret in AWS Secret Manager
         _ipfs_cluster_api_credential = ecs.Secret.from_secrets_manager(
@@ -91,7 +158,48 @@ class IpfsClusterFargateStack(Stack):
         _ipfs_cluster_id = self._parameter_ipfs_cluster_id.value_as_string
 
         # Create ECS Cluster
-        _ecs_cluster = ecs.Cluster(self, "IpfsEcsCluster", vpc=_vpc)
+        _ecs_cluster = ecs.Cluster(
+            self, "IpfsEcsCluster", vpc=_vpc,
+            enable_fargate_capacity_providers=True,
+            # None leaves the account default setting
+            container_insights=True if ipfs_cluster_env.get(
+                'CONTAINER_INSIGHTS', 'False').upper() == 'TRUE' else None
+        )
+
+        # Follower peers and gateway replicas can run on Fargate Spot. The
+        # containers get the whole Spot interruption notice to shut down and
+        # the ALB stops routing requests to a draining task before that.
+        _follower_capacity = self._capacity_provider_strategies(
+            get_capacity_provider_weights(ipfs_cluster_env, 'FOLLOWER'))
+        _gateway_capacity = self._capacity_provider_strategies(
+            get_capacity_provider_weights(ipfs_cluster_env, 'GATEWAY'))
+        _stop_timeout = Duration.seconds(
+            get_stop_timeout_seconds(ipfs_cluster_env))
+        _deregistration_delay = Duration.seconds(
+            int(ipfs_cluster_env.get('ALB_DEREGISTRATION_DELAY_SECONDS') or 60))
+
+        # The gateway target group checks the readiness of the gateways,
+        # the API target groups and the containers only their liveness
+        _gateway_health_check = self._target_health_check(
+            get_target_health_check(ipfs_cluster_env, 'GATEWAY'))
+        _cluster_health_check = self._target_health_check(
+            get_target_health_check(ipfs_cluster_env, 'CLUSTER'))
+        _rpc_health_check = self._target_health_check(
+            get_target_health_check(ipfs_cluster_env, 'RPC'))
+        _health_check_grace_period = Duration.seconds(
+            get_health_check_grace_period_seconds(ipfs_cluster_env))
+
+        # New gateway targets get a linearly increasing share of the
+        # requests while their caches warm up. 0 disables slow start.
+        _gateway_slow_start_seconds = int(
+            ipfs_cluster_env.get('GATEWAY_SLOW_START_SECONDS') or 60)
+        if _gateway_slow_start_seconds != 0 and \
+                not 30 <= _gateway_slow_start_seconds <= 900:
+            raise ValueError(
+                f'Invalid GATEWAY_SLOW_START_SECONDS '
+                f'{_gateway_slow_start_seconds}, expected 0 or 30 to 900')
+        _gateway_slow_start = Duration.seconds(_gateway_slow_start_seconds) \
+            if _gateway_slow_start_seconds else None
 
         # ALB for IPFS Cluster
         _alb_ipfs_cluster_sg = ec2.SecurityGroup(self, 'AlbIpfsClusterSecurityGroup',
@@ -132,15 +240,8 @@ class IpfsClusterFargateStack(Stack):
             target_type=elbv2.TargetType.IP,
             port=9094,
             protocol=elbv2.ApplicationProtocol.HTTP,
-            health_check=elbv2.HealthCheck(
-                enabled=True,
-                path='/health',
-                healthy_http_codes='204',
-                healthy_threshold_count=2,
-                unhealthy_threshold_count=2,
-                interval=Duration.seconds(30),
-                timeout=Duration.seconds(10)
-            ),
+            health_check=_cluster_health_check,
+            deregistration_delay=_deregistration_delay,
             vpc=_vpc
         )
 
@@ -176,14 +277,19 @@ class IpfsClusterFargateStack(Stack):
             target_type=elbv2.TargetType.IP,
             port=8080,
             protocol=elbv2.ApplicationProtocol.HTTP,
-            health_check=elbv2.HealthCheck(
-                enabled=True,
-                path='/ipfs/QmUNLLsPACCz1vLxQVkXqqLX5R1X345qqfHbsf67hvA3Nn',
-                healthy_http_codes='200,301,302,303,304,307,308',
-            ),
+            health_check=_gateway_health_check,
+            slow_start=_gateway_slow_start,
+            deregistration_delay=_deregistration_delay,
             vpc=_vpc
         )
 
+        # With cross-zone load balancing off, each ALB node only sends the
+        # gateway requests to the tasks of its own AZ
+        if (ipfs_cluster_env.get('GATEWAY_CROSS_ZONE') or
+                'True').upper() != 'TRUE':
+            _alb_ipfs_gateway_target_group.set_attribute(
+                'load_balancing.cross_zone.enabled', 'false')
+
         _alb_ipfs_gateway_listener = _alb_ipfs_cluster.add_listener(
             'AlbIpfsGatewayListner',
             open=False,
@@ -191,18 +297,164 @@ class IpfsClusterFargateStack(Stack):
             default_target_groups=[_alb_ipfs_gateway_target_group]
         )
 
+        # Optional internal load balancer for the ipfs-cluster REST API
+        # (9094) and the Kubo RPC API (5001). Clients in the VPC, such as
+        # ingestion workers, skip CloudFront and the public ALB.
+        _internal_api = ipfs_cluster_env.get(
+            'INTERNAL_API', 'False').upper() == 'TRUE'
+        _internal_api_load_balancer = (ipfs_cluster_env.get(
+            'INTERNAL_API_LOAD_BALANCER') or 'alb').lower()
+        if _internal_api_load_balancer not in ('alb', 'nlb'):
+            raise ValueError(
+                f'Invalid INTERNAL_API_LOAD_BALANCER '
+                f'{_internal_api_load_balancer!r}, expected one of '
+                f"['alb', 'nlb']")
+        _internal_api_idle_timeout = int(
+            ipfs_cluster_env.get('INTERNAL_API_IDLE_TIMEOUT_SECONDS') or 600)
+        if not 1 <= _internal_api_idle_timeout <= 4000:
+            raise ValueError(
+                f'INTERNAL_API_IDLE_TIMEOUT_SECONDS must be between 1 and '
+                f'4000, got {_internal_api_idle_timeout}')
+
+        _internal_api_listeners = []
+        _internal_cluster_target_group = None
+        _internal_rpc_target_group = None
+        _internal_api_environment = {}
+        if _internal_api and _internal_api_load_balancer == 'alb':
+            _alb_internal_api_sg = ec2.SecurityGroup(
+                self, 'AlbInternalApiSecurityGroup',
+                allow_all_outbound=False,
+                vpc=_vpc,
+                description='Inbound/Outbound rules for the internal ALB in '
+                'front of IPFS Cluster REST API and IPFS RPC API'
+            )
+
+            for _port in (9094, 5001):
+                _alb_internal_api_sg.add_ingress_rule(
+                    peer=ec2.Peer.ipv4(_vpc.vpc_cidr_block),
+                    connection=ec2.Port.tcp(_port),
+                    description=f'Allow connection on port {_port} '
+                    'from internal network'
+                )
+
+            # Long add streams must not be cut by the idle timeout
+            _alb_internal_api = elbv2.ApplicationLoadBalancer(
+                self, 'AlbInternalApi',
+                vpc=_vpc,
+                internet_facing=False,
+                security_group=_alb_internal_api_sg,
+                idle_timeout=Duration.seconds(_internal_api_idle_timeout)
+            )
+            _internal_api_dns_name = _alb_internal_api.load_balancer_dns_name
+
+            _internal_cluster_target_group = elbv2.ApplicationTargetGroup(
+                self, 'AlbInternalClusterTargetGroup',
+                target_type=elbv2.TargetType.IP,
+                port=9094,
+                protocol=elbv2.ApplicationProtocol.HTTP,
+                health_check=_cluster_health_check,
+                deregistration_delay=_deregistration_delay,
+                vpc=_vpc
+            )
+
+            _internal_rpc_target_group = elbv2.ApplicationTargetGroup(
+                self, 'AlbInternalRpcTargetGroup',
+                target_type=elbv2.TargetType.IP,
+                port=5001,
+                protocol=elbv2.ApplicationProtocol.HTTP,
+                health_check=_rpc_health_check,
+                deregistration_delay=_deregistration_delay,
+                vpc=_vpc
+            )
+
+            _internal_api_listeners = [
+                _alb_internal_api.add_listener(
+                    'AlbInternalClusterListener',
+                    port=9094,
+                    open=False,
+                    protocol=elbv2.ApplicationProtocol.HTTP,
+                    default_target_groups=[_internal_cluster_target_group]
+                ),
+                _alb_internal_api.add_listener(
+                    'AlbInternalRpcListener',
+                    port=5001,
+                    open=False,
+                    protocol=elbv2.ApplicationProtocol.HTTP,
+                    default_target_groups=[_internal_rpc_target_group]
+                ),
+            ]
+
+            # Keep-alive connections must be closed by the ALB first,
+            # ipfs-cluster closes idle connections after 120s by default
+            _internal_api_environment['CLUSTER_RESTAPI_IDLETIMEOUT'] = \
+                f'{_internal_api_idle_timeout + 60}s'
+
+        elif _internal_api:
+            # TCP passthrough, the NLB idle timeout is 350 seconds
+            _nlb_internal_api = elbv2.NetworkLoadBalancer(
+                self, 'NlbInternalApi',
+                vpc=_vpc,
+                internet_facing=False,
+                cross_zone_enabled=True
+            )
+            _internal_api_dns_name = _nlb_internal_api.load_balancer_dns_name
+
+            _internal_cluster_target_group = elbv2.NetworkTargetGroup(
+                self, 'NlbInternalClusterTargetGroup',
+                target_type=elbv2.TargetType.IP,
+                port=9094,
+                protocol=elbv2.Protocol.TCP,
+                deregistration_delay=_deregistration_delay,
+                vpc=_vpc
+            )
+
+            _internal_rpc_target_group = elbv2.NetworkTargetGroup(
+                self, 'NlbInternalRpcTargetGroup',
+                target_type=elbv2.TargetType.IP,
+                port=5001,
+                protocol=elbv2.Protocol.TCP,
+                deregistration_delay=_deregistration_delay,
+                vpc=_vpc
+            )
+
+            _internal_api_listeners = [
+                _nlb_internal_api.add_listener(
+                    'NlbInternalClusterListener',
+                    port=9094,
+                    default_target_groups=[_internal_cluster_target_group]
+                ),
+                _nlb_internal_api.add_listener(
+                    'NlbInternalRpcListener',
+                    port=5001,
+                    default_target_groups=[_internal_rpc_target_group]
+                ),
+            ]
+
         # Secruity Group for IPFS Fargate Services
         _ipfs_srv_sg = ec2.SecurityGroup(self, 'IpfsServiceSecurityGroup',
                                          vpc=_vpc,
                                          description='Allow access to IPFS nodes'
                                          )
 
+        # QUIC and WebTransport share the swarm port over UDP
+        # (docker/003-config_swarm.sh)
+        _swarm = get_swarm_config(
+            ipfs_cluster_env,
+            announce_public_ip=not _network.private_subnets)
+
         _ipfs_srv_sg.add_ingress_rule(
             peer=ec2.Peer.any_ipv4(),
-            connection=ec2.Port.tcp(4001),
+            connection=ec2.Port.tcp(SWARM_PORT),
             description='IPFS swarm port open to the Internet'
         )
 
+        if _swarm.udp:
+            _ipfs_srv_sg.add_ingress_rule(
+                peer=ec2.Peer.any_ipv4(),
+                connection=ec2.Port.udp(SWARM_PORT),
+                description='IPFS swarm QUIC port open to the Internet'
+            )
+
         _ipfs_srv_sg.add_ingress_rule(
             peer=ec2.Peer.ipv4(_vpc.vpc_cidr_block),
             connection=ec2.Port.tcp(9096),
@@ -229,6 +481,15 @@ class IpfsClusterFargateStack(Stack):
             description='IPFS Cluster HTTP API from ALB security group only'
         )
 
+        if _internal_api and _internal_api_load_balancer == 'nlb':
+            # The NLB has no security group, connections come from its
+            # private IP addresses
+            _ipfs_srv_sg.add_ingress_rule(
+                peer=ec2.Peer.ipv4(_vpc.vpc_cidr_block),
+                connection=ec2.Port.tcp(9094),
+                description='IPFS Cluster HTTP API from the internal NLB'
+            )
+
         # Private Discovery service for IPFS Nodes
         _private_namespace = cloudmap.PrivateDnsNamespace(
             self, 'FargateServicePrivateDNS',
@@ -237,17 +498,85 @@ class IpfsClusterFargateStack(Stack):
             description='Private Discovery service for IPFS Kubo Fargate Srv'
         )
 
+        # A short TTL and the ECS task health (custom health check) make a
+        # replaced task reachable by name within seconds
+        _cloud_map_dns_ttl = Duration.seconds(
+            int(ipfs_cluster_env.get('CLOUD_MAP_DNS_TTL_SECONDS') or 10))
+        _cloud_map_failure_threshold = int(
+            ipfs_cluster_env.get('CLOUD_MAP_FAILURE_THRESHOLD') or 1)
+        _cloud_map_srv_records = ipfs_cluster_env.get(
+            'CLOUD_MAP_SRV_RECORDS', 'False').upper() == 'TRUE'
+
+        # /ipfs/<CID> responses are content-addressed and immutable, cache
+        # them for a long time with a cache key free of query strings,
+        # headers and cookies. Range requests are served by CloudFront from
+        # the cached object, so Range is not part of the cache key.
+        _cf_ipfs_ttl_days = int(
+            ipfs_cluster_env.get('CLOUDFRONT_IPFS_TTL_DAYS') or 365)
+        # CloudFront rejects a max TTL below the 1 day min TTL
+        if _cf_ipfs_ttl_days < 1:
+            raise ValueError(
+                f'Invalid CLOUDFRONT_IPFS_TTL_DAYS {_cf_ipfs_ttl_days!r}, '
+                f'expected at least 1')
+        _cf_ipfs_cache_policy = cloudfront.CachePolicy(
+            self, 'CloudfrontIpfsCachePolicy',
+            comment='Immutable content-addressed IPFS Gateway /ipfs/ paths',
+            default_ttl=Duration.days(_cf_ipfs_ttl_days),
+            max_ttl=Duration.days(_cf_ipfs_ttl_days),
+            min_ttl=Duration.days(1),
+            cookie_behavior=cloudfront.CacheCookieBehavior.none(),
+            header_behavior=cloudfront.CacheHeaderBehavior.none(),
+            query_string_behavior=cloudfront.CacheQueryStringBehavior.none(),
+            enable_accept_encoding_gzip=True,
+            enable_accept_encoding_brotli=True,
+        )
+
+        # /ipns/ names are mutable, only cache them briefly
+        _cf_ipns_cache_policy = cloudfront.CachePolicy(
+            self, 'CloudfrontIpnsCachePolicy',
+            comment='Mutable IPFS Gateway /ipns/ paths',
+            default_ttl=Duration.seconds(
+                int(ipfs_cluster_env.get('CLOUDFRONT_IPNS_TTL_SECONDS') or 60)),
+            max_ttl=Duration.seconds(
+                int(ipfs_cluster_env.get('CLOUDFRONT_IPNS_TTL_SECONDS') or 60)),
+            min_ttl=Duration.seconds(0),
+            cookie_behavior=cloudfront.CacheCookieBehavior.none(),
+            header_behavior=cloudfront.CacheHeaderBehavior.none(),
+            query_string_behavior=cloudfront.CacheQueryStringBehavior.none(),
+            enable_accept_encoding_gzip=True,
+            enable_accept_encoding_brotli=True,
+        )
+
+        # Optional Origin Shield in front of the ALB
+        _cf_ipfs_gw_origin = origins.LoadBalancerV2Origin(
+            _alb_ipfs_cluster,
+            protocol_policy=cloudfront.OriginProtocolPolicy.HTTP_ONLY,
+            origin_shield_region=ipfs_cluster_env.get(
+                'CLOUDFRONT_ORIGIN_SHIELD_REGION') or None
+        )
+
         # Create Cloudfront for IPFS Gateway port 80
         _cf_ipfs_gw = cloudfront.Distribution(
             self, 'CloudfrontIpfsGateway',
             default_behavior=cloudfront.BehaviorOptions(
-                origin=origins.LoadBalancerV2Origin(
-                    _alb_ipfs_cluster,
-                    protocol_policy=cloudfront.OriginProtocolPolicy.HTTP_ONLY
-                ),
+                origin=_cf_ipfs_gw_origin,
                 viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
                 cache_policy=cloudfront.CachePolicy.CACHING_OPTIMIZED,
-            )
+            ),
+            additional_behaviors={
+                '/ipfs/*': cloudfront.BehaviorOptions(
+                    origin=_cf_ipfs_gw_origin,
+                    viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                    cache_policy=_cf_ipfs_cache_policy,
+                    compress=True,
+                ),
+                '/ipns/*': cloudfront.BehaviorOptions(
+                    origin=_cf_ipfs_gw_origin,
+                    viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                    cache_policy=_cf_ipns_cache_policy,
+                    compress=True,
+                ),
+            }
         )
 
         # Create Cloudfront for IPFS Cluster port 9094
@@ -266,308 +595,597 @@ class IpfsClusterFargateStack(Stack):
             )
         )
 
+        # EFS throughput, performance and lifecycle settings
+        _efs_performance = get_efs_performance(
+            ipfs_cluster_env,
+            one_zone=ipfs_cluster_env['ONE_ZONE_EFS'].upper() == 'TRUE'
+        )
+        _efs_props = dict(
+            performance_mode=efs.PerformanceMode.MAX_IO
+            if _efs_performance.performance_mode == 'maxIO'
+            else efs.PerformanceMode.GENERAL_PURPOSE,
+            throughput_mode=efs.ThroughputMode.PROVISIONED
+            if _efs_performance.throughput_mode == 'provisioned'
+            else None,
+            provisioned_throughput_per_second=cdk.Size.mebibytes(
+                _efs_performance.provisioned_throughput_mibps)
+            if _efs_performance.throughput_mode == 'provisioned'
+            else None,
+            lifecycle_policy=efs.LifecyclePolicy[
+                _efs_performance.lifecycle_policy]
+            if _efs_performance.lifecycle_policy else None,
+            out_of_infrequent_access_policy=efs.OutOfInfrequentAccessPolicy[
+                _efs_performance.out_of_infrequent_access_policy]
+            if _efs_performance.out_of_infrequent_access_policy else None,
+        )
+
         # Create multi-zone EFS if ONE_ZONE_EFS is FALSE
+        # It is shared by the peers of every AZ
         if ipfs_cluster_env['ONE_ZONE_EFS'].upper() == 'FALSE':
             _fs = efs.FileSystem(
                 self, 'IpfsMultiZoneEfs',
                 vpc=_vpc,
+                vpc_subnets=ec2.SubnetSelection(
+                    subnet_type=ec2.SubnetType.PUBLIC
+                ),
                 security_group=_efs_sg,
+                **_efs_props
             )
 
-        # Create Fargate Services and related Task/Container
+        # EFS file system used by the peers of each AZ
+        _efs_per_az = {}
         for i in range(len(_vpc.availability_zones)):
-            for j in range(int(ipfs_cluster_env['NODE_PER_AZ'])):
-                _ipfs_config_path = '/IpfsKuboEfsAp'+str(i)
-                _ipfs_cluster_config_path = '/IpfsClusterEfsAp'+str(i)
-                # Create EFS and access point on each subnet
-                # Create One-Zone EFS file system
-                # https://github.com/aws/aws-cdk/issues/15864
-                # if self._parameter_efs_one_zone.value_as_string.upper() == 'TRUE':
-                if ipfs_cluster_env['ONE_ZONE_EFS'].upper() == 'TRUE':
-                    _fs = efs.FileSystem(
-                        self, 'IpfsEfs'+str(i),
-                        vpc=_vpc,
-                        vpc_subnets=ec2.SubnetSelection(
-                            availability_zones=[_vpc.availability_zones[i]],
-                            one_per_az=True,
-                            subnet_type=ec2.SubnetType.PUBLIC
-                        ),
-                        security_group=_efs_sg,
-                    )
-                    _cfn_efs = _fs.node.default_child
-                    _cfn_efs.availability_zone_name = _vpc.availability_zones[i]
-
-                # Apply EFS removal policy
-                if ipfs_cluster_env['EFS_REMOVE_ON_DELETE'].upper() == 'TRUE':
-                    _fs.apply_removal_policy(
-                        cdk.RemovalPolicy.DESTROY
-                    )
-                else:
-                    _fs.apply_removal_policy(
-                        cdk.RemovalPolicy.RETAIN
-                    )
-
-                # ipfs uid = 1000
-                # ipfs gid = 100 (users)
-                # https://github.com/ipfs/kubo/blob/master/Dockerfile
-                # https://github.com/ipfs-cluster/ipfs-cluster/blob/master/Dockerfile
-                _ipfs_uid = '1000'
-                _ipfs_gid = '100'
-
-                _kubo_efs_ap = _fs.add_access_point(
-                    'IpfsKuboAp'+str(i),
-                    create_acl=efs.Acl(
-                        owner_uid=_ipfs_uid,
-                        owner_gid=_ipfs_gid,
-                        permissions='755'
+            # Create One-Zone EFS file system on each subnet
+            # It is shared by the peers of the AZ
+            # https://github.com/aws/aws-cdk/issues/15864
+            # if self._parameter_efs_one_zone.value_as_string.upper() == 'TRUE':
+            if ipfs_cluster_env['ONE_ZONE_EFS'].upper() == 'TRUE':
+                _fs = efs.FileSystem(
+                    self, 'IpfsEfs'+str(i),
+                    vpc=_vpc,
+                    vpc_subnets=ec2.SubnetSelection(
+                        availability_zones=[_vpc.availability_zones[i]],
+                        one_per_az=True,
+                        subnet_type=ec2.SubnetType.PUBLIC
                     ),
-                    # enforce the POSIX identity
-                    posix_user=efs.PosixUser(
-                        uid=_ipfs_uid,
-                        gid=_ipfs_gid
-                    ),
-                    path=_ipfs_config_path
+                    security_group=_efs_sg,
+                    **_efs_props
                 )
+                _cfn_efs = _fs.node.default_child
+                _cfn_efs.availability_zone_name = _vpc.availability_zones[i]
 
-                _cluster_efs_ap = _fs.add_access_point(
-                    'IpfsClusterAp'+str(i),
-                    create_acl=efs.Acl(
-                        owner_uid=_ipfs_uid,
-                        owner_gid=_ipfs_gid,
-                        permissions='755'
-                    ),
-                    # enforce the POSIX identity
-                    posix_user=efs.PosixUser(
-                        uid=_ipfs_uid,
-                        gid=_ipfs_gid
-                    ),
-                    path=_ipfs_cluster_config_path
-                )
+            _efs_per_az[i] = _fs
 
-                # Create ECS Fargate Task Definition
-                _task = ecs.FargateTaskDefinition(
-                    self, 'IpfsFargateTask'+str(i),
-                    # compatibility=ecs.Compatibility.FARGATE,
-                    cpu=1024,
-                    memory_limit_mib=2048,
-                    runtime_platform=ecs.RuntimePlatform(
-                        operating_system_family=ecs.OperatingSystemFamily.LINUX,
-                        cpu_architecture=ecs.CpuArchitecture.X86_64
-                    ),
-                    volumes=[
-                        ecs.Volume(
-                            name='IpfsSrvTaskKuboVol'+str(i),
-                            efs_volume_configuration=ecs.EfsVolumeConfiguration(
-                                file_system_id=_fs.file_system_id,
-                                transit_encryption='ENABLED',
-                                authorization_config=ecs.AuthorizationConfig(
-                                    access_point_id=_kubo_efs_ap.access_point_id,
-                                    iam='ENABLED'
-                                )
-                            )
-                        ),
-                        ecs.Volume(
-                            name='IpfsSrvTaskClusterVol'+str(i),
-                            efs_volume_configuration=ecs.EfsVolumeConfiguration(
-                                file_system_id=_fs.file_system_id,
-                                transit_encryption='ENABLED',
-                                authorization_config=ecs.AuthorizationConfig(
-                                    access_point_id=_cluster_efs_ap.access_point_id,
-                                    iam='ENABLED'
-                                )
-                            )
-                        )
-                    ],
+        for _fs in dict.fromkeys(_efs_per_az.values()):
+            # Apply EFS removal policy
+            if ipfs_cluster_env['EFS_REMOVE_ON_DELETE'].upper() == 'TRUE':
+                _fs.apply_removal_policy(
+                    cdk.RemovalPolicy.DESTROY
+                )
+            else:
+                _fs.apply_removal_policy(
+                    cdk.RemovalPolicy.RETAIN
                 )
 
-                # Add EFS dependence
-                _task.node.add_dependency(_fs)
+            # The elastic throughput mode is not modeled by aws-cdk-lib yet
+            if _efs_performance.throughput_mode == 'elastic':
+                _fs.node.default_child.throughput_mode = 'elastic'
 
-                # Add IPFS Gateway ALB Listener dependence
-                _task.node.add_dependency(_alb_ipfs_gateway_listener)
+            self._add_efs_alarms(_fs, _efs_performance, ipfs_cluster_env)
 
-                # Add IPFS Cluster ALB Listener dependence
-                _task.node.add_dependency(_alb_ipfs_cluster_listener)
+        # Lay out NODE_PER_AZ peers on every AZ. Every peer gets its own
+        # access points, task definition, service, Cloud Map service and
+        # peer name derived from its global peer index.
+        _peer_layout = get_peer_layout(
+            len(_vpc.availability_zones),
+            int(ipfs_cluster_env['NODE_PER_AZ'])
+        )
+        validate_network_config(_network, len(_peer_layout))
 
-                # Create ECS Fargate Service
-                _ipfs_srv = ecs.FargateService(self, 'IpfsSrv'+str(i),
-                                               cluster=_ecs_cluster,
-                                               task_definition=_task,
-                                               assign_public_ip=True,
-                                               vpc_subnets=ec2.SubnetSelection(
-                    availability_zones=[_vpc.availability_zones[i]],
-                    one_per_az=True,
+        # Tasks in private subnets get their swarm port published on their
+        # own listener port of an internet-facing NLB (docker/003-config_swarm.sh
+        # announces it)
+        _swarm_load_balancer = None
+        if _network.private_subnets:
+            _swarm_load_balancer = elbv2.NetworkLoadBalancer(
+                self, 'NlbSwarm',
+                vpc=_vpc,
+                internet_facing=True,
+                cross_zone_enabled=True,
+                vpc_subnets=ec2.SubnetSelection(
                     subnet_type=ec2.SubnetType.PUBLIC
-                ),
-                    security_groups=[_ipfs_srv_sg],
-                    enable_execute_command=True if ipfs_cluster_env['ECS_EXEC'].upper(
-                ) == 'TRUE' else False,
-                    cloud_map_options=ecs.CloudMapOptions(
-                        cloud_map_namespace=_private_namespace,
-                        # Create A records - useful for AWSVPC network mode.
-                        dns_record_type=cloudmap.DnsRecordType.A,
-                        dns_ttl=Duration.seconds(600),
-                        # name='IpfsSrv'+str(i)
-                ),
-                    max_healthy_percent=100,
-                    min_healthy_percent=0
                 )
+            )
+
+        # serial: the follower services are only created once the bootstrap
+        # peer service is stable.
+        # parallel: every service is created at once. The first peer of
+        # each AZ is a seed peer with a well-known identity (ClusterId<i>
+        # and ClusterPrivateKey<i> parameters, ClusterId for peer 0), every
+        # peer keeps the seed peers in its peerstore and joins through any
+        # of them that is up.
+        _bootstrap_mode = (ipfs_cluster_env.get('CLUSTER_BOOTSTRAP_MODE') or
+                           'serial').lower()
+        if _bootstrap_mode not in ('serial', 'parallel'):
+            raise ValueError(
+                f'Invalid CLUSTER_BOOTSTRAP_MODE {_bootstrap_mode!r}, '
+                f"expected one of ['serial', 'parallel']")
+        _seed_identities = {}
+        if _bootstrap_mode == 'parallel':
+            _seed_identities = {
+                _peer.index: self._define_seed_identity(_peer.index)
+                for _peer in _peer_layout
+                if _peer.node_index == 0 and not _peer.is_bootstrap
+            }
+
+        # Fargate sizing profile of the peer tasks. The cdk context
+        # (-c task_size=large) takes precedence over ipfscluster.env.
+        # The bootstrap peer can be sized differently from the followers.
+        _task_size_profile = self.node.try_get_context('task_size') or \
+            ipfs_cluster_env.get('TASK_SIZE') or 'small'
+        _task_size = get_task_size(ipfs_cluster_env, _task_size_profile)
+        _bootstrap_task_size = get_task_size(
+            ipfs_cluster_env,
+            self.node.try_get_context('bootstrap_task_size') or
+            ipfs_cluster_env.get('BOOTSTRAP_TASK_SIZE') or
+            _task_size_profile
+        )
+
+        # Replication, pin tracker concurrency, CRDT batching and allocator
+        # of every peer. The presets follow the follower task size. CRDT
+        # batching delays the pins on the other peers: it stays off unless
+        # PINNING_PROFILE or the CRDT_BATCHING_* settings ask for it.
+        _pinning_config = get_pinning_config(
+            ipfs_cluster_env,
+            ipfs_cluster_env.get('PINNING_PROFILE') or
+            pinning_profile(_task_size_profile, _task_size),
+            len(_peer_layout),
+            crdt_batching=bool(ipfs_cluster_env.get('PINNING_PROFILE'))
+        )
+
+        # X86_64 or ARM64 (Graviton) tasks. Custom images must be built for
+        # the selected architecture (docker/README.md).
+        _cpu_architectures = {
+            'X86_64': ecs.CpuArchitecture.X86_64,
+            'ARM64': ecs.CpuArchitecture.ARM64,
+        }
+        _cpu_architecture = (ipfs_cluster_env.get('TASK_CPU_ARCHITECTURE') or
+                             'X86_64').upper()
+        if _cpu_architecture not in _cpu_architectures:
+            raise ValueError(
+                f'Invalid TASK_CPU_ARCHITECTURE {_cpu_architecture!r}, '
+                f'expected one of {list(_cpu_architectures)}')
+        _runtime_platform = ecs.RuntimePlatform(
+            operating_system_family=ecs.OperatingSystemFamily.LINUX,
+            cpu_architecture=_cpu_architectures[_cpu_architecture]
+        )
+
+        # Kubo image of the cluster peers. Build it from docker/Dockerfile_efs
+        # to clean up the repo locks and use the block cache.
+        _kubo_image = ipfs_cluster_env.get('KUBO_IMAGE') or 'ipfs/kubo:master-latest'
+        _kubo_image_repository = _kubo_image.split('@')[0]
+        if ':' in _kubo_image_repository.rsplit('/', 1)[-1]:
+            _kubo_image_repository = _kubo_image_repository.rsplit(':', 1)[0]
+        _custom_kubo_image = \
+            _kubo_image_repository not in STOCK_KUBO_IMAGE_REPOSITORIES
+        # Content routing and reproviding of every Kubo node. The
+        # accelerated DHT client needs a large task, a smaller one only
+        # gets a synth warning so a test cluster can still try it.
+        _routing = get_routing_config(ipfs_cluster_env)
+        if _routing != RoutingConfig() and not _custom_kubo_image:
+            self._warn_stock_kubo_image(
+                _kubo_image, 'KUBO_ROUTING_PROFILE / KUBO_REPROVIDER_STRATEGY',
+                'docker/Dockerfile_efs or docker/Dockerfile_s3')
+        for _size in dict.fromkeys([_task_size, _bootstrap_task_size]):
+            self._warn_routing_task_size(
+                _routing, _size.kubo_cpu,
+                _size.memory_limit_mib - _size.cluster_memory_reservation_mib)
+
+        if _swarm.transports != SwarmConfig().transports and \
+                not _custom_kubo_image:
+            self._warn_stock_kubo_image(
+                _kubo_image,
+                f'KUBO_SWARM_TRANSPORTS={",".join(_swarm.transports)}',
+                'docker/Dockerfile_efs or docker/Dockerfile_s3')
+
+        _kubo_environment = dict(swarm_environment(_swarm),
+                                 **routing_environment(_routing))
+        _kubo_swarm_port_mappings = [ecs.PortMapping(container_port=SWARM_PORT)]
+        if _swarm.udp:
+            _kubo_swarm_port_mappings.append(ecs.PortMapping(
+                container_port=SWARM_PORT, protocol=ecs.Protocol.UDP))
+
+        # Read-through block cache on the task ephemeral storage in front
+        # of the EFS flatfs datastore. The ephemeral storage keeps 20 GiB
+        # for the container images on top of the cache. The stock image has
+        # no cache: no paid ephemeral storage for it.
+        _block_cache = ipfs_cluster_env.get(
+            'KUBO_BLOCK_CACHE', 'False').upper() == 'TRUE'
+        if _block_cache and not _custom_kubo_image:
+            self._warn_stock_kubo_image(
+                _kubo_image, 'KUBO_BLOCK_CACHE', 'docker/Dockerfile_efs')
+        elif _block_cache:
+            _block_cache_size_gib = int(
+                ipfs_cluster_env.get('KUBO_BLOCK_CACHE_SIZE_GIB') or 20)
+            _kubo_environment['KUBO_BLOCK_CACHE'] = 'true'
+            _kubo_environment['KUBO_BLOCK_CACHE_SIZE_GIB'] = str(
+                _block_cache_size_gib)
+            _task_size = with_ephemeral_storage(
+                _task_size, _block_cache_size_gib + 20)
+            _bootstrap_task_size = with_ephemeral_storage(
+                _bootstrap_task_size, _block_cache_size_gib + 20)
+
+        # Kubo sizes its resource and connection managers from the
+        # KUBO_TASK_CPU / KUBO_MEMORY_MIB variables and the open files limit
+        # (docker/002-config_resources.sh)
+        if not _custom_kubo_image:
+            self._warn_stock_kubo_image(
+                _kubo_image, 'Sizing the Kubo resource and connection '
+                'managers to the task size',
+                'docker/Dockerfile_efs or docker/Dockerfile_s3')
+        _kubo_nofile_ulimit = ecs.Ulimit(
+            name=ecs.UlimitName.NOFILE,
+            soft_limit=65536,
+            hard_limit=65536
+        )
+
+        # Served from the CID itself: a slow EFS does not get a live Kubo
+        # node replaced
+        _kubo_health_check = ecs.HealthCheck(
+            command=[KUBO_LIVENESS_COMMAND]
+        )
+
+        _enable_execute_command = ipfs_cluster_env['ECS_EXEC'].upper() == 'TRUE'
+
+        # IAM roles and log group are shared by the tasks of every peer
+        # so the stack stays under the CloudFormation resource limit
+        # when NODE_PER_AZ is increased
+        _task_execution_role = iam.Role(
+            self, 'IpfsTaskExecutionRole',
+            assumed_by=iam.ServicePrincipal('ecs-tasks.amazonaws.com')
+        )
+
+        _task_role = iam.Role(
+            self, 'IpfsTaskRole',
+            assumed_by=iam.ServicePrincipal('ecs-tasks.amazonaws.com')
+        )
+
+        _log_group = logs.LogGroup(
+            self, 'IpfsLogGroup',
+            retention=logs.RetentionDays.INFINITE,
+            removal_policy=cdk.RemovalPolicy.RETAIN
+        )
+
+        # Grant EFS access policy
+        for _fs in dict.fromkeys(_efs_per_az.values()):
+            _fs.grant(
+                _task_execution_role,
+                'elasticfilesystem:*'
+            )
+
+        # Images built from docker/Dockerfile_efs log a kubo_ready event
+        # with the time from the container start to the gateway answering,
+        # waiting for the repo lease of a previous task included. The
+        # stock image never logs it.
+        _restart_to_ready_metric = None
+        if _custom_kubo_image:
+            _restart_to_ready_metric = _log_group.add_metric_filter(
+                'KuboRestartToReadyMetricFilter',
+                filter_pattern=logs.FilterPattern.string_value(
+                    '$.event', '=', 'kubo_ready'),
+                metric_namespace=ipfs_cluster_env.get(
+                    'METRICS_NAMESPACE') or 'IPFS',
+                metric_name='KuboRestartToReadySeconds',
+                metric_value='$.restart_to_ready_seconds'
+            ).metric(statistic='Maximum', period=Duration.minutes(5))
 
-                # Add kubo container
-                _kubo_container = _task.add_container(
-                    'IpfsKuboNode'+str(i),
-                    image=ecs.ContainerImage.from_registry('ipfs/kubo:master-latest'),
-                    port_mappings=[
-                        ecs.PortMapping(container_port=4001),
-                        ecs.PortMapping(container_port=5001),
-                        ecs.PortMapping(container_port=8080),
-                    ],
-                    health_check=ecs.HealthCheck(
-                        command=['/usr/local/bin/ipfs dag stat '
-                                 '/ipfs/QmUNLLsPACCz1vLxQVkXqqLX5R1X345qqfHbsf67hvA3Nn'
-                                 ' || exit 1 ']
+        # Verify every block of the repo in the background once the daemon
+        # is up, after a restart
+        if ipfs_cluster_env.get('KUBO_REPO_VERIFY', 'False').upper() == 'TRUE':
+            _kubo_environment['KUBO_REPO_VERIFY'] = 'true'
+
+        # Optional warm-up of the Kubo blockstore with the hot content
+        # (docker/prefetch.sh) before the gateway replicas, or every task,
+        # report healthy. The hot list comes from an S3 environment file
+        # read by ECS or from a list published on IPFS.
+        _prefetch = get_prefetch_config(ipfs_cluster_env)
+        if _prefetch and _prefetch.tasks == 'gateway' and \
+                ipfs_cluster_env.get('GATEWAY_TIER', 'False').upper() != 'TRUE':
+            raise ValueError('KUBO_PREFETCH=gateway needs GATEWAY_TIER=True, '
+                             'use KUBO_PREFETCH=all to warm the peers up')
+        # The stock image never creates the warm-up marker: the health check
+        # would pass right away after a longer start period
+        if _prefetch and not _custom_kubo_image:
+            self._warn_stock_kubo_image(
+                _kubo_image, f'KUBO_PREFETCH={_prefetch.tasks}',
+                'docker/Dockerfile_efs')
+            _prefetch = None
+        _prefetch_environment = {}
+        _prefetch_environment_files = []
+        _prefetch_health_check = _kubo_health_check
+        if _prefetch:
+            _prefetch_environment = prefetch_environment(_prefetch)
+            _prefetch_health_check = ecs.HealthCheck(
+                command=[KUBO_WARM_COMMAND],
+                start_period=Duration.seconds(
+                    _prefetch.health_check_start_period_seconds)
+            )
+            if _prefetch.s3_bucket:
+                _prefetch_bucket = s3.Bucket.from_bucket_name(
+                    self, 'KuboPrefetchBucket', _prefetch.s3_bucket)
+                _prefetch_bucket.grant_read(
+                    _task_execution_role, _prefetch.s3_key)
+                _prefetch_environment_files.append(
+                    ecs.EnvironmentFile.from_bucket(
+                        _prefetch_bucket, _prefetch.s3_key))
+
+        _peer_kubo_environment_files = []
+        _peer_kubo_health_check = _kubo_health_check
+        if _prefetch and _prefetch.tasks == 'all':
+            _kubo_environment.update(_prefetch_environment)
+            _peer_kubo_environment_files = _prefetch_environment_files
+            _peer_kubo_health_check = _prefetch_health_check
+
+        # Optional AWS Distro for OpenTelemetry sidecar publishing the Kubo
+        # and ipfs-cluster Prometheus metrics to CloudWatch
+        _metrics_sidecar = ipfs_cluster_env.get(
+            'METRICS_SIDECAR', 'False').upper() == 'TRUE'
+        _cluster_metrics_environment = {}
+        _metrics_namespace = None
+        _metrics_log_group = None
+        if _metrics_sidecar:
+            _metrics_namespace = ipfs_cluster_env.get(
+                'METRICS_NAMESPACE') or 'IPFS'
+            _metrics_log_group = logs.LogGroup(
+                self, 'IpfsMetricsLogGroup',
+                retention=logs.RetentionDays.ONE_MONTH,
+                removal_policy=cdk.RemovalPolicy.DESTROY
+            )
+            _metrics_log_group.grant_write(_task_role)
+            _cluster_metrics_environment = cluster_metrics_environment()
+
+        # Optional gateway tier: stateless Kubo-only replicas registered
+        # to the ALB gateway target group. They scale on ALB request count,
+        # CPU and target response time while the cluster peers stay fixed.
+        _gateway_kubo_container = None
+        if ipfs_cluster_env.get('GATEWAY_TIER', 'False').upper() == 'TRUE':
+            _gateway_task_size = get_task_size(
+                ipfs_cluster_env,
+                ipfs_cluster_env.get('GATEWAY_TASK_SIZE') or _task_size_profile
+            )
+            self._warn_routing_task_size(
+                _routing, _gateway_task_size.cpu,
+                _gateway_task_size.memory_limit_mib)
+
+            _gateway_task = ecs.FargateTaskDefinition(
+                self, 'IpfsGatewayTask',
+                cpu=_gateway_task_size.cpu,
+                memory_limit_mib=_gateway_task_size.memory_limit_mib,
+                ephemeral_storage_gib=_gateway_task_size.ephemeral_storage_gib,
+                execution_role=_task_execution_role,
+                task_role=_task_role,
+                runtime_platform=_runtime_platform,
+            )
+
+            # Add IPFS Gateway ALB Listener dependence
+            _gateway_task.node.add_dependency(_alb_ipfs_gateway_listener)
+
+            # The gateway repo lives on the task ephemeral storage,
+            # content is fetched over bitswap from the cluster peers. The
+            # replicas peer with the cluster Kubo nodes, on their private
+            # IPs (docker/004-config_peering.sh).
+            _gateway_kubo_container = _gateway_task.add_container(
+                'IpfsKuboGateway',
+                image=ecs.ContainerImage.from_registry(_kubo_image),
+                stop_timeout=_stop_timeout,
+                port_mappings=[
+                    *_kubo_swarm_port_mappings,
+                    ecs.PortMapping(container_port=8080),
+                ],
+                environment=dict(
+                    {'IPFS_PROFILE': 'server'},
+                    **gateway_peering_environment(_vpc_cidr),
+                    **swarm_environment(_swarm),
+                    **routing_environment(_routing),
+                    **kubo_resources_environment(
+                        _gateway_task_size.cpu,
+                        _gateway_task_size.memory_limit_mib
                     ),
-                    logging=ecs.LogDriver.aws_logs(
-                        stream_prefix='IpfsKuboNode'+str(i)
-                    )
+                    **_prefetch_environment
+                ),
+                environment_files=_prefetch_environment_files or None,
+                health_check=_prefetch_health_check,
+                logging=ecs.LogDriver.aws_logs(
+                    stream_prefix='IpfsKuboGateway',
+                    log_group=_log_group
                 )
+            )
 
-                _kubo_container.add_mount_points(
-                    ecs.MountPoint(
-                        container_path='/data/ipfs',
-                        read_only=False,
-                        source_volume='IpfsSrvTaskKuboVol'+str(i)
-                    )
-                )
+            _gateway_kubo_container.add_ulimits(_kubo_nofile_ulimit)
 
-                # Add ipfs-cluster container
-                _container_name = 'IpfsCluster'+str(i)
-
-                # The first ipfs-cluster service will be bootstrap server
-                if i == 0:
-                    # Other service should wait for first service is ready
-                    # since it is the bootstrap server
-                    _first_ipfs_service = _ipfs_srv
-                    # Retrive first service cloudmap
-                    # since the first IPFS node will be the bootstrap server
-                    # for other IPFS cluster node
-                    _first_cloudmap_service = _ipfs_srv.cloud_map_service
-                    _ipfs_cluster_container = _task.add_container(
-                        _container_name,
-                        image=ecs.ContainerImage.from_registry(
-                            'ipfs/ipfs-cluster:latest'
-                        ),
-                        port_mappings=[
-                            ecs.PortMapping(container_port=9096),
-                            ecs.PortMapping(container_port=9094),
-                        ],
-                        health_check=ecs.HealthCheck(
-                            command=['/usr/local/bin/ipfs-cluster-ctl --force-http --basic-auth ' +
-                                     self._parameter_ipfs_cluster_api_credential.value_as_string + ' || exit 1 ']
-                        ),
-                        logging=ecs.LogDriver.aws_logs(
-                            stream_prefix=_container_name
-                        ),
-                        environment_files=[
-                            ecs.EnvironmentFile.from_asset(
-                                './ipfscluster.env',
-                                readers=[_task.execution_role]
-                            ),
-                        ],
-                        environment={
-                            'CLUSTER_PEERNAME': _container_name,
-                            'CLUSTER_ID': _ipfs_cluster_id,
-                        },
-                        secrets={
-                            'CLUSTER_RESTAPI_BASICAUTHCREDENTIALS': _ipfs_cluster_api_credential,
-                            'CLUSTER_SECRET': _ipfs_cluster_secret,
-                            'CLUSTER_PRIVATEKEY': _ipfs_cluster_private_key,
-                        },
-                        command=[
-                            # '-l' ,'debug',
-                            'daemon',
-                        ]
-                    )
-                else:
-                    _ipfs_cluster_container = _task.add_container(
-                        _container_name,
-                        image=ecs.ContainerImage.from_registry(
-                            'ipfs/ipfs-cluster:master-latest'
-                        ),
-                        port_mappings=[
-                            ecs.PortMapping(container_port=9096),
-                            ecs.PortMapping(container_port=9094),
-                        ],
-                        health_check=ecs.HealthCheck(
-                            command=['/usr/local/bin/ipfs-cluster-ctl --force-http --basic-auth ' +
-                                     self._parameter_ipfs_cluster_api_credential.value_as_string + ' || exit 1 ']
-                        ),
-                        logging=ecs.LogDriver.aws_logs(
-                            stream_prefix=_container_name
-                        ),
-                        environment_files=[
-                            ecs.EnvironmentFile.from_asset(
-                                './ipfscluster.env',
-                                readers=[_task.execution_role]
-                            ),
-                        ],
-                        environment={
-                            'CLUSTER_PEERNAME': _container_name,
-                        },
-                        command=[
-                            # '-l' ,'debug',
-                            'daemon',
-                            '--bootstrap',
-                            '/dns/{_srv_name}.{_srv_ns}/tcp/9096/p2p/{_cluster_id}'.format(
-                                _srv_name=_first_cloudmap_service.service_name,
-                                _srv_ns=_first_cloudmap_service.namespace.namespace_name,
-                                _cluster_id=_ipfs_cluster_id
-                            )
-                        ],
-                        secrets={
-                            'CLUSTER_RESTAPI_BASICAUTHCREDENTIALS': _ipfs_cluster_api_credential,
-                            'CLUSTER_SECRET': _ipfs_cluster_secret
-                        },
-                    )
-                    # Make sure the bootstrap server is ready
-                    _ipfs_srv.node.add_dependency(_first_ipfs_service)
+            if _metrics_sidecar:
+                add_metrics_sidecar(
+                    _gateway_task, 'IpfsKuboGateway', _metrics_namespace,
+                    _metrics_log_group, _log_group, scrape_cluster=False)
 
-                # Grant EFS access policy
-                _fs.grant(
-                    _task.execution_role,
-                    'elasticfilesystem:*'
-                )
+            _gateway_min_capacity = int(
+                ipfs_cluster_env.get('GATEWAY_MIN_CAPACITY') or 1)
+            _gateway_max_capacity = int(
+                ipfs_cluster_env.get('GATEWAY_MAX_CAPACITY') or 6)
 
-                _ipfs_cluster_container.add_mount_points(
-                    ecs.MountPoint(
-                        container_path='/data/ipfs-cluster',
-                        read_only=False,
-                        source_volume='IpfsSrvTaskClusterVol'+str(i)
-                    )
-                )
+            # Stateless tasks can be replaced with a rolling update
+            _gateway_srv = ecs.FargateService(
+                self, 'IpfsGatewaySrv',
+                cluster=_ecs_cluster,
+                task_definition=_gateway_task,
+                desired_count=_gateway_min_capacity,
+                assign_public_ip=not _network.private_subnets,
+                vpc_subnets=ec2.SubnetSelection(
+                    subnet_type=_task_subnet_type
+                ),
+                security_groups=[_ipfs_srv_sg],
+                enable_execute_command=_enable_execute_command,
+                capacity_provider_strategies=_gateway_capacity,
+                health_check_grace_period=_health_check_grace_period,
+                max_healthy_percent=200,
+                min_healthy_percent=100
+            )
 
-                _ipfs_cluster_container.add_container_dependencies(
-                    ecs.ContainerDependency(
-                        container=_kubo_container,
-                        condition=ecs.ContainerDependencyCondition.HEALTHY
-                    )
-                )
+            if _gateway_capacity:
+                # Wait for the capacity providers to be associated
+                _gateway_srv.node.add_dependency(_ecs_cluster)
 
-                # register kubo to ALB target group
-                _alb_ipfs_gateway_target_group.add_target(
-                    _ipfs_srv.load_balancer_target(
-                        container_name='IpfsKuboNode'+str(i),
-                        container_port=8080
-                    )
+            # register gateway to ALB target group
+            _alb_ipfs_gateway_target_group.add_target(
+                _gateway_srv.load_balancer_target(
+                    container_name='IpfsKuboGateway',
+                    container_port=8080
                 )
+            )
 
-                # register ipfs cluster to ALB target group
-                _alb_ipfs_cluster_target_group.add_target(
-                    _ipfs_srv.load_balancer_target(
-                        container_name='IpfsCluster'+str(i),
-                        container_port=9094
-                    )
-                )
+            _gateway_scaling = _gateway_srv.auto_scale_task_count(
+                min_capacity=_gateway_min_capacity,
+                max_capacity=_gateway_max_capacity
+            )
+
+            _gateway_scaling.scale_on_request_count(
+                'IpfsGatewayRequestCountScaling',
+                requests_per_target=int(
+                    ipfs_cluster_env.get('GATEWAY_TARGET_REQUESTS_PER_TARGET') or 1000),
+                target_group=_alb_ipfs_gateway_target_group,
+                scale_in_cooldown=Duration.seconds(300),
+                scale_out_cooldown=Duration.seconds(60)
+            )
+
+            _gateway_scaling.scale_on_cpu_utilization(
+                'IpfsGatewayCpuScaling',
+                target_utilization_percent=int(
+                    ipfs_cluster_env.get('GATEWAY_TARGET_CPU_PERCENT') or 60),
+                scale_in_cooldown=Duration.seconds(300),
+                scale_out_cooldown=Duration.seconds(60)
+            )
+
+            # ALB TargetResponseTime is reported in seconds
+            _gateway_scaling.scale_to_track_custom_metric(
+                'IpfsGatewayResponseTimeScaling',
+                metric=_alb_ipfs_gateway_target_group.metric_target_response_time(
+                    period=Duration.minutes(1)
+                ),
+                target_value=int(
+                    ipfs_cluster_env.get('GATEWAY_TARGET_RESPONSE_TIME_MS') or 500) / 1000,
+                scale_in_cooldown=Duration.seconds(300),
+                scale_out_cooldown=Duration.seconds(60)
+            )
+
+        if ipfs_cluster_env.get('CLOUDWATCH_DASHBOARD', 'False').upper() == 'TRUE':
+            self._add_dashboard(
+                _alb_ipfs_gateway_target_group,
+                [_cf_ipfs_gw, _cf_ipfs_cluster],
+                _restart_to_ready_metric,
+                _metrics_namespace
+            )
+
+        # Definitions shared by the peers, created once whatever NODE_PER_AZ
+        _shared = SharedPeerDefinitions(
+            vpc=_vpc,
+            cluster=_ecs_cluster,
+            security_group=_ipfs_srv_sg,
+            namespace=_private_namespace,
+            execution_role=_task_execution_role,
+            task_role=_task_role,
+            log_group=_log_group,
+            runtime_platform=_runtime_platform,
+            gateway_target_group=_alb_ipfs_gateway_target_group,
+            cluster_target_group=_alb_ipfs_cluster_target_group,
+            internal_cluster_target_group=_internal_cluster_target_group,
+            internal_rpc_target_group=_internal_rpc_target_group,
+            task_dependencies=[_alb_ipfs_gateway_listener,
+                               _alb_ipfs_cluster_listener,
+                               *_internal_api_listeners],
+            kubo_image=ecs.ContainerImage.from_registry(_kubo_image),
+            kubo_environment=_kubo_environment,
+            kubo_environment_files=_peer_kubo_environment_files,
+            kubo_health_check=_peer_kubo_health_check,
+            kubo_ulimits=[_kubo_nofile_ulimit],
+            kubo_swarm_port_mappings=_kubo_swarm_port_mappings,
+            cluster_health_check=ecs.HealthCheck(
+                command=[CLUSTER_LIVENESS_COMMAND]
+            ),
+            health_check_grace_period=_health_check_grace_period,
+            # A single asset uploaded once for every peer
+            cluster_environment_file=ecs.EnvironmentFile.from_asset(
+                './ipfscluster.env',
+                readers=[_task_execution_role]
+            ),
+            cluster_environment=dict(pinning_environment(_pinning_config),
+                                     **_cluster_metrics_environment,
+                                     **_internal_api_environment),
+            cluster_secrets={
+                'CLUSTER_RESTAPI_BASICAUTHCREDENTIALS': _ipfs_cluster_api_credential,
+                'CLUSTER_SECRET': _ipfs_cluster_secret,
+            },
+            cluster_id=_ipfs_cluster_id,
+            cluster_private_key=_ipfs_cluster_private_key,
+            bootstrap_mode=_bootstrap_mode,
+            seed_identities=_seed_identities,
+            stop_timeout=_stop_timeout,
+            enable_execute_command=_enable_execute_command,
+            follower_capacity=_follower_capacity,
+            cloud_map_dns_ttl=_cloud_map_dns_ttl,
+            cloud_map_failure_threshold=_cloud_map_failure_threshold,
+            cloud_map_srv_records=_cloud_map_srv_records,
+            metrics_namespace=_metrics_namespace,
+            metrics_log_group=_metrics_log_group,
+            task_subnet_type=_task_subnet_type,
+            swarm_load_balancer=_swarm_load_balancer,
+            swarm_protocol=elbv2.Protocol.TCP_UDP if _swarm.udp
+            else elbv2.Protocol.TCP,
+        )
+
+        # Create the peers. Peers that would take the template over the
+        # CloudFormation resource or size limits go to nested stacks.
+        _peer_scope = self
+        _peer_resources = PEER_RESOURCES + \
+            (SWARM_LISTENER_RESOURCES if _swarm_load_balancer else 0)
+        _peer_capacity = max_peers_per_stack(count_resources(self),
+                                             _peer_resources)
+        _peer_stacks = []
+        _bootstrap_peer = None
+        _ipfs_peers = []
+        for _peer in _peer_layout:
+            if _peer_capacity == 0:
+                _peer_scope = cdk.NestedStack(
+                    self, 'IpfsPeers'+str(len(_peer_stacks)))
+                _peer_stacks.append(_peer_scope)
+                _peer_capacity = max_peers_per_stack(0, _peer_resources)
+            _peer_capacity -= 1
+
+            _ipfs_peer = IpfsPeer(
+                _peer_scope,
+                placement=_peer,
+                file_system=_efs_per_az[_peer.az_index],
+                task_size=_bootstrap_task_size if _peer.is_bootstrap
+                else _task_size,
+                shared=_shared,
+                bootstrap_peer=_bootstrap_peer
+            )
+            if _peer.is_bootstrap:
+                # The first peer is the bootstrap server of the others
+                _bootstrap_peer = _ipfs_peer
+            _ipfs_peers.append(_ipfs_peer)
+
+        if _gateway_kubo_container:
+            for _name, _value in peering_hosts_environment(
+                    [_p.host for _p in _ipfs_peers]).items():
+                _gateway_kubo_container.add_environment(_name, _value)
+
+        if _bootstrap_mode == 'parallel':
+            _seed_peers = [_p for _p in _ipfs_peers if _p.cluster_id]
+            for _ipfs_peer in _ipfs_peers:
+                _ipfs_peer.add_peer_addresses([
+                    _seed.cluster_multiaddr for _seed in _seed_peers
+                    if _seed is not _ipfs_peer
+                ])
 
         # Output
         cdk.CfnOutput(
@@ -586,6 +1204,224 @@ class IpfsClusterFargateStack(Stack):
             ' name to access IPFS Cluster REST API over HTTPS.'
         )
 
+        if _swarm_load_balancer:
+            cdk.CfnOutput(
+                self, 'IpfsSwarmEndpoint',
+                value=_swarm_load_balancer.load_balancer_dns_name,
+                description='DNS of the Network Load Balancer publishing'
+                ' the IPFS swarm port of the peers in private subnets.'
+                ' Peer i listens on port 4001 + i.'
+            )
+
+        if _internal_api:
+            cdk.CfnOutput(
+                self, 'IpfsInternalApiEndpoint',
+                value=_internal_api_dns_name,
+                description='DNS of the internal load balancer for'
+                ' IPFS Cluster REST API (port 9094) and IPFS RPC API'
+                ' (port 5001) in the VPC.'
+            )
+
+    @staticmethod
+    def _target_health_check(health_check: TargetHealthCheck):
+        return elbv2.HealthCheck(
+            enabled=True,
+            path=health_check.path,
+            healthy_http_codes=health_check.healthy_http_codes,
+            healthy_threshold_count=health_check.healthy_threshold,
+            unhealthy_threshold_count=health_check.unhealthy_threshold,
+            interval=Duration.seconds(health_check.interval_seconds),
+            timeout=Duration.seconds(health_check.timeout_seconds)
+        )
+
+    def _warn_stock_kubo_image(self, kubo_image: str, setting: str,
+                               dockerfiles: str) -> None:
+        cdk.Annotations.of(self).add_warning(
+            f'{setting} needs a KUBO_IMAGE built from {dockerfiles}, '
+            f'{kubo_image} ignores it')
+
+    def _warn_routing_task_size(self, routing: RoutingConfig, kubo_cpu: int,
+                                kubo_memory_mib: int) -> None:
+        warning = routing_task_size_warning(routing, kubo_cpu, kubo_memory_mib)
+        if warning:
+            cdk.Annotations.of(self).add_warning(warning)
+
+    @staticmethod
+    def _capacity_provider_strategies(weights: CapacityProviderWeights):
+        # Services without Spot keep the FARGATE launch type: switching an
+        # existing service to a capacity provider strategy replaces it
+        if not weights.uses_spot:
+            return None
+        return [
+            ecs.CapacityProviderStrategy(
+                capacity_provider='FARGATE',
+                base=weights.fargate_base,
+                weight=weights.fargate_weight
+            ),
+            ecs.CapacityProviderStrategy(
+                capacity_provider='FARGATE_SPOT',
+                weight=weights.fargate_spot_weight
+            ),
+        ]
+
+    def _add_dashboard(self, gateway_target_group: elbv2.ApplicationTargetGroup,
+                       distributions: list,
+                       restart_to_ready_metric: cloudwatch.IMetric = None,
+                       metrics_namespace: str = None):
+        # CacheHitRate is one of the CloudFront additional metrics
+        for _distribution in distributions:
+            cloudfront.CfnMonitoringSubscription(
+                _distribution, 'MonitoringSubscription',
+                distribution_id=_distribution.distribution_id,
+                monitoring_subscription=cloudfront.CfnMonitoringSubscription.MonitoringSubscriptionProperty(
+                    realtime_metrics_subscription_config=cloudfront.CfnMonitoringSubscription.RealtimeMetricsSubscriptionConfigProperty(
+                        realtime_metrics_subscription_status='Enabled'
+                    )
+                )
+            )
+
+        _dashboard = cloudwatch.Dashboard(
+            self, 'IpfsDashboard',
+            dashboard_name=cdk.Aws.STACK_NAME
+        )
+
+        # ALB target response time and CloudFront hit ratio side by side
+        _dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title='IPFS Gateway target response time (seconds)',
+                left=[
+                    gateway_target_group.metric_target_response_time(
+                        statistic=_statistic, label=_statistic,
+                        period=Duration.minutes(1)
+                    )
+                    for _statistic in ('p50', 'p90', 'p99')
+                ],
+                width=12
+            ),
+            cloudwatch.GraphWidget(
+                title='CloudFront cache hit rate (%)',
+                left=[
+                    cloudwatch.Metric(
+                        namespace='AWS/CloudFront',
+                        metric_name='CacheHitRate',
+                        dimensions_map={
+                            'DistributionId': _distribution.distribution_id,
+                            'Region': 'Global'
+                        },
+                        region='us-east-1',
+                        statistic='Average',
+                        label=_distribution.node.id,
+                        period=Duration.minutes(1)
+                    )
+                    for _distribution in distributions
+                ],
+                left_y_axis=cloudwatch.YAxisProps(min=0, max=100),
+                width=12
+            ),
+        )
+
+        if restart_to_ready_metric is not None:
+            _dashboard.add_widgets(
+                cloudwatch.GraphWidget(
+                    title='Kubo restart to ready (seconds)',
+                    left=[restart_to_ready_metric],
+                    width=12
+                ),
+            )
+
+        if metrics_namespace is None:
+            return
+
+        # Prometheus metrics of the sidecars, one line per peer
+        def _search(title, terms, statistic):
+            return cloudwatch.GraphWidget(
+                title=title,
+                left=[
+                    cloudwatch.MathExpression(
+                        expression="SEARCH('{%s,peer} %s', '%s', 60)" % (
+                            metrics_namespace, terms, statistic),
+                        using_metrics={},
+                        label='',
+                        period=Duration.minutes(1)
+                    )
+                ],
+                width=6
+            )
+
+        _dashboard.add_widgets(
+            _search('Kubo gateway', 'ipfs_http_gw', 'Average'),
+            _search('Bitswap', 'ipfs_bitswap', 'Sum'),
+            _search('ipfs-cluster pins', 'pins', 'Maximum'),
+            _search('Datastore latency', 'datastore latency', 'Average'),
+        )
+
+    def _add_efs_alarms(self, fs: efs.FileSystem,
+                        efs_performance, ipfs_cluster_env: dict):
+
+        # PercentIOLimit is only reported for General Purpose file systems
+        if efs_performance.performance_mode == 'generalPurpose':
+            cloudwatch.Alarm(
+                fs, 'PercentIOLimitAlarm',
+                alarm_description='EFS file system is close to its I/O limit',
+                metric=cloudwatch.Metric(
+                    namespace='AWS/EFS',
+                    metric_name='PercentIOLimit',
+                    dimensions_map={'FileSystemId': fs.file_system_id},
+                    statistic='Maximum',
+                    period=Duration.minutes(1)
+                ),
+                threshold=int(
+                    ipfs_cluster_env.get('EFS_ALARM_PERCENT_IO_LIMIT') or 90),
+                evaluation_periods=5,
+                comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_OR_EQUAL_TO_THRESHOLD,
+                treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+            )
+
+        # Burst credits are only spent in the bursting throughput mode
+        if efs_performance.throughput_mode == 'bursting':
+            cloudwatch.Alarm(
+                fs, 'BurstCreditBalanceAlarm',
+                alarm_description='EFS file system is running out of burst credits',
+                metric=cloudwatch.Metric(
+                    namespace='AWS/EFS',
+                    metric_name='BurstCreditBalance',
+                    dimensions_map={'FileSystemId': fs.file_system_id},
+                    statistic='Minimum',
+                    period=Duration.minutes(5)
+                ),
+                threshold=int(
+                    ipfs_cluster_env.get('EFS_ALARM_BURST_CREDIT_BALANCE_GIB') or 100
+                ) * 1024 ** 3,
+                evaluation_periods=1,
+                comparison_operator=cloudwatch.ComparisonOperator.LESS_THAN_THRESHOLD,
+                treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING
+            )
+
+    def _define_seed_identity(self, peer_index: int) -> tuple:
+        # Identity of a seed peer of the parallel bootstrap, set up like
+        # the identity of the bootstrap peer
+        _parameter_id = cdk.CfnParameter(
+            self, 'ClusterId'+str(peer_index),
+            no_echo=True,
+            min_length=52,
+            allowed_pattern='^.{52}$'
+        )
+        _parameter_private_key = cdk.CfnParameter(
+            self, 'ClusterPrivateKey'+str(peer_index),
+            no_echo=True,
+            min_length=92,
+            allowed_pattern='^.{92}$'
+        )
+        _private_key = ecs.Secret.from_secrets_manager(
+            secretsmanager.Secret(self, 'SMPrivateKey'+str(peer_index),
+                                  description=f'{cdk.Aws.STACK_NAME} IPFS Cluster Private Key {peer_index}',
+                                  secret_name=f'{cdk.Aws.STACK_NAME}-PrivateKey{peer_index}',
+                                  secret_string_value=SecretValue.cfn_parameter(
+                                      _parameter_private_key
+                                  )
+                                  ))
+        return _parameter_id.value_as_string, _private_key
+
     def _define_parameter(self):
 
         self._parameter_ipfs_cluster_id = cdk.CfnParameter(
@@ -0,0 +1,506 @@
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import aws_cdk as cdk
+from aws_cdk import (
+    Duration,
+    aws_ec2 as ec2,
+    aws_ecs as ecs,
+    aws_efs as efs,
+    aws_elasticloadbalancingv2 as elbv2,
+    aws_iam as iam,
+    aws_logs as logs,
+    aws_servicediscovery as cloudmap,
+)
+from constructs import Construct, IConstruct
+
+from ipfs_cluster.metrics import ADOT_IMAGE, get_adot_config
+from ipfs_cluster.peer_layout import PeerPlacement
+from ipfs_cluster.pinning import informer_tags_environment
+from ipfs_cluster.swarm import (SWARM_PORT, swarm_announce_environment,
+                                swarm_listener_port)
+from ipfs_cluster.task_size import TaskSize
+
+# CloudFormation quotas
+# https://docs.aws.amazon.com/AWSCloudFormation/latest/UserGuide/cloudformation-limits.html
+MAX_RESOURCES_PER_STACK = 500
+MAX_TEMPLATE_BYTES = 1024 * 1024
+# Share of the quotas used by the peers, the rest is left for the nested
+# stack resources and the parameters passed to the nested stacks
+STACK_QUOTA_RATIO = 0.9
+# Task definition, service, Cloud Map service and two access points
+PEER_RESOURCES = 5
+# Swarm listener and target group of a peer in private subnets
+SWARM_LISTENER_RESOURCES = 2
+# Template size of one peer, about 11 KiB with every option enabled
+PEER_TEMPLATE_BYTES = 14 * 1024
+# Template size of any other resource, rounded up
+RESOURCE_TEMPLATE_BYTES = 1024
+
+# ipfs uid = 1000
+# ipfs gid = 100 (users)
+# https://github.com/ipfs/kubo/blob/master/Dockerfile
+# https://github.com/ipfs-cluster/ipfs-cluster/blob/master/Dockerfile
+IPFS_UID = '1000'
+IPFS_GID = '100'
+
+
+class SharedPeerDefinitions(NamedTuple):
+    """Definitions created once by the stack and reused by every IpfsPeer."""
+    vpc: ec2.IVpc
+    cluster: ecs.ICluster
+    security_group: ec2.ISecurityGroup
+    namespace: cloudmap.INamespace
+    execution_role: iam.IRole
+    task_role: iam.IRole
+    log_group: logs.ILogGroup
+    runtime_platform: ecs.RuntimePlatform
+    gateway_target_group: elbv2.ApplicationTargetGroup
+    cluster_target_group: elbv2.ApplicationTargetGroup
+    # Internal load balancer target groups of the ipfs-cluster REST API and
+    # the Kubo RPC API, None without INTERNAL_API
+    internal_cluster_target_group: Optional[Union[elbv2.ApplicationTargetGroup, elbv2.NetworkTargetGroup]]
+    internal_rpc_target_group: Optional[Union[elbv2.ApplicationTargetGroup, elbv2.NetworkTargetGroup]]
+    # Resources the tasks wait for (listeners of the target groups)
+    task_dependencies: Sequence[IConstruct]
+    kubo_image: ecs.ContainerImage
+    kubo_environment: dict
+    kubo_environment_files: Sequence[ecs.EnvironmentFile]
+    kubo_health_check: ecs.HealthCheck
+    kubo_ulimits: Sequence[ecs.Ulimit]
+    # Swarm port 4001, over TCP and, with QUIC, UDP
+    kubo_swarm_port_mappings: Sequence[ecs.PortMapping]
+    cluster_health_check: ecs.HealthCheck
+    health_check_grace_period: Duration
+    cluster_environment_file: ecs.EnvironmentFile
+    cluster_environment: dict
+    cluster_secrets: dict
+    # Identity of the bootstrap peer
+    cluster_id: str
+    cluster_private_key: ecs.Secret
+    bootstrap_mode: str
+    stop_timeout: Duration
+    enable_execute_command: bool
+    follower_capacity: Optional[List[ecs.CapacityProviderStrategy]]
+    cloud_map_dns_ttl: Duration
+    cloud_map_failure_threshold: int
+    cloud_map_srv_records: bool
+    metrics_namespace: Optional[str] = None
+    metrics_log_group: Optional[logs.ILogGroup] = None
+    task_subnet_type: ec2.SubnetType = ec2.SubnetType.PUBLIC
+    # Internet-facing NLB publishing the swarm port of the peers in private
+    # subnets, None in public subnets
+    swarm_load_balancer: Optional[elbv2.INetworkLoadBalancer] = None
+    swarm_protocol: elbv2.Protocol = elbv2.Protocol.TCP
+    # Identities (ID, private key) of the other seed peers of the parallel
+    # bootstrap by peer index
+    seed_identities: Optional[Dict[int, Tuple[str, ecs.Secret]]] = None
+
+
+def kubo_resources_environment(cpu: int, memory_mib: int) -> dict:
+    """Resources given to Kubo (docker/002-config_resources.sh)."""
+    return {
+        'KUBO_TASK_CPU': str(cpu),
+        'KUBO_MEMORY_MIB': str(memory_mib),
+    }
+
+
+def add_metrics_sidecar(task: ecs.TaskDefinition, peer_name: str,
+                        namespace: str, metrics_log_group: logs.ILogGroup,
+                        log_group: logs.ILogGroup,
+                        scrape_cluster: bool = True) -> ecs.ContainerDefinition:
+    # Not essential: a collector failure must not stop the peer
+    return task.add_container(
+        'AdotCollector',
+        image=ecs.ContainerImage.from_registry(ADOT_IMAGE),
+        essential=False,
+        memory_reservation_mib=64,
+        memory_limit_mib=256,
+        environment={
+            'AOT_CONFIG_CONTENT': get_adot_config(
+                peer_name, namespace, metrics_log_group.log_group_name,
+                scrape_cluster=scrape_cluster
+            ),
+        },
+        logging=ecs.LogDriver.aws_logs(
+            stream_prefix='AdotCollector' + peer_name,
+            log_group=log_group
+        )
+    )
+
+
+def max_peers_per_stack(other_resources: int,
+                        peer_resources: int = PEER_RESOURCES) -> int:
+    """Number of peers a stack holding other_resources can take."""
+    by_resources = int(MAX_RESOURCES_PER_STACK * STACK_QUOTA_RATIO) - \
+        other_resources
+    by_bytes = int(MAX_TEMPLATE_BYTES * STACK_QUOTA_RATIO) - \
+        other_resources * RESOURCE_TEMPLATE_BYTES
+    return max(0, min(by_resources // peer_resources,
+                      by_bytes // PEER_TEMPLATE_BYTES))
+
+
+def count_resources(stack: cdk.Stack) -> int:
+    """CloudFormation resources of a stack, nested stacks excluded."""
+    return sum(
+        1 for c in stack.node.find_all()
+        if cdk.CfnResource.is_cfn_resource(c) and
+        cdk.Stack.of(c).node.path == stack.node.path
+    )
+
+
+class IpfsPeer:
+    """An IPFS peer: a Fargate service running Kubo and ipfs-cluster on
+    their own EFS access points, registered in Cloud Map and in the ALB
+    target groups.
+
+    Not a construct: the resources are created right in scope (the stack
+    or a nested stack) with the construct IDs they had before IpfsPeer,
+    which keep the peer index, so their logical IDs and the task
+    definition families do not change.
+    """
+
+    def __init__(self, scope: Construct, *,
+                 placement: PeerPlacement,
+                 file_system: efs.FileSystem,
+                 task_size: TaskSize,
+                 shared: SharedPeerDefinitions,
+                 bootstrap_peer: Optional['IpfsPeer'] = None) -> None:
+
+        self.scope = scope
+
+        if bootstrap_peer is None and not placement.is_bootstrap:
+            raise ValueError(f'Peer {placement.index} requires the bootstrap peer')
+
+        i = placement.index
+        self.placement = placement
+        self.peer_name = 'IpfsCluster'+str(i)
+
+        _kubo_efs_ap = self._add_access_point(
+            file_system, 'IpfsKuboAp'+str(i), '/IpfsKuboEfsAp'+str(i))
+        _cluster_efs_ap = self._add_access_point(
+            file_system, 'IpfsClusterAp'+str(i), '/IpfsClusterEfsAp'+str(i))
+
+        # Create ECS Fargate Task Definition
+        self.task_definition = ecs.FargateTaskDefinition(
+            scope, 'IpfsFargateTask'+str(i),
+            cpu=task_size.cpu,
+            memory_limit_mib=task_size.memory_limit_mib,
+            ephemeral_storage_gib=task_size.ephemeral_storage_gib,
+            execution_role=shared.execution_role,
+            task_role=shared.task_role,
+            runtime_platform=shared.runtime_platform,
+            volumes=[
+                ecs.Volume(
+                    name='IpfsSrvTaskKuboVol'+str(i),
+                    efs_volume_configuration=ecs.EfsVolumeConfiguration(
+                        file_system_id=file_system.file_system_id,
+                        transit_encryption='ENABLED',
+                        authorization_config=ecs.AuthorizationConfig(
+                            access_point_id=_kubo_efs_ap.access_point_id,
+                            iam='ENABLED'
+                        )
+                    )
+                ),
+                ecs.Volume(
+                    name='IpfsSrvTaskClusterVol'+str(i),
+                    efs_volume_configuration=ecs.EfsVolumeConfiguration(
+                        file_system_id=file_system.file_system_id,
+                        transit_encryption='ENABLED',
+                        authorization_config=ecs.AuthorizationConfig(
+                            access_point_id=_cluster_efs_ap.access_point_id,
+                            iam='ENABLED'
+                        )
+                    )
+                )
+            ],
+        )
+
+        # Add EFS mount targets and ALB listeners dependence. Depending on
+        # the whole file system would include the access points and alarms
+        # of every other peer of the file system.
+        self.task_definition.node.add_dependency(
+            file_system.mount_targets_available)
+        for _dependency in shared.task_dependencies:
+            self.task_definition.node.add_dependency(_dependency)
+
+        # Create ECS Fargate Service
+        self.service = ecs.FargateService(
+            scope, 'IpfsSrv'+str(i),
+            cluster=shared.cluster,
+            task_definition=self.task_definition,
+            assign_public_ip=shared.task_subnet_type == ec2.SubnetType.PUBLIC,
+            vpc_subnets=ec2.SubnetSelection(
+                availability_zones=[
+                    shared.vpc.availability_zones[placement.az_index]],
+                one_per_az=True,
+                subnet_type=shared.task_subnet_type
+            ),
+            security_groups=[shared.security_group],
+            enable_execute_command=shared.enable_execute_command,
+            # The bootstrap peer always runs on on-demand Fargate
+            capacity_provider_strategies=None if placement.is_bootstrap
+            else shared.follower_capacity,
+            health_check_grace_period=shared.health_check_grace_period,
+            max_healthy_percent=100,
+            min_healthy_percent=0
+        )
+
+        if shared.follower_capacity and not placement.is_bootstrap:
+            # Wait for the capacity providers to be associated
+            self.service.node.add_dependency(shared.cluster)
+
+        _kubo_environment = dict(shared.kubo_environment)
+        if shared.swarm_load_balancer:
+            _kubo_environment.update(swarm_announce_environment(
+                shared.swarm_load_balancer.load_balancer_dns_name,
+                swarm_listener_port(i)))
+
+        # Add kubo container
+        self.kubo_container = self.task_definition.add_container(
+            'IpfsKuboNode'+str(i),
+            image=shared.kubo_image,
+            cpu=task_size.kubo_cpu,
+            stop_timeout=shared.stop_timeout,
+            memory_reservation_mib=task_size.kubo_memory_reservation_mib,
+            environment=dict(
+                _kubo_environment,
+                **kubo_resources_environment(
+                    task_size.kubo_cpu,
+                    task_size.memory_limit_mib -
+                    task_size.cluster_memory_reservation_mib
+                )
+            ),
+            port_mappings=[
+                *shared.kubo_swarm_port_mappings,
+                ecs.PortMapping(container_port=5001),
+                ecs.PortMapping(container_port=8080),
+            ],
+            environment_files=list(shared.kubo_environment_files) or None,
+            health_check=shared.kubo_health_check,
+            logging=ecs.LogDriver.aws_logs(
+                stream_prefix='IpfsKuboNode'+str(i),
+                log_group=shared.log_group
+            )
+        )
+
+        self.kubo_container.add_ulimits(*shared.kubo_ulimits)
+
+        self.kubo_container.add_mount_points(
+            ecs.MountPoint(
+                container_path='/data/ipfs',
+                read_only=False,
+                source_volume='IpfsSrvTaskKuboVol'+str(i)
+            )
+        )
+
+        # Add ipfs-cluster container. The bootstrap peer and the seed peers
+        # of the parallel bootstrap have a well-known identity the other
+        # peers join through.
+        if placement.is_bootstrap:
+            _identity = (shared.cluster_id, shared.cluster_private_key)
+        else:
+            _identity = (shared.seed_identities or {}).get(i)
+        self.cluster_id = _identity[0] if _identity else None
+        _environment = {'CLUSTER_PEERNAME': self.peer_name}
+        if _identity:
+            _environment['CLUSTER_ID'] = self.cluster_id
+        _environment.update(shared.cluster_environment)
+        _environment.update(informer_tags_environment(
+            shared.vpc.availability_zones[placement.az_index]))
+        _secrets = dict(shared.cluster_secrets)
+        if _identity:
+            _secrets['CLUSTER_PRIVATEKEY'] = _identity[1]
+        _command = [
+            # '-l' ,'debug',
+            'daemon',
+        ]
+        if placement.is_bootstrap:
+            _image = 'ipfs/ipfs-cluster:latest'
+        else:
+            _image = 'ipfs/ipfs-cluster:master-latest'
+        if not placement.is_bootstrap and shared.bootstrap_mode == 'serial':
+            _bootstrap_cloudmap_service = bootstrap_peer.service.cloud_map_service
+            _bootstrap_host = '{_srv_name}.{_srv_ns}'.format(
+                _srv_name=_bootstrap_cloudmap_service.service_name,
+                _srv_ns=_bootstrap_cloudmap_service.namespace.namespace_name
+            )
+            _bootstrap_multiaddr = '/dns/{_host}/tcp/9096/p2p/{_cluster_id}'.format(
+                _host=_bootstrap_host,
+                _cluster_id=shared.cluster_id
+            )
+            _command += [
+                '--bootstrap',
+                _bootstrap_multiaddr
+            ]
+            # Make sure the bootstrap server is ready
+            self.service.node.add_dependency(bootstrap_peer.service)
+
+        self.cluster_container = self.task_definition.add_container(
+            self.peer_name,
+            image=ecs.ContainerImage.from_registry(_image),
+            cpu=task_size.cluster_cpu,
+            stop_timeout=shared.stop_timeout,
+            memory_reservation_mib=task_size.cluster_memory_reservation_mib,
+            port_mappings=[
+                ecs.PortMapping(container_port=9096),
+                ecs.PortMapping(container_port=9094),
+            ],
+            health_check=shared.cluster_health_check,
+            logging=ecs.LogDriver.aws_logs(
+                stream_prefix=self.peer_name,
+                log_group=shared.log_group
+            ),
+            environment_files=[shared.cluster_environment_file],
+            environment=_environment,
+            secrets=_secrets,
+            command=_command,
+        )
+
+        self.cluster_container.add_mount_points(
+            ecs.MountPoint(
+                container_path='/data/ipfs-cluster',
+                read_only=False,
+                source_volume='IpfsSrvTaskClusterVol'+str(i)
+            )
+        )
+
+        self.cluster_container.add_container_dependencies(
+            ecs.ContainerDependency(
+                container=self.kubo_container,
+                condition=ecs.ContainerDependencyCondition.HEALTHY
+            )
+        )
+
+        # Register the peer in the private namespace. SRV records point
+        # to the ipfs-cluster swarm port of the task.
+        self.service.enable_cloud_map(
+            cloud_map_namespace=shared.namespace,
+            dns_record_type=cloudmap.DnsRecordType.SRV
+            if shared.cloud_map_srv_records else cloudmap.DnsRecordType.A,
+            container=self.cluster_container
+            if shared.cloud_map_srv_records else None,
+            container_port=9096 if shared.cloud_map_srv_records else None,
+            dns_ttl=shared.cloud_map_dns_ttl,
+            failure_threshold=shared.cloud_map_failure_threshold,
+            # name='IpfsSrv'+str(i)
+        )
+        if shared.cloud_map_srv_records:
+            # Keep the A records - the peers bootstrap with /dns/ multiaddrs
+            self.service.cloud_map_service.node.default_child.add_property_override(
+                'DnsConfig.DnsRecords',
+                [
+                    {'Type': 'A', 'TTL': shared.cloud_map_dns_ttl.to_seconds()},
+                    {'Type': 'SRV', 'TTL': shared.cloud_map_dns_ttl.to_seconds()},
+                ]
+            )
+
+        if shared.metrics_namespace:
+            add_metrics_sidecar(
+                self.task_definition, self.peer_name,
+                shared.metrics_namespace, shared.metrics_log_group,
+                shared.log_group)
+
+        # register kubo to ALB target group
+        shared.gateway_target_group.add_target(
+            self.service.load_balancer_target(
+                container_name='IpfsKuboNode'+str(i),
+                container_port=8080
+            )
+        )
+
+        # publish the swarm port on the NLB listener of the peer
+        if shared.swarm_load_balancer:
+            elbv2.NetworkListener(
+                scope, 'NlbSwarmListener'+str(i),
+                load_balancer=shared.swarm_load_balancer,
+                port=swarm_listener_port(i),
+                protocol=shared.swarm_protocol,
+                default_target_groups=[
+                    elbv2.NetworkTargetGroup(
+                        scope, 'NlbSwarmTargetGroup'+str(i),
+                        vpc=shared.vpc,
+                        target_type=elbv2.TargetType.IP,
+                        port=SWARM_PORT,
+                        protocol=shared.swarm_protocol,
+                        # UDP targets are checked over TCP
+                        health_check=elbv2.HealthCheck(
+                            protocol=elbv2.Protocol.TCP),
+                        targets=[self.service.load_balancer_target(
+                            container_name='IpfsKuboNode'+str(i),
+                            container_port=SWARM_PORT
+                        )]
+                    )
+                ]
+            )
+
+        # register ipfs cluster to ALB target group
+        shared.cluster_target_group.add_target(
+            self.service.load_balancer_target(
+                container_name=self.peer_name,
+                container_port=9094
+            )
+        )
+
+        if shared.internal_cluster_target_group:
+            shared.internal_cluster_target_group.add_target(
+                self.service.load_balancer_target(
+                    container_name=self.peer_name,
+                    container_port=9094
+                )
+            )
+
+        if shared.internal_rpc_target_group:
+            shared.internal_rpc_target_group.add_target(
+                self.service.load_balancer_target(
+                    container_name='IpfsKuboNode'+str(i),
+                    container_port=5001
+                )
+            )
+
+    @property
+    def host(self) -> str:
+        """DNS name of the Cloud Map A record of the peer."""
+        _cloudmap_service = self.service.cloud_map_service
+        return '{_srv_name}.{_srv_ns}'.format(
+            _srv_name=_cloudmap_service.service_name,
+            _srv_ns=_cloudmap_service.namespace.namespace_name
+        )
+
+    @property
+    def cluster_multiaddr(self) -> str:
+        """ipfs-cluster swarm multiaddr of a peer with a well-known
+        identity."""
+        return '/dns4/{_host}/tcp/9096/p2p/{_cluster_id}'.format(
+            _host=self.host,
+            _cluster_id=self.cluster_id
+        )
+
+    def add_peer_addresses(self, multiaddrs: Sequence[str]) -> None:
+        """Add peers to the ipfs-cluster peerstore at every start. The peer
+        connects to them on start and again while it has no peer, so it
+        joins through any of them that is up."""
+        self.cluster_container.add_environment(
+            'CLUSTER_PEERADDRESSES', ','.join(multiaddrs))
+
+    def _add_access_point(self, file_system: efs.FileSystem,
+                          construct_id: str, path: str) -> efs.AccessPoint:
+        _props = dict(
+            create_acl=efs.Acl(
+                owner_uid=IPFS_UID,
+                owner_gid=IPFS_GID,
+                permissions='755'
+            ),
+            # enforce the POSIX identity
+            posix_user=efs.PosixUser(
+                uid=IPFS_UID,
+                gid=IPFS_GID
+            ),
+            path=path
+        )
+        # Access points stay under their file system when they are in the
+        # same stack, where they were created before IpfsPeer existed
+        if cdk.Stack.of(self.scope).node.path == \
+                cdk.Stack.of(file_system).node.path:
+            return file_system.add_access_point(construct_id, **_props)
+        return efs.AccessPoint(self.scope, construct_id,
+                               file_system=file_system, **_props)
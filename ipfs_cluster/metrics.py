@@ -0,0 +1,101 @@
+import json
+from typing import List
+
+ADOT_IMAGE = 'public.ecr.aws/aws-observability/aws-otel-collector:latest'
+
+# Kubo serves its metrics on the RPC API port. ipfs-cluster moves off the
+# default 8888, which is the port of the collector own metrics.
+KUBO_METRICS_TARGET = '127.0.0.1:5001'
+KUBO_METRICS_PATH = '/debug/metrics/prometheus'
+CLUSTER_METRICS_PORT = 8889
+
+# Prometheus metrics turned into CloudWatch metrics. Everything else is
+# only kept in the EMF log events.
+KUBO_METRIC_SELECTORS = [
+    # Gateway requests and latency
+    '^ipfs_http_gw_.*',
+    # Bitswap blocks and bytes
+    '^ipfs_bitswap_.*',
+    # measure datastore wrappers of the Datastore.Spec (001-config_*.sh)
+    '^(flatfs|s3|leveldb)_datastore_.*',
+]
+CLUSTER_METRIC_SELECTORS = [
+    # Peers and pin queue. No trailing $: the collector expands
+    # environment variables in its configuration.
+    '^(cluster|ipfscluster)_(peers|pins)',
+]
+
+
+def cluster_metrics_environment() -> dict:
+    """ipfs-cluster settings exposing its Prometheus endpoint."""
+    return {
+        'CLUSTER_METRICS_ENABLESTATS': 'true',
+        'CLUSTER_METRICS_PROMETHEUSENDPOINT':
+            f'/ip4/127.0.0.1/tcp/{CLUSTER_METRICS_PORT}',
+    }
+
+
+def get_adot_config(peer_name: str, namespace: str, log_group_name: str,
+                    scrape_cluster: bool = True,
+                    scrape_interval_seconds: int = 60) -> str:
+    """AWS Distro for OpenTelemetry collector configuration (AOT_CONFIG_CONTENT)
+    scraping the task containers and publishing to CloudWatch with EMF.
+
+    YAML is a superset of JSON, so the configuration is rendered as JSON.
+    """
+    scrape_configs = [{
+        'job_name': 'kubo',
+        'metrics_path': KUBO_METRICS_PATH,
+        'static_configs': [{
+            'targets': [KUBO_METRICS_TARGET],
+            'labels': {'peer': peer_name},
+        }],
+    }]
+    metric_selectors: List[str] = list(KUBO_METRIC_SELECTORS)
+    if scrape_cluster:
+        scrape_configs.append({
+            'job_name': 'ipfs-cluster',
+            'static_configs': [{
+                'targets': [f'127.0.0.1:{CLUSTER_METRICS_PORT}'],
+                'labels': {'peer': peer_name},
+            }],
+        })
+        metric_selectors += CLUSTER_METRIC_SELECTORS
+
+    config = {
+        'receivers': {
+            'prometheus': {
+                'config': {
+                    'global': {
+                        'scrape_interval': f'{scrape_interval_seconds}s',
+                    },
+                    'scrape_configs': scrape_configs,
+                },
+            },
+        },
+        'processors': {
+            'batch': {},
+        },
+        'exporters': {
+            'awsemf': {
+                'namespace': namespace,
+                'log_group_name': log_group_name,
+                'log_stream_name': peer_name,
+                'dimension_rollup_option': 'NoDimensionRollup',
+                'metric_declarations': [{
+                    'dimensions': [['peer']],
+                    'metric_name_selectors': metric_selectors,
+                }],
+            },
+        },
+        'service': {
+            'pipelines': {
+                'metrics': {
+                    'receivers': ['prometheus'],
+                    'processors': ['batch'],
+                    'exporters': ['awsemf'],
+                },
+            },
+        },
+    }
+    return json.dumps(config)
@@ -0,0 +1,55 @@
+from typing import NamedTuple, Optional
+
+TASK_SUBNETS = ('public', 'private')
+
+# Listeners per Network Load Balancer quota: the swarm load balancer of the
+# private subnets has one listener per peer
+MAX_SWARM_LISTENERS = 50
+
+
+class NetworkConfig(NamedTuple):
+    """Subnets of the tasks and VPC endpoints of the AWS services they use.
+
+    Tasks in private subnets have no public IP: they reach the Internet
+    through NAT gateways and their Kubo swarm port is published by an
+    internet-facing Network Load Balancer. The S3 gateway endpoint keeps the
+    S3 datastore and ECR layer traffic in the VPC, the interface endpoints
+    the ECR, CloudWatch Logs and Secrets Manager calls of the tasks.
+    """
+    private_subnets: bool = False
+    # None is one NAT gateway per AZ
+    nat_gateways: Optional[int] = None
+    vpc_endpoints: bool = False
+
+
+def validate_network_config(config: NetworkConfig, peer_count: int) -> None:
+    if config.private_subnets and peer_count > MAX_SWARM_LISTENERS:
+        raise ValueError(
+            f'TASK_SUBNETS=private publishes the swarm port of each peer on '
+            f'its own load balancer listener, {peer_count} peers exceed the '
+            f'{MAX_SWARM_LISTENERS} listeners of a Network Load Balancer')
+
+
+def get_network_config(ipfs_cluster_env: dict) -> NetworkConfig:
+    """Read the TASK_SUBNETS, NAT_GATEWAYS and VPC_ENDPOINTS settings of
+    ipfscluster.env."""
+    task_subnets = (ipfs_cluster_env.get('TASK_SUBNETS') or 'public').lower()
+    if task_subnets not in TASK_SUBNETS:
+        raise ValueError(
+            f'Invalid TASK_SUBNETS {task_subnets!r}, expected one of '
+            f'{list(TASK_SUBNETS)}')
+    vpc_endpoints = ipfs_cluster_env.get(
+        'VPC_ENDPOINTS', 'False').upper() == 'TRUE'
+
+    if task_subnets == 'public':
+        return NetworkConfig(vpc_endpoints=vpc_endpoints)
+
+    # One NAT gateway per AZ by default, so a task never sends its traffic
+    # through another AZ. The VPC caps it to the number of AZs.
+    nat_gateways = ipfs_cluster_env.get('NAT_GATEWAYS')
+    nat_gateways = int(nat_gateways) if nat_gateways else None
+    if nat_gateways is not None and nat_gateways < 1:
+        raise ValueError(
+            f'Invalid NAT_GATEWAYS {nat_gateways}, expected 1 or more')
+    return NetworkConfig(private_subnets=True, nat_gateways=nat_gateways,
+                         vpc_endpoints=vpc_endpoints)
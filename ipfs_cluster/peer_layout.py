@@ -0,0 +1,31 @@
+from typing import List, NamedTuple
+
+
+class PeerPlacement(NamedTuple):
+    """Placement of one IPFS peer (a Kubo node and its ipfs-cluster daemon).
+
+    ``index`` is the global peer number used to build every construct ID,
+    EFS path and peer name. Peers are numbered round-robin across the AZs
+    so that the first node of each AZ keeps the index it had before
+    NODE_PER_AZ was introduced (IpfsCluster0, IpfsCluster1, ...).
+    """
+    index: int
+    az_index: int
+    node_index: int
+
+    @property
+    def is_bootstrap(self) -> bool:
+        return self.index == 0
+
+
+def get_peer_layout(az_count: int, node_per_az: int) -> List[PeerPlacement]:
+    if az_count < 1:
+        raise ValueError(f'az_count must be at least 1, got {az_count}')
+    if node_per_az < 1:
+        raise ValueError(f'NODE_PER_AZ must be at least 1, got {node_per_az}')
+
+    return [
+        PeerPlacement(index=j * az_count + i, az_index=i, node_index=j)
+        for j in range(node_per_az)
+        for i in range(az_count)
+    ]
@@ -0,0 +1,60 @@
+import ipaddress
+import json
+from typing import Sequence
+
+# Swarm.AddrFilters of the Kubo server profile: no dial to the private,
+# shared and reserved ranges
+# See: https://github.com/ipfs/kubo/blob/master/config/profile.go
+SERVER_PROFILE_ADDR_FILTERS = (
+    '/ip4/10.0.0.0/ipcidr/8',
+    '/ip4/100.64.0.0/ipcidr/10',
+    '/ip4/169.254.0.0/ipcidr/16',
+    '/ip4/172.16.0.0/ipcidr/12',
+    '/ip4/192.0.0.0/ipcidr/24',
+    '/ip4/192.0.2.0/ipcidr/24',
+    '/ip4/192.168.0.0/ipcidr/16',
+    '/ip4/198.18.0.0/ipcidr/15',
+    '/ip4/198.51.100.0/ipcidr/24',
+    '/ip4/203.0.113.0/ipcidr/24',
+    '/ip4/240.0.0.0/ipcidr/4',
+    '/ip6/100::/ipcidr/64',
+    '/ip6/2001:2::/ipcidr/48',
+    '/ip6/2001:db8::/ipcidr/32',
+    '/ip6/fc00::/ipcidr/7',
+    '/ip6/fe80::/ipcidr/10',
+)
+
+# Time the gateway replicas wait at start for the RPC API of the cluster
+# Kubo nodes to get their peer IDs
+PEERING_TIMEOUT_SECONDS = 30
+
+
+def _filter_network(addr_filter: str):
+    # /ip4/<address>/ipcidr/<prefix length>
+    _, _, address, _, prefix = addr_filter.split('/')
+    return ipaddress.ip_network(f'{address}/{prefix}')
+
+
+def server_addr_filters(vpc_cidr: str) -> list:
+    """Server profile address filters, except the ranges overlapping the
+    VPC: the gateway replicas dial the cluster Kubo nodes on their private
+    IPs."""
+    vpc_network = ipaddress.ip_network(vpc_cidr)
+    return [
+        addr_filter for addr_filter in SERVER_PROFILE_ADDR_FILTERS
+        if not _filter_network(addr_filter).overlaps(vpc_network)
+    ]
+
+
+def gateway_peering_environment(vpc_cidr: str) -> dict:
+    """Kubo environment variables of docker/004-config_peering.sh for the
+    gateway replicas, without the hosts to peer with."""
+    return {
+        'KUBO_SWARM_ADDR_FILTERS': json.dumps(server_addr_filters(vpc_cidr)),
+        'KUBO_PEERING_TIMEOUT_SECONDS': str(PEERING_TIMEOUT_SECONDS),
+    }
+
+
+def peering_hosts_environment(hosts: Sequence[str]) -> dict:
+    """DNS names of the Kubo nodes to peer with."""
+    return {'KUBO_PEERING_HOSTS': ','.join(hosts)}
@@ -0,0 +1,182 @@
+import re
+from typing import NamedTuple, Optional, Tuple
+
+from ipfs_cluster.task_size import TASK_SIZE_PROFILES, TaskSize
+
+# Metrics the balanced allocator can sort the peers by, on top of the
+# tag:<name> informer tags
+ALLOCATOR_METRICS = ('freespace', 'pinqueue', 'numpin')
+
+# Every peer is tagged with its availability zone. The allocator first
+# spreads the replicas of a pin across the AZs, then picks the peers with
+# the most free space in each AZ.
+AZ_TAG = 'az'
+DEFAULT_ALLOCATE_BY = (f'tag:{AZ_TAG}', 'freespace')
+
+
+class PinningConfig(NamedTuple):
+    """ipfs-cluster replication, pin tracker, CRDT batching and allocator
+    settings of every peer.
+
+    A -1 replication factor pins everything on every peer. A 0 CRDT batch
+    size commits every pin on its own.
+    """
+    replication_factor_min: int = -1
+    replication_factor_max: int = -1
+    concurrent_pins: int = 10
+    max_pin_queue_size: int = 1000000
+    crdt_max_batch_size: int = 0
+    crdt_max_batch_age_seconds: int = 0
+    allocate_by: Tuple[str, ...] = DEFAULT_ALLOCATE_BY
+
+
+# Pin and CRDT throughput grow with the task size. Batching trades a few
+# seconds of pin visibility on the other peers for far fewer CRDT
+# commits, and the pin queue is bounded by the ipfs-cluster memory.
+PINNING_PROFILES = {
+    'small': PinningConfig(
+        concurrent_pins=10, max_pin_queue_size=100000,
+        crdt_max_batch_size=100, crdt_max_batch_age_seconds=5,
+    ),
+    'medium': PinningConfig(
+        concurrent_pins=20, max_pin_queue_size=500000,
+        crdt_max_batch_size=250, crdt_max_batch_age_seconds=5,
+    ),
+    'large': PinningConfig(
+        concurrent_pins=40, max_pin_queue_size=1000000,
+        crdt_max_batch_size=500, crdt_max_batch_age_seconds=5,
+    ),
+}
+
+
+def pinning_profile(task_size_profile: str, task_size: TaskSize) -> str:
+    """Pinning profile matching a task size profile. Custom task sizes get
+    the largest profile whose task cpu they reach."""
+    task_size_profile = task_size_profile.lower()
+    if task_size_profile in PINNING_PROFILES:
+        return task_size_profile
+    profiles = [name for name in PINNING_PROFILES
+                if TASK_SIZE_PROFILES[name].cpu <= task_size.cpu]
+    return max(profiles, key=lambda name: TASK_SIZE_PROFILES[name].cpu,
+               default='small')
+
+
+def validate_pinning_config(config: PinningConfig, peer_count: int) -> None:
+    rf_min, rf_max = config.replication_factor_min, config.replication_factor_max
+    if rf_min == 0 or rf_min < -1 or rf_max == 0 or rf_max < -1:
+        raise ValueError(
+            f'Invalid replication factor {rf_min}/{rf_max}, expected -1 '
+            f'(every peer) or 1 or more')
+    if (rf_min == -1) != (rf_max == -1):
+        raise ValueError(
+            f'REPLICATION_FACTOR_MIN {rf_min} and REPLICATION_FACTOR_MAX '
+            f'{rf_max} must both be -1 or both be 1 or more')
+    if rf_max < rf_min:
+        raise ValueError(
+            f'REPLICATION_FACTOR_MAX {rf_max} is lower than '
+            f'REPLICATION_FACTOR_MIN {rf_min}')
+    if rf_min > peer_count:
+        raise ValueError(
+            f'REPLICATION_FACTOR_MIN {rf_min} exceeds the {peer_count} '
+            f'peers of the cluster, every pin would fail')
+
+    if config.concurrent_pins < 1:
+        raise ValueError(
+            f'Invalid PINTRACKER_CONCURRENT_PINS {config.concurrent_pins}, '
+            f'expected 1 or more')
+    if config.max_pin_queue_size < 1:
+        raise ValueError(
+            f'Invalid PINTRACKER_MAX_PIN_QUEUE_SIZE '
+            f'{config.max_pin_queue_size}, expected 1 or more')
+
+    if config.crdt_max_batch_size < 0 or config.crdt_max_batch_age_seconds < 0:
+        raise ValueError(
+            f'Invalid CRDT batching {config.crdt_max_batch_size} pins / '
+            f'{config.crdt_max_batch_age_seconds}s, expected 0 or more')
+    if (config.crdt_max_batch_size == 0) != \
+            (config.crdt_max_batch_age_seconds == 0):
+        raise ValueError(
+            'CRDT_BATCHING_MAX_BATCH_SIZE and '
+            'CRDT_BATCHING_MAX_BATCH_AGE_SECONDS must both be 0 (no '
+            'batching) or both be 1 or more')
+
+    if not config.allocate_by:
+        raise ValueError('ALLOCATOR_ALLOCATE_BY needs at least one metric')
+    for metric in config.allocate_by:
+        if metric not in ALLOCATOR_METRICS and \
+                not re.fullmatch(r'tag:[\w.-]+', metric):
+            raise ValueError(
+                f'Invalid ALLOCATOR_ALLOCATE_BY metric {metric!r}, expected '
+                f'tag:<name> or one of {list(ALLOCATOR_METRICS)}')
+
+
+def _optional_int(ipfs_cluster_env: dict, key: str) -> Optional[int]:
+    value = ipfs_cluster_env.get(key)
+    return int(value) if value else None
+
+
+def get_pinning_config(ipfs_cluster_env: dict, profile: str,
+                       peer_count: int,
+                       crdt_batching: bool = True) -> PinningConfig:
+    """Resolve a pinning profile (small, medium or large) and apply the
+    REPLICATION_FACTOR_MIN, REPLICATION_FACTOR_MAX,
+    PINTRACKER_CONCURRENT_PINS, PINTRACKER_MAX_PIN_QUEUE_SIZE,
+    CRDT_BATCHING_MAX_BATCH_SIZE, CRDT_BATCHING_MAX_BATCH_AGE_SECONDS and
+    ALLOCATOR_ALLOCATE_BY overrides of ipfscluster.env.
+
+    Without crdt_batching the CRDT batching of the profile is left off,
+    unless the CRDT_BATCHING_* overrides turn it on.
+    """
+    profile = profile.lower()
+    if profile not in PINNING_PROFILES:
+        raise ValueError(
+            f'Unknown pinning profile {profile!r}, expected one of '
+            f'{sorted(PINNING_PROFILES)}')
+    config = PINNING_PROFILES[profile]
+    if not crdt_batching:
+        config = config._replace(crdt_max_batch_size=0,
+                                 crdt_max_batch_age_seconds=0)
+
+    overrides = {
+        'replication_factor_min': 'REPLICATION_FACTOR_MIN',
+        'replication_factor_max': 'REPLICATION_FACTOR_MAX',
+        'concurrent_pins': 'PINTRACKER_CONCURRENT_PINS',
+        'max_pin_queue_size': 'PINTRACKER_MAX_PIN_QUEUE_SIZE',
+        'crdt_max_batch_size': 'CRDT_BATCHING_MAX_BATCH_SIZE',
+        'crdt_max_batch_age_seconds': 'CRDT_BATCHING_MAX_BATCH_AGE_SECONDS',
+    }
+    for field, key in overrides.items():
+        value = _optional_int(ipfs_cluster_env, key)
+        if value is not None:
+            config = config._replace(**{field: value})
+
+    allocate_by = ipfs_cluster_env.get('ALLOCATOR_ALLOCATE_BY')
+    if allocate_by:
+        config = config._replace(allocate_by=tuple(
+            metric.strip() for metric in allocate_by.split(',')
+            if metric.strip()))
+
+    validate_pinning_config(config, peer_count)
+    return config
+
+
+def pinning_environment(config: PinningConfig) -> dict:
+    """ipfs-cluster environment variables of a pinning configuration."""
+    return {
+        'CLUSTER_REPLICATIONFACTORMIN': str(config.replication_factor_min),
+        'CLUSTER_REPLICATIONFACTORMAX': str(config.replication_factor_max),
+        'CLUSTER_STATELESS_CONCURRENTPINS': str(config.concurrent_pins),
+        'CLUSTER_STATELESS_MAXPINQUEUESIZE': str(config.max_pin_queue_size),
+        'CLUSTER_CRDT_BATCHING_MAXBATCHSIZE': str(config.crdt_max_batch_size),
+        'CLUSTER_CRDT_BATCHING_MAXBATCHAGE':
+            f'{config.crdt_max_batch_age_seconds}s',
+        'CLUSTER_BALANCED_ALLOCATEBY': ','.join(config.allocate_by),
+    }
+
+
+def informer_tags_environment(availability_zone: str) -> dict:
+    """ipfs-cluster environment variables of the tags informer of a peer.
+    The group tag keeps its ipfs-cluster default."""
+    return {
+        'CLUSTER_TAGS_TAGS': f'group:default,{AZ_TAG}:{availability_zone}',
+    }
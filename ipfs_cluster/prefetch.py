@@ -0,0 +1,169 @@
+import argparse
+import collections
+import gzip
+import re
+import sys
+from typing import Iterable, List, NamedTuple, Optional, TextIO
+
+PREFETCH_TASKS = ('gateway', 'all')
+
+# The warm-up must end within the ECS health check start period (at most
+# 300 seconds), after the daemon has started
+MAX_PREFETCH_TIMEOUT_SECONDS = 240
+HEALTH_CHECK_START_MARGIN_SECONDS = 60
+
+# The hot list is passed as one environment variable, under the Linux
+# 128 KiB limit of a single environment string
+MAX_PREFETCH_CIDS_BYTES = 120 * 1024
+
+# Requests for content: /ipfs/<cid>[/<path>] and /ipns/<name>[/<path>]
+CONTENT_PATH = re.compile(r'^/ip[fn]s/[^/\s]+(/[^\s]*)?$')
+
+
+class PrefetchConfig(NamedTuple):
+    """Warm-up of the Kubo blockstore before a task reports healthy.
+
+    The hot list is read from an S3 environment file (s3_bucket/s3_key)
+    defining KUBO_PREFETCH_CIDS, or from a text file published on IPFS
+    (ipfs_list).
+    """
+    tasks: str = 'gateway'
+    s3_bucket: Optional[str] = None
+    s3_key: Optional[str] = None
+    ipfs_list: Optional[str] = None
+    concurrency: int = 8
+    max_cids: int = 1000
+    timeout_seconds: int = 180
+
+    @property
+    def health_check_start_period_seconds(self) -> int:
+        return self.timeout_seconds + HEALTH_CHECK_START_MARGIN_SECONDS
+
+
+def _positive_int(ipfs_cluster_env: dict, key: str, default: int,
+                  maximum: int) -> int:
+    value = int(ipfs_cluster_env.get(key) or default)
+    if not 1 <= value <= maximum:
+        raise ValueError(f'Invalid {key} {value}, expected 1 to {maximum}')
+    return value
+
+
+def get_prefetch_config(ipfs_cluster_env: dict) -> Optional[PrefetchConfig]:
+    """Read the KUBO_PREFETCH settings of ipfscluster.env, None when the
+    warm-up is disabled."""
+    tasks = (ipfs_cluster_env.get('KUBO_PREFETCH') or 'off').lower()
+    if tasks == 'off':
+        return None
+    if tasks not in PREFETCH_TASKS:
+        raise ValueError(
+            f'Invalid KUBO_PREFETCH {tasks!r}, expected one of '
+            f"{['off'] + list(PREFETCH_TASKS)}")
+
+    s3_bucket = s3_key = None
+    s3_object = ipfs_cluster_env.get('KUBO_PREFETCH_S3_OBJECT')
+    if s3_object:
+        match = re.fullmatch(r's3://([^/]+)/(.+\.env)', s3_object)
+        if not match:
+            raise ValueError(
+                f'Invalid KUBO_PREFETCH_S3_OBJECT {s3_object!r}, expected '
+                's3://<bucket>/<key>.env')
+        s3_bucket, s3_key = match.groups()
+
+    ipfs_list = ipfs_cluster_env.get('KUBO_PREFETCH_LIST') or None
+    if ipfs_list and not CONTENT_PATH.match(ipfs_list):
+        raise ValueError(
+            f'Invalid KUBO_PREFETCH_LIST {ipfs_list!r}, expected an '
+            '/ipfs/ or /ipns/ path')
+    if not s3_object and not ipfs_list:
+        raise ValueError('KUBO_PREFETCH needs KUBO_PREFETCH_S3_OBJECT or '
+                         'KUBO_PREFETCH_LIST')
+
+    return PrefetchConfig(
+        tasks=tasks,
+        s3_bucket=s3_bucket,
+        s3_key=s3_key,
+        ipfs_list=ipfs_list,
+        concurrency=_positive_int(
+            ipfs_cluster_env, 'KUBO_PREFETCH_CONCURRENCY', 8, 64),
+        max_cids=_positive_int(
+            ipfs_cluster_env, 'KUBO_PREFETCH_MAX_CIDS', 1000, 100000),
+        timeout_seconds=_positive_int(
+            ipfs_cluster_env, 'KUBO_PREFETCH_TIMEOUT_SECONDS', 180,
+            MAX_PREFETCH_TIMEOUT_SECONDS),
+    )
+
+
+def prefetch_environment(config: PrefetchConfig) -> dict:
+    """Kubo environment variables of docker/prefetch.sh."""
+    environment = {
+        'KUBO_PREFETCH': 'true',
+        'KUBO_PREFETCH_CONCURRENCY': str(config.concurrency),
+        'KUBO_PREFETCH_MAX_CIDS': str(config.max_cids),
+        'KUBO_PREFETCH_TIMEOUT_SECONDS': str(config.timeout_seconds),
+    }
+    if config.ipfs_list:
+        environment['KUBO_PREFETCH_LIST'] = config.ipfs_list
+    return environment
+
+
+def read_cloudfront_log(lines: Iterable[str]) -> Iterable[str]:
+    """Content paths requested in a CloudFront standard log file."""
+    uri_index, status_index = 7, 8
+    for line in lines:
+        if line.startswith('#Fields:'):
+            fields = line.split()[1:]
+            uri_index = fields.index('cs-uri-stem')
+            status_index = fields.index('sc-status')
+            continue
+        if line.startswith('#'):
+            continue
+        values = line.rstrip('\n').split('\t')
+        if len(values) <= max(uri_index, status_index):
+            continue
+        if values[status_index] in ('200', '206', '304') and \
+                CONTENT_PATH.match(values[uri_index]):
+            yield values[uri_index]
+
+
+def hot_paths(paths: Iterable[str], top: int) -> List[str]:
+    """The most requested paths, most requested first."""
+    return [path for path, _ in collections.Counter(paths).most_common(top)]
+
+
+def write_prefetch_env_file(paths: List[str], output: TextIO) -> int:
+    """Write the KUBO_PREFETCH_CIDS environment file of the hot paths that
+    fit in one environment variable. Return the number of paths."""
+    kept, size = [], len('KUBO_PREFETCH_CIDS=')
+    for path in paths:
+        size += len(path) + 1
+        if size > MAX_PREFETCH_CIDS_BYTES:
+            break
+        kept.append(path)
+    output.write('KUBO_PREFETCH_CIDS=' + ' '.join(kept) + '\n')
+    return len(kept)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m ipfs_cluster.prefetch',
+        description='Build the hot list of the Kubo warm-up from '
+        'CloudFront standard logs.')
+    parser.add_argument('logs', nargs='+',
+                        help='CloudFront log files (.gz or plain text)')
+    parser.add_argument('--top', type=int, default=1000,
+                        help='number of paths (default %(default)s)')
+    args = parser.parse_args(argv)
+
+    def paths():
+        for log in args.logs:
+            opener = gzip.open if log.endswith('.gz') else open
+            with opener(log, 'rt') as f:
+                yield from read_cloudfront_log(f)
+
+    count = write_prefetch_env_file(hot_paths(paths(), args.top), sys.stdout)
+    print(f'{count} hot paths', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
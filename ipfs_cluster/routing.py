@@ -0,0 +1,69 @@
+from typing import NamedTuple, Optional
+
+ROUTING_PROFILES = ('standard', 'accelerated')
+REPROVIDER_STRATEGIES = ('all', 'pinned', 'roots')
+
+# The accelerated DHT client crawls the whole DHT every hour and keeps a
+# connection to thousands of peers while it reprovides: below 2 vCPU and
+# 4 GiB for Kubo it competes with the gateway and bitswap
+ACCELERATED_DHT_MIN_KUBO_CPU = 2048
+ACCELERATED_DHT_MIN_KUBO_MEMORY_MIB = 4096
+
+
+class RoutingConfig(NamedTuple):
+    """Kubo content routing and reproviding (docker/002-config_resources.sh).
+
+    The standard DHT client reprovides one block at a time, the accelerated
+    client sends the provider records of many blocks at once to the peers
+    of its full routing table. A None reprovider strategy is derived from
+    the Kubo memory by the image.
+    """
+    accelerated_dht_client: bool = False
+    reprovider_strategy: Optional[str] = None
+
+
+def get_routing_config(ipfs_cluster_env: dict) -> RoutingConfig:
+    """Read the KUBO_ROUTING_PROFILE and KUBO_REPROVIDER_STRATEGY settings
+    of ipfscluster.env."""
+    profile = (ipfs_cluster_env.get('KUBO_ROUTING_PROFILE') or
+               'standard').lower()
+    if profile not in ROUTING_PROFILES:
+        raise ValueError(
+            f'Invalid KUBO_ROUTING_PROFILE {profile!r}, expected one of '
+            f'{list(ROUTING_PROFILES)}')
+
+    strategy = (ipfs_cluster_env.get('KUBO_REPROVIDER_STRATEGY') or
+                '').lower() or None
+    if strategy is not None and strategy not in REPROVIDER_STRATEGIES:
+        raise ValueError(
+            f'Invalid KUBO_REPROVIDER_STRATEGY {strategy!r}, expected one of '
+            f'{list(REPROVIDER_STRATEGIES)}')
+
+    return RoutingConfig(accelerated_dht_client=profile == 'accelerated',
+                         reprovider_strategy=strategy)
+
+
+def routing_environment(config: RoutingConfig) -> dict:
+    """Kubo environment variables of a routing configuration."""
+    environment = {
+        'KUBO_ACCELERATED_DHT_CLIENT':
+            str(config.accelerated_dht_client).lower(),
+    }
+    if config.reprovider_strategy:
+        environment['KUBO_REPROVIDER_STRATEGY'] = config.reprovider_strategy
+    return environment
+
+
+def routing_task_size_warning(config: RoutingConfig, kubo_cpu: int,
+                              kubo_memory_mib: int) -> Optional[str]:
+    """Warning when the Kubo share of a task is too small for the
+    accelerated DHT client, None otherwise."""
+    if not config.accelerated_dht_client:
+        return None
+    if kubo_cpu >= ACCELERATED_DHT_MIN_KUBO_CPU and \
+            kubo_memory_mib >= ACCELERATED_DHT_MIN_KUBO_MEMORY_MIB:
+        return None
+    return (f'KUBO_ROUTING_PROFILE=accelerated with {kubo_cpu} cpu units '
+            f'and {kubo_memory_mib} MiB for Kubo, the accelerated DHT client '
+            f'needs at least {ACCELERATED_DHT_MIN_KUBO_CPU} cpu units and '
+            f'{ACCELERATED_DHT_MIN_KUBO_MEMORY_MIB} MiB: use a large task size')
@@ -0,0 +1,69 @@
+from typing import NamedTuple, Tuple
+
+# Every transport listens on the swarm port, TCP or UDP
+SWARM_PORT = 4001
+SWARM_TRANSPORTS = ('tcp', 'quic', 'webtransport')
+UDP_TRANSPORTS = ('quic', 'webtransport')
+
+
+class SwarmConfig(NamedTuple):
+    """libp2p transports of the Kubo swarm (docker/003-config_swarm.sh).
+
+    QUIC and WebTransport set up an encrypted connection in one round-trip
+    over UDP, against three for TCP with the security and muxer
+    negotiation. TCP stays on for the peers that cannot use UDP.
+    """
+    transports: Tuple[str, ...] = ('tcp',)
+    # Announce the swarm addresses on the public IP of the task
+    announce_public_ip: bool = True
+
+    @property
+    def udp(self) -> bool:
+        return any(transport in UDP_TRANSPORTS
+                   for transport in self.transports)
+
+
+def get_swarm_config(ipfs_cluster_env: dict,
+                     announce_public_ip: bool = True) -> SwarmConfig:
+    """Read the KUBO_SWARM_TRANSPORTS setting of ipfscluster.env, a comma
+    separated list of tcp, quic and webtransport."""
+    transports = tuple(dict.fromkeys(
+        transport.strip().lower() for transport in
+        (ipfs_cluster_env.get('KUBO_SWARM_TRANSPORTS') or 'tcp').split(',')
+        if transport.strip()))
+    for transport in transports:
+        if transport not in SWARM_TRANSPORTS:
+            raise ValueError(
+                f'Invalid KUBO_SWARM_TRANSPORTS transport {transport!r}, '
+                f'expected {list(SWARM_TRANSPORTS)}')
+    if 'tcp' not in transports:
+        raise ValueError('KUBO_SWARM_TRANSPORTS must keep tcp for the peers '
+                         'that cannot reach the UDP transports')
+    if 'webtransport' in transports and 'quic' not in transports:
+        raise ValueError('KUBO_SWARM_TRANSPORTS webtransport runs over QUIC, '
+                         'add quic')
+    return SwarmConfig(transports=transports,
+                       announce_public_ip=announce_public_ip)
+
+
+def swarm_environment(config: SwarmConfig) -> dict:
+    """Kubo environment variables of docker/003-config_swarm.sh."""
+    return {
+        'KUBO_SWARM_TRANSPORTS': ','.join(config.transports),
+        'KUBO_SWARM_ANNOUNCE_PUBLIC_IP': str(config.announce_public_ip).lower(),
+    }
+
+
+def swarm_listener_port(peer_index: int) -> int:
+    """Port of the swarm load balancer listener of a peer in private
+    subnets."""
+    return SWARM_PORT + peer_index
+
+
+def swarm_announce_environment(host: str, port: int) -> dict:
+    """Kubo environment variables announcing the swarm addresses on a load
+    balancer DNS name and port instead of the task public IP."""
+    return {
+        'KUBO_SWARM_ANNOUNCE_HOST': host,
+        'KUBO_SWARM_ANNOUNCE_PORT': str(port),
+    }
@@ -0,0 +1,132 @@
+from typing import NamedTuple, Optional
+
+
+class TaskSize(NamedTuple):
+    """Fargate sizing of an IPFS peer task and of its two containers."""
+    cpu: int
+    memory_limit_mib: int
+    kubo_cpu: int
+    kubo_memory_reservation_mib: int
+    cluster_cpu: int
+    cluster_memory_reservation_mib: int
+    ephemeral_storage_gib: Optional[int] = None
+
+
+# small is the historical 1 vCPU / 2 GiB task
+TASK_SIZE_PROFILES = {
+    'small': TaskSize(
+        cpu=1024, memory_limit_mib=2048,
+        kubo_cpu=768, kubo_memory_reservation_mib=1024,
+        cluster_cpu=256, cluster_memory_reservation_mib=512,
+    ),
+    'medium': TaskSize(
+        cpu=2048, memory_limit_mib=4096,
+        kubo_cpu=1536, kubo_memory_reservation_mib=2560,
+        cluster_cpu=512, cluster_memory_reservation_mib=1024,
+    ),
+    'large': TaskSize(
+        cpu=4096, memory_limit_mib=8192,
+        kubo_cpu=3072, kubo_memory_reservation_mib=5120,
+        cluster_cpu=1024, cluster_memory_reservation_mib=2048,
+    ),
+}
+
+# Legal Fargate (Linux) memory values in MiB for each task CPU value
+# https://docs.aws.amazon.com/AmazonECS/latest/developerguide/task-cpu-memory-error.html
+FARGATE_CPU_MEMORY = {
+    256: [512, 1024, 2048],
+    512: list(range(1024, 4096 + 1, 1024)),
+    1024: list(range(2048, 8192 + 1, 1024)),
+    2048: list(range(4096, 16384 + 1, 1024)),
+    4096: list(range(8192, 30720 + 1, 1024)),
+    8192: list(range(16384, 61440 + 1, 4096)),
+    16384: list(range(32768, 122880 + 1, 8192)),
+}
+
+FARGATE_EPHEMERAL_STORAGE_GIB = (21, 200)
+
+
+def validate_task_size(task_size: TaskSize) -> None:
+    if task_size.cpu not in FARGATE_CPU_MEMORY:
+        raise ValueError(
+            f'Invalid Fargate task cpu {task_size.cpu}, '
+            f'expected one of {sorted(FARGATE_CPU_MEMORY)}')
+
+    if task_size.memory_limit_mib not in FARGATE_CPU_MEMORY[task_size.cpu]:
+        raise ValueError(
+            f'Invalid Fargate task memory {task_size.memory_limit_mib} MiB '
+            f'for cpu {task_size.cpu}, expected one of '
+            f'{FARGATE_CPU_MEMORY[task_size.cpu]}')
+
+    if task_size.kubo_cpu + task_size.cluster_cpu > task_size.cpu:
+        raise ValueError(
+            f'Kubo ({task_size.kubo_cpu}) and ipfs-cluster '
+            f'({task_size.cluster_cpu}) cpu exceed the task cpu '
+            f'{task_size.cpu}')
+
+    if task_size.kubo_memory_reservation_mib + \
+            task_size.cluster_memory_reservation_mib > task_size.memory_limit_mib:
+        raise ValueError(
+            f'Kubo ({task_size.kubo_memory_reservation_mib} MiB) and '
+            f'ipfs-cluster ({task_size.cluster_memory_reservation_mib} MiB) '
+            f'memory reservations exceed the task memory '
+            f'{task_size.memory_limit_mib} MiB')
+
+    if task_size.ephemeral_storage_gib is not None:
+        _min, _max = FARGATE_EPHEMERAL_STORAGE_GIB
+        if not _min <= task_size.ephemeral_storage_gib <= _max:
+            raise ValueError(
+                f'Invalid Fargate ephemeral storage '
+                f'{task_size.ephemeral_storage_gib} GiB, expected '
+                f'{_min} to {_max} GiB')
+
+
+def _optional_int(ipfs_cluster_env: dict, key: str) -> Optional[int]:
+    value = ipfs_cluster_env.get(key)
+    return int(value) if value else None
+
+
+def get_task_size(ipfs_cluster_env: dict, profile: str) -> TaskSize:
+    """Resolve a sizing profile (small, medium, large or custom).
+
+    The custom profile is read from the TASK_CPU, TASK_MEMORY_MIB,
+    KUBO_CPU, KUBO_MEMORY_RESERVATION_MIB, CLUSTER_CPU and
+    CLUSTER_MEMORY_RESERVATION_MIB variables. TASK_EPHEMERAL_STORAGE_GIB
+    applies to every profile when set.
+    """
+    profile = profile.lower()
+    if profile == 'custom':
+        task_size = TaskSize(
+            cpu=int(ipfs_cluster_env['TASK_CPU']),
+            memory_limit_mib=int(ipfs_cluster_env['TASK_MEMORY_MIB']),
+            kubo_cpu=int(ipfs_cluster_env['KUBO_CPU']),
+            kubo_memory_reservation_mib=int(
+                ipfs_cluster_env['KUBO_MEMORY_RESERVATION_MIB']),
+            cluster_cpu=int(ipfs_cluster_env['CLUSTER_CPU']),
+            cluster_memory_reservation_mib=int(
+                ipfs_cluster_env['CLUSTER_MEMORY_RESERVATION_MIB']),
+        )
+    elif profile in TASK_SIZE_PROFILES:
+        task_size = TASK_SIZE_PROFILES[profile]
+    else:
+        raise ValueError(
+            f'Unknown task size profile {profile!r}, expected one of '
+            f'{sorted(TASK_SIZE_PROFILES) + ["custom"]}')
+
+    _ephemeral_storage_gib = _optional_int(
+        ipfs_cluster_env, 'TASK_EPHEMERAL_STORAGE_GIB')
+    if _ephemeral_storage_gib is not None:
+        task_size = task_size._replace(
+            ephemeral_storage_gib=_ephemeral_storage_gib)
+
+    validate_task_size(task_size)
+    return task_size
+
+
+def with_ephemeral_storage(task_size: TaskSize, storage_gib: int) -> TaskSize:
+    """Grow the task ephemeral storage to at least storage_gib."""
+    task_size = task_size._replace(
+        ephemeral_storage_gib=max(task_size.ephemeral_storage_gib or 0,
+                                  storage_gib))
+    validate_task_size(task_size)
+    return task_size
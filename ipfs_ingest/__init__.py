@@ -0,0 +1,3 @@
+from ipfs_ingest.client import ClusterApiError, ClusterClient
+from ipfs_ingest.ingest import IngestReport, IngestResult, add_item, ingest
+from ipfs_ingest.sources import IngestItem, iter_items, read_object_list, walk_directory
@@ -0,0 +1,110 @@
+"""Bulk-add files to the IPFS cluster through its REST API.
+
+    python -m ipfs_ingest --endpoint https://<IpfsClusterEndpoint> \\
+        --credential admin:p@ssw0rd --workers 16 ./data
+    python -m ipfs_ingest --endpoint http://<IpfsInternalApiEndpoint>:9094 \\
+        --list objects.txt --output added.jsonl
+
+The endpoint and credential default to the IPFS_CLUSTER_ENDPOINT and
+IPFS_CLUSTER_CREDENTIAL environment variables.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+from ipfs_ingest.client import ClusterClient
+from ipfs_ingest.ingest import (DEFAULT_CHUNK_SIZE, DEFAULT_RETRIES,
+                                DEFAULT_WORKERS, IngestResult, ingest)
+from ipfs_ingest.sources import iter_items
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='python -m ipfs_ingest',
+        description='Stream files to the ipfs-cluster /add endpoint.')
+    parser.add_argument('sources', nargs='*',
+                        help='files or directories to add')
+    parser.add_argument('--list', type=argparse.FileType('r'),
+                        help='object list, one path or s3:// URI per line '
+                        '(- for stdin)')
+    parser.add_argument('--endpoint',
+                        default=os.environ.get('IPFS_CLUSTER_ENDPOINT'),
+                        help='ipfs-cluster REST API URL')
+    parser.add_argument('--credential',
+                        default=os.environ.get('IPFS_CLUSTER_CREDENTIAL'),
+                        help='REST API basic auth user:password')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='concurrent uploads (default %(default)s)')
+    parser.add_argument('--chunk-size-kib', type=int,
+                        default=DEFAULT_CHUNK_SIZE // 1024,
+                        help='read and send size (default %(default)s)')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help='retries of each file (default %(default)s)')
+    parser.add_argument('--timeout', type=float, default=300,
+                        help='seconds allowed for each file '
+                        '(default %(default)s)')
+    parser.add_argument('--replication-min', type=int,
+                        help='minimum replication factor of the pins')
+    parser.add_argument('--replication-max', type=int,
+                        help='maximum replication factor of the pins')
+    parser.add_argument('--param', action='append', default=[],
+                        metavar='KEY=VALUE',
+                        help='other /add query parameter, e.g. cid-version=1')
+    parser.add_argument('--output', type=argparse.FileType('w'),
+                        help='write one JSON line per file (name, uri, cid '
+                        'or error)')
+    parser.add_argument('--report-interval', type=float, default=30,
+                        help='seconds between progress reports '
+                        '(default %(default)s)')
+    args = parser.parse_args(argv)
+
+    if not args.sources and args.list is None:
+        parser.error('give files, directories or --list')
+    if not args.endpoint:
+        parser.error('--endpoint or IPFS_CLUSTER_ENDPOINT is required')
+    for param in args.param:
+        if '=' not in param:
+            parser.error(f'--param {param!r} must be KEY=VALUE')
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s %(levelname)s %(message)s')
+
+    params = dict(p.split('=', 1) for p in args.param)
+    if args.replication_min is not None:
+        params['replication-min'] = str(args.replication_min)
+    if args.replication_max is not None:
+        params['replication-max'] = str(args.replication_max)
+
+    def on_result(result: IngestResult) -> None:
+        if args.output is not None:
+            args.output.write(json.dumps({
+                'name': result.item.name,
+                'uri': result.item.uri,
+                'cid': result.cid,
+                'size': result.size,
+                'error': result.error,
+            }) + '\n')
+
+    report = asyncio.run(ingest(
+        iter_items(args.sources, args.list),
+        lambda: ClusterClient(args.endpoint, args.credential, params,
+                              timeout=args.timeout),
+        workers=args.workers,
+        chunk_size=args.chunk_size_kib * 1024,
+        retries=args.retries,
+        on_result=on_result,
+        report_interval_seconds=args.report_interval,
+    ))
+    logging.info('Done: %s', report)
+    return 1 if report.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
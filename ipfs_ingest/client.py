@@ -0,0 +1,177 @@
+import asyncio
+import base64
+import json
+import ssl
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlencode, urlparse
+
+USER_AGENT = 'ipfs-ingest'
+
+
+class ClusterApiError(Exception):
+    """Error response of the ipfs-cluster REST API."""
+
+    def __init__(self, status: int, reason: str, body: bytes = b''):
+        super().__init__(f'{status} {reason}: {body[:200].decode(errors="replace")}')
+        self.status = status
+
+    @property
+    def retryable(self) -> bool:
+        # Throttling, overload and unavailable peers or load balancers
+        return self.status == 429 or self.status >= 500
+
+
+class ClusterClient:
+    """Minimal HTTP/1.1 client of the ipfs-cluster REST API /add endpoint.
+
+    Each client holds one keep-alive connection, opened on the first
+    request and reopened after an error. Files are sent as a multipart
+    body with a Content-Length, one chunk at a time: the socket buffer
+    bounds the memory and applies backpressure to the source.
+    """
+
+    def __init__(self, endpoint: str, credential: Optional[str] = None,
+                 params: Optional[Dict[str, str]] = None,
+                 timeout: float = 300):
+        url = urlparse(endpoint)
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            raise ValueError(f'Invalid endpoint {endpoint!r}, expected '
+                             'http(s)://host[:port]')
+        self._host = url.hostname
+        self._port = url.port or (443 if url.scheme == 'https' else 80)
+        self._ssl = ssl.create_default_context() if url.scheme == 'https' \
+            else None
+        self._host_header = url.netloc.rpartition('@')[2]
+        self._path = url.path.rstrip('/') + '/add'
+        self._params = dict(params or {})
+        self._authorization = None
+        if credential:
+            self._authorization = 'Basic ' + \
+                base64.b64encode(credential.encode()).decode()
+        self._timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def add(self, name: str, size: int,
+                  chunks: AsyncIterator[bytes]) -> dict:
+        """Add a file and return its /add output ({"name", "cid", ...})."""
+        try:
+            return await asyncio.wait_for(
+                self._add(name, size, chunks), self._timeout)
+        except BaseException:
+            # The connection state is unknown after an error
+            await self.close()
+            raise
+
+    async def _add(self, name: str, size: int,
+                   chunks: AsyncIterator[bytes]) -> dict:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(
+                self._host, self._port, ssl=self._ssl)
+
+        boundary = uuid.uuid4().hex
+        # The multipart reader of ipfs-cluster unescapes the filename into a
+        # path: a nested name would point into a directory part never sent.
+        # The full name goes in the name query parameter.
+        filename = quote(name.rsplit('/', 1)[-1], safe='')
+        part_head = (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="file"; '
+            f'filename="{filename}"\r\n'
+            'Content-Type: application/octet-stream\r\n\r\n'
+        ).encode()
+        part_tail = f'\r\n--{boundary}--\r\n'.encode()
+        query = urlencode(dict(self._params, name=name))
+
+        headers = [
+            f'POST {self._path}?{query} HTTP/1.1',
+            f'Host: {self._host_header}',
+            f'User-Agent: {USER_AGENT}',
+            f'Content-Type: multipart/form-data; boundary={boundary}',
+            f'Content-Length: {len(part_head) + size + len(part_tail)}',
+        ]
+        if self._authorization:
+            headers.append(f'Authorization: {self._authorization}')
+        self._writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode())
+        self._writer.write(part_head)
+
+        sent = 0
+        async for chunk in chunks:
+            sent += len(chunk)
+            if sent > size:
+                break
+            self._writer.write(chunk)
+            await self._writer.drain()
+        if sent != size:
+            raise ValueError(f'{name} is {sent} bytes, expected {size}')
+        self._writer.write(part_tail)
+        await self._writer.drain()
+
+        status, reason, response_headers, body = await self._read_response()
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        if status != 200:
+            raise ClusterApiError(status, reason, body)
+        return parse_add_output(body, name)
+
+    async def _read_response(self) -> Tuple[int, str, Dict[str, str], bytes]:
+        status_line = (await self._reader.readuntil(b'\r\n')).decode()
+        _, status, reason = (status_line.rstrip('\r\n').split(' ', 2) + [''])[:3]
+        headers = {}
+        while True:
+            line = (await self._reader.readuntil(b'\r\n')).decode()
+            if line == '\r\n':
+                break
+            key, _, value = line.partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = bytearray()
+            while True:
+                chunk_size = int(
+                    (await self._reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if chunk_size == 0:
+                    # Trailers are not used by ipfs-cluster
+                    await self._reader.readuntil(b'\r\n')
+                    break
+                body += await self._reader.readexactly(chunk_size)
+                await self._reader.readexactly(2)
+        elif 'content-length' in headers:
+            body = await self._reader.readexactly(
+                int(headers['content-length']))
+        else:
+            body = await self._reader.read()
+            headers['connection'] = 'close'
+        return int(status), reason, headers, bytes(body)
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            writer, self._reader, self._writer = self._writer, None, None
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (OSError, ssl.SSLError):
+                pass
+
+
+def parse_add_output(body: bytes, name: str) -> dict:
+    """The /add endpoint streams one JSON object per added node (or a JSON
+    list with stream-channels=false). Return the output of the file."""
+    text = body.decode().strip()
+    if text.startswith('['):
+        outputs: List[dict] = json.loads(text)
+    else:
+        outputs = [json.loads(line) for line in text.splitlines() if line]
+    outputs = [o for o in outputs if o.get('cid')]
+    if not outputs:
+        raise ClusterApiError(200, 'no CID in the /add output', body)
+    for output in outputs:
+        if output.get('name') == name:
+            break
+    else:
+        output = outputs[-1]
+    # ipfs-cluster < 1.0 returns the CID as {"/": "<cid>"}
+    if isinstance(output['cid'], dict):
+        output = dict(output, cid=output['cid']['/'])
+    return output
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import random
+import ssl
+import time
+from typing import Callable, Iterable, NamedTuple, Optional
+
+from ipfs_ingest.client import ClusterApiError, ClusterClient
+from ipfs_ingest.sources import IngestItem, iter_chunks, open_item
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+DEFAULT_CHUNK_SIZE = 256 * 1024
+DEFAULT_RETRIES = 5
+
+
+class IngestResult(NamedTuple):
+    item: IngestItem
+    cid: Optional[str] = None
+    size: int = 0
+    attempts: int = 1
+    error: Optional[str] = None
+
+
+class IngestReport(NamedTuple):
+    files: int = 0
+    bytes: int = 0
+    failed: int = 0
+    retries: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def mib_per_second(self) -> float:
+        return self.bytes / 2 ** 20 / self.elapsed_seconds \
+            if self.elapsed_seconds else 0.0
+
+    def __str__(self) -> str:
+        return (f'{self.files} files, {self.bytes / 2 ** 20:.1f} MiB in '
+                f'{self.elapsed_seconds:.1f}s ({self.files_per_second:.1f} '
+                f'files/s, {self.mib_per_second:.2f} MiB/s), '
+                f'{self.failed} failed, {self.retries} retries')
+
+
+def _retryable(error: BaseException) -> bool:
+    if isinstance(error, ClusterApiError):
+        return error.retryable
+    # Network errors only: a missing or unreadable local file is an OSError
+    # too and fails the same way on every attempt
+    return isinstance(error, (ConnectionError, TimeoutError,
+                              asyncio.TimeoutError,
+                              asyncio.IncompleteReadError, ssl.SSLError))
+
+
+async def add_item(client: ClusterClient, item: IngestItem,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   retries: int = DEFAULT_RETRIES,
+                   backoff_seconds: float = 1.0) -> IngestResult:
+    """Add an item, retrying network errors, throttling and 5xx responses
+    with exponential backoff and full jitter."""
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            content = await open_item(item)
+            try:
+                output = await client.add(
+                    item.name, content.size, iter_chunks(content, chunk_size))
+            finally:
+                content.close()
+            return IngestResult(item, output['cid'], content.size, attempt)
+        except Exception as e:
+            if attempt > retries or not _retryable(e):
+                return IngestResult(item, attempts=attempt,
+                                    error=f'{type(e).__name__}: {e}')
+            delay = random.uniform(0, backoff_seconds * 2 ** (attempt - 1))
+            logger.debug('Retrying %s in %.1fs: %s', item.name, delay, e)
+            await asyncio.sleep(delay)
+
+
+async def ingest(items: Iterable[IngestItem],
+                 client_factory: Callable[[], ClusterClient],
+                 workers: int = DEFAULT_WORKERS,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 retries: int = DEFAULT_RETRIES,
+                 backoff_seconds: float = 1.0,
+                 on_result: Optional[Callable[[IngestResult], None]] = None,
+                 report_interval_seconds: float = 30) -> IngestReport:
+    """Add items with a pool of workers, one client connection each.
+
+    The items are pulled from a queue of at most 2 * workers items, so
+    listing a large directory or object list never runs ahead of the
+    uploads.
+    """
+    if workers < 1:
+        raise ValueError(f'workers must be at least 1, got {workers}')
+    if chunk_size < 1:
+        raise ValueError(f'chunk_size must be at least 1, got {chunk_size}')
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2 * workers)
+    start = time.monotonic()
+    totals = {'files': 0, 'bytes': 0, 'failed': 0, 'retries': 0}
+
+    def report() -> IngestReport:
+        return IngestReport(elapsed_seconds=time.monotonic() - start,
+                            **totals)
+
+    async def worker():
+        client = client_factory()
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                result = await add_item(client, item, chunk_size, retries,
+                                        backoff_seconds)
+                totals['retries'] += result.attempts - 1
+                if result.error:
+                    totals['failed'] += 1
+                    logger.warning('Failed to add %s: %s', item.uri,
+                                   result.error)
+                else:
+                    totals['files'] += 1
+                    totals['bytes'] += result.size
+                if on_result is not None:
+                    on_result(result)
+        finally:
+            await client.close()
+
+    async def reporter():
+        while True:
+            await asyncio.sleep(report_interval_seconds)
+            logger.info('%s', report())
+
+    async def producer():
+        for item in items:
+            await queue.put(item)
+        for _ in range(workers):
+            await queue.put(None)
+
+    # A failed worker or source fails the whole ingest right away
+    tasks = [asyncio.create_task(producer())] + \
+        [asyncio.create_task(worker()) for _ in range(workers)]
+    reporter_task = asyncio.create_task(reporter())
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        reporter_task.cancel()
+        for task in tasks:
+            task.cancel()
+
+    return report()
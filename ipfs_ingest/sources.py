@@ -0,0 +1,107 @@
+import asyncio
+import os
+from typing import (AsyncIterator, Callable, Iterable, Iterator, NamedTuple,
+                    TextIO)
+from urllib.parse import urlparse
+
+
+class IngestItem(NamedTuple):
+    """A file to add to the cluster.
+
+    ``name`` is the pin name in the cluster and ``uri`` a local path or an
+    ``s3://bucket/key`` URI.
+    """
+    name: str
+    uri: str
+
+
+def walk_directory(path: str) -> Iterator[IngestItem]:
+    """Files under path, named after their path relative to it.
+
+    Directories are walked lazily in sorted order, so millions of files
+    are never listed in memory at once and a rerun sees the same order.
+    """
+    if os.path.isfile(path):
+        yield IngestItem(os.path.basename(path), path)
+        return
+    if not os.path.isdir(path):
+        raise ValueError(f'{path} is neither a file nor a directory')
+
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for file_name in sorted(files):
+            file_path = os.path.join(root, file_name)
+            name = os.path.relpath(file_path, path).replace(os.sep, '/')
+            yield IngestItem(name, file_path)
+
+
+def read_object_list(lines: Iterable[str]) -> Iterator[IngestItem]:
+    """Items of an object list: one local path or s3:// URI per line.
+
+    Blank lines and lines starting with # are skipped. S3 objects are
+    named after their key.
+    """
+    for line in lines:
+        uri = line.strip()
+        if not uri or uri.startswith('#'):
+            continue
+        if uri.startswith('s3://'):
+            name = urlparse(uri).path.lstrip('/')
+        else:
+            name = os.path.basename(uri)
+        if not name:
+            raise ValueError(f'Cannot name the object {uri!r}')
+        yield IngestItem(name, uri)
+
+
+def iter_items(sources: Iterable[str],
+               object_list: TextIO = None) -> Iterator[IngestItem]:
+    for source in sources:
+        yield from walk_directory(source)
+    if object_list is not None:
+        yield from read_object_list(object_list)
+
+
+_s3_client = None
+
+
+def _s3():
+    global _s3_client
+    if _s3_client is None:
+        # boto3 is slow to import and only needed for S3 objects
+        import boto3
+        _s3_client = boto3.client('s3')
+    return _s3_client
+
+
+class ItemContent(NamedTuple):
+    size: int
+    read: Callable[[int], bytes]
+    close: Callable[[], None]
+
+
+async def open_item(item: IngestItem) -> ItemContent:
+    loop = asyncio.get_running_loop()
+
+    if item.uri.startswith('s3://'):
+        url = urlparse(item.uri)
+        response = await loop.run_in_executor(
+            None, lambda: _s3().get_object(Bucket=url.netloc,
+                                           Key=url.path.lstrip('/')))
+        body = response['Body']
+        return ItemContent(response['ContentLength'], body.read, body.close)
+
+    f = await loop.run_in_executor(None, open, item.uri, 'rb')
+    return ItemContent(os.fstat(f.fileno()).st_size, f.read, f.close)
+
+
+async def iter_chunks(content: ItemContent,
+                      chunk_size: int) -> AsyncIterator[bytes]:
+    """Blocking reads run in the default executor, only one chunk of the
+    item is held in memory."""
+    loop = asyncio.get_running_loop()
+    while True:
+        chunk = await loop.run_in_executor(None, content.read, chunk_size)
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,53 @@
+"""Synth time of the stack for 3, 12 and 48 peers (1, 4 and 16 per AZ).
+
+Run from the repository root:
+
+    python -m tests.synth_benchmark [runs]
+
+The CloudFront prefix list comes from the cdk context, as it does once
+cached in cdk.context.json, so no AWS call is made.
+"""
+import json
+import statistics
+import sys
+import time
+
+import aws_cdk as cdk
+from dotenv import dotenv_values
+
+from ipfs_cluster.cloudfront_prefix_list import context_key
+from ipfs_cluster.ipfs_cluster_fargate_stack import IpfsClusterFargateStack
+
+IPFS_CLUSTER_ENV_FILE = 'ipfscluster.env'
+ENV = cdk.Environment(account='123456789012', region='us-east-1')
+CONTEXT = {context_key(ENV.region): 'pl-3b927c52'}
+NODE_PER_AZ = (1, 4, 16)
+
+
+def synth(node_per_az: int):
+    ipfs_cluster_env = dotenv_values(dotenv_path=IPFS_CLUSTER_ENV_FILE)
+    ipfs_cluster_env['NODE_PER_AZ'] = str(node_per_az)
+    start = time.perf_counter()
+    app = cdk.App(context=CONTEXT)
+    stack = IpfsClusterFargateStack(app, 'ipfs-cluster-fargate',
+                                    ipfs_cluster_env=ipfs_cluster_env,
+                                    env=ENV)
+    template = app.synth().get_stack_by_name(stack.stack_name).template
+    return time.perf_counter() - start, template
+
+
+def main(runs: int = 3) -> None:
+    print(f'{"peers":>5} {"resources":>9} {"template KB":>11} '
+          f'{"synth s (median of " + str(runs) + ")":>24}')
+    for node_per_az in NODE_PER_AZ:
+        timings = []
+        for _ in range(runs):
+            elapsed, template = synth(node_per_az)
+            timings.append(elapsed)
+        print(f'{3 * node_per_az:>5} {len(template["Resources"]):>9} '
+              f'{len(json.dumps(template)) / 1024:>11.0f} '
+              f'{statistics.median(timings):>24.2f}')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
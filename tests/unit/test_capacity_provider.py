@@ -0,0 +1,42 @@
+import pytest
+
+from ipfs_cluster.capacity_provider import (CapacityProviderWeights,
+                                           get_capacity_provider_weights,
+                                           get_stop_timeout_seconds)
+
+
+def test_on_demand_by_default():
+    weights = get_capacity_provider_weights({}, 'follower')
+    assert weights == CapacityProviderWeights()
+    assert not weights.uses_spot
+
+
+def test_spot_weights():
+    weights = get_capacity_provider_weights({
+        'GATEWAY_FARGATE_BASE': '2',
+        'GATEWAY_FARGATE_WEIGHT': '1',
+        'GATEWAY_FARGATE_SPOT_WEIGHT': '3',
+    }, 'GATEWAY')
+    assert weights == CapacityProviderWeights(2, 1, 3)
+    assert weights.uses_spot
+
+
+@pytest.mark.parametrize('env', [
+    {'FOLLOWER_FARGATE_WEIGHT': '0', 'FOLLOWER_FARGATE_SPOT_WEIGHT': '0'},
+    {'FOLLOWER_FARGATE_SPOT_WEIGHT': '-1'},
+])
+def test_invalid_weights(env):
+    with pytest.raises(ValueError):
+        get_capacity_provider_weights(env, 'FOLLOWER')
+
+
+def test_bootstrap_has_no_capacity_provider_role():
+    with pytest.raises(ValueError):
+        get_capacity_provider_weights({}, 'BOOTSTRAP')
+
+
+@pytest.mark.parametrize('stop_timeout', ['0', '121'])
+def test_invalid_stop_timeout(stop_timeout):
+    with pytest.raises(ValueError):
+        get_stop_timeout_seconds(
+            {'CONTAINER_STOP_TIMEOUT_SECONDS': stop_timeout})
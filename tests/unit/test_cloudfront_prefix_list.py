@@ -0,0 +1,86 @@
+import aws_cdk as core
+import pytest
+from aws_cdk import assertions
+
+import ipfs_cluster.cloudfront_prefix_list as cloudfront_prefix_list
+from ipfs_cluster.cloudfront_prefix_list import (CLOUDFRONT_PREFIX_LIST_IDS,
+                                                 context_key,
+                                                 get_cloudfront_prefix_id)
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    calls = []
+
+    def lookup(region_name):
+        calls.append(region_name)
+        return 'pl-looked-up'
+
+    monkeypatch.setattr(cloudfront_prefix_list,
+                        'lookup_cloudfront_prefix_id', lookup)
+    return calls
+
+
+@pytest.fixture
+def failed_lookup(monkeypatch):
+    def lookup(region_name):
+        raise LookupError('Unable to locate credentials')
+
+    monkeypatch.setattr(cloudfront_prefix_list,
+                        'lookup_cloudfront_prefix_id', lookup)
+
+
+def stack(context=None):
+    return core.Stack(core.App(context=context), 'Prefix')
+
+
+def test_override(lookups):
+    scope = stack({context_key('us-east-1'): 'pl-cached'})
+    assert get_cloudfront_prefix_id(scope, 'us-east-1',
+                                    override='pl-override') == 'pl-override'
+    assert lookups == []
+
+
+def test_cached_in_context(lookups):
+    scope = stack({context_key('us-east-1'): 'pl-cached'})
+    assert get_cloudfront_prefix_id(scope, 'us-east-1') == 'pl-cached'
+    assert lookups == []
+    assertions.Annotations.from_stack(scope).has_no_warning(
+        '*', assertions.Match.any_value())
+
+
+def test_context_key_can_be_set_from_the_command_line():
+    # cdk -c splits the assignment on the first '='
+    assert '=' not in context_key('us-east-1')
+
+
+def test_lookup_warns_to_pin_the_context(lookups, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    scope = stack()
+    assert get_cloudfront_prefix_id(scope, 'eu-west-1') == 'pl-looked-up'
+    assert lookups == ['eu-west-1']
+    assertions.Annotations.from_stack(scope).has_warning(
+        '*', assertions.Match.string_like_regexp(
+            f'-c {context_key("eu-west-1")}=pl-looked-up'))
+    # The CDK CLI owns cdk.context.json
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_static_table_fallback_warns(failed_lookup):
+    scope = stack()
+    assert get_cloudfront_prefix_id(scope, 'us-west-2') == \
+        CLOUDFRONT_PREFIX_LIST_IDS['us-west-2']
+    assertions.Annotations.from_stack(scope).has_warning(
+        '*', assertions.Match.string_like_regexp(
+            'built-in table.*Unable to locate credentials'))
+
+
+def test_unknown_region_without_lookup_fails(failed_lookup):
+    with pytest.raises(ValueError, match='CLOUDFRONT_PREFIX_LIST_ID'):
+        get_cloudfront_prefix_id(stack(), 'xx-new-1')
+
+
+def test_environment_agnostic_stack_requires_override(lookups):
+    scope = stack()
+    with pytest.raises(ValueError, match='CLOUDFRONT_PREFIX_LIST_ID'):
+        get_cloudfront_prefix_id(scope, scope.region)
@@ -0,0 +1,64 @@
+import os
+import subprocess
+
+import pytest
+
+CONFIG_RESOURCES = os.path.join(os.path.dirname(__file__),
+                                '..', '..', 'docker', '002-config_resources.sh')
+
+
+@pytest.fixture
+def ipfs_config(tmp_path):
+    """Run the init script with an ipfs command recording its config calls."""
+    calls = tmp_path / 'calls'
+    ipfs = tmp_path / 'ipfs'
+    ipfs.write_text('#!/bin/sh\n'
+                    'shift\n'
+                    '[ "$1" = "--json" ] && shift\n'
+                    f'echo "$1=$2" >> {calls}\n')
+    ipfs.chmod(0o755)
+
+    def run(**env):
+        subprocess.run(
+            ['sh', '-c', f'ulimit -n 65536 2>/dev/null; sh {CONFIG_RESOURCES}'],
+            check=True, capture_output=True,
+            env=dict(os.environ, PATH=f'{tmp_path}:{os.environ["PATH"]}',
+                     **env))
+        return dict(line.split('=', 1)
+                    for line in calls.read_text().splitlines())
+
+    return run
+
+
+def test_small_task(ipfs_config):
+    config = ipfs_config(KUBO_TASK_CPU='768', KUBO_MEMORY_MIB='1536')
+    assert config['Swarm.ResourceMgr.MaxMemory'] == '1152MiB'
+    assert config['Swarm.ConnMgr.HighWater'] == '96'
+    assert config['Swarm.ConnMgr.LowWater'] == '32'
+    assert config['Datastore.BloomFilterSize'] == str(1536 * 1024)
+    assert config['Reprovider.Strategy'] == 'roots'
+    assert 'Datastore.StorageMax' not in config
+
+
+def test_large_task(ipfs_config):
+    config = ipfs_config(KUBO_TASK_CPU='3072', KUBO_MEMORY_MIB='6144')
+    assert config['Swarm.ResourceMgr.MaxMemory'] == '4608MiB'
+    assert config['Swarm.ConnMgr.HighWater'] == '288'
+    assert config['Reprovider.Strategy'] == 'pinned'
+    assert int(config['Swarm.ResourceMgr.MaxFileDescriptors']) <= 24576
+
+
+def test_overrides(ipfs_config):
+    config = ipfs_config(KUBO_CONNMGR_HIGH_WATER='900',
+                         KUBO_REPROVIDER_STRATEGY='all',
+                         KUBO_STORAGE_MAX='500GB')
+    assert config['Swarm.ConnMgr.HighWater'] == '900'
+    assert config['Swarm.ConnMgr.LowWater'] == '300'
+    assert config['Reprovider.Strategy'] == 'all'
+    assert config['Datastore.StorageMax'] == '500GB'
+
+
+def test_accelerated_dht_client(ipfs_config):
+    assert ipfs_config()['Routing.AcceleratedDHTClient'] == 'false'
+    config = ipfs_config(KUBO_ACCELERATED_DHT_CLIENT='true')
+    assert config['Routing.AcceleratedDHTClient'] == 'true'
@@ -0,0 +1,55 @@
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+CONFIG_S3 = os.path.join(os.path.dirname(__file__),
+                         '..', '..', 'docker', '001-config_s3.sh')
+
+pytestmark = pytest.mark.skipif(shutil.which('jq') is None,
+                                reason='jq is required')
+
+
+def run_config_s3(tmp_path, **env):
+    (tmp_path / 'config').write_text(json.dumps({
+        'Datastore': {'StorageMax': '10GB', 'BloomFilterSize': 0},
+        'Swarm': {'ConnMgr': {'Type': 'basic'}},
+    }))
+    subprocess.run(
+        ['sh', CONFIG_S3], check=True, capture_output=True,
+        env=dict(os.environ,
+                 IPFS_PATH=str(tmp_path),
+                 AWS_REGION='us-east-1',
+                 CLUSTER_S3_BUCKET='bucket',
+                 CLUSTER_PEERNAME='IpfsCluster0',
+                 CLUSTER_AWS_KEY='key',
+                 CLUSTER_AWS_SECRET='secret',
+                 **env))
+    return json.loads((tmp_path / 'config').read_text())
+
+
+def test_defaults(tmp_path):
+    config = run_config_s3(tmp_path)
+    # Sized by 002-config_resources.sh
+    assert config['Swarm']['ConnMgr'] == {'Type': 'basic'}
+    s3ds = config['Datastore']['Spec']['mounts'][0]['child']
+    assert s3ds['type'] == 's3ds'
+    assert s3ds['workers'] == 100
+    assert s3ds['keyTransform'] == 'default'
+    assert s3ds['rootDirectory'] == 'IpfsCluster0'
+    # datastore_spec must match the config for the repo to open
+    datastore_spec = json.loads((tmp_path / 'datastore_spec').read_text())
+    assert datastore_spec['mounts'][0]['bucket'] == 'bucket'
+
+
+def test_tuning(tmp_path):
+    config = run_config_s3(tmp_path,
+                           CLUSTER_S3_WORKERS='300',
+                           CLUSTER_S3_KEY_TRANSFORM='next-to-last/2',
+                           CLUSTER_S3_REGION_ENDPOINT='http://minio:9000')
+    s3ds = config['Datastore']['Spec']['mounts'][0]['child']
+    assert s3ds['workers'] == 300
+    assert s3ds['keyTransform'] == 'next-to-last/2'
+    assert s3ds['regionEndpoint'] == 'http://minio:9000'
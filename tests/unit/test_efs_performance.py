@@ -0,0 +1,33 @@
+import pytest
+
+from ipfs_cluster.efs_performance import EfsPerformance, get_efs_performance
+
+
+def test_defaults():
+    assert get_efs_performance({}, one_zone=True) == EfsPerformance()
+
+
+def test_settings_are_case_insensitive():
+    efs_performance = get_efs_performance({
+        'EFS_THROUGHPUT_MODE': 'Provisioned',
+        'EFS_PROVISIONED_THROUGHPUT_MIBPS': '256',
+        'EFS_PERFORMANCE_MODE': 'maxio',
+        'EFS_LIFECYCLE_POLICY': 'after_30_days',
+        'EFS_OUT_OF_IA_POLICY': 'AFTER_1_ACCESS',
+    }, one_zone=False)
+    assert efs_performance == EfsPerformance(
+        'provisioned', 256, 'maxIO', 'AFTER_30_DAYS', 'AFTER_1_ACCESS')
+
+
+@pytest.mark.parametrize('env, one_zone, match', [
+    ({'EFS_THROUGHPUT_MODE': 'turbo'}, True, 'Invalid EFS_THROUGHPUT_MODE'),
+    ({'EFS_THROUGHPUT_MODE': 'provisioned'}, True, 'at least 1'),
+    ({'EFS_PROVISIONED_THROUGHPUT_MIBPS': '100'}, True, 'requires the provisioned'),
+    ({'EFS_PERFORMANCE_MODE': 'maxIO'}, True, 'One Zone'),
+    ({'EFS_PERFORMANCE_MODE': 'maxIO', 'EFS_THROUGHPUT_MODE': 'elastic'},
+     False, 'elastic'),
+    ({'EFS_LIFECYCLE_POLICY': 'AFTER_1_YEAR'}, True, 'EFS_LIFECYCLE_POLICY'),
+])
+def test_invalid_settings(env, one_zone, match):
+    with pytest.raises(ValueError, match=match):
+        get_efs_performance(env, one_zone=one_zone)
@@ -0,0 +1,56 @@
+import pytest
+
+from ipfs_cluster.health_check import (TARGET_HEALTH_CHECKS,
+                                       TargetHealthCheck,
+                                       get_health_check_grace_period_seconds,
+                                       get_target_health_check)
+
+
+@pytest.mark.parametrize('role', ['GATEWAY', 'cluster', 'RPC'])
+def test_defaults(role):
+    assert get_target_health_check({}, role) == \
+        TARGET_HEALTH_CHECKS[role.upper()]
+
+
+def test_overrides():
+    health_check = get_target_health_check({
+        'GATEWAY_HEALTH_CHECK_PATH': '/ipfs/bafkqaaa',
+        'GATEWAY_HEALTH_CHECK_HTTP_CODES': '200',
+        'GATEWAY_HEALTH_CHECK_INTERVAL_SECONDS': '10',
+        'GATEWAY_HEALTH_CHECK_TIMEOUT_SECONDS': '3',
+        'GATEWAY_HEALTH_CHECK_HEALTHY_THRESHOLD': '',
+        'GATEWAY_HEALTH_CHECK_UNHEALTHY_THRESHOLD': '5',
+        'CLUSTER_HEALTH_CHECK_INTERVAL_SECONDS': '60',
+    }, 'GATEWAY')
+    assert health_check == TargetHealthCheck(
+        path='/ipfs/bafkqaaa', healthy_http_codes='200',
+        interval_seconds=10, timeout_seconds=3,
+        healthy_threshold=3, unhealthy_threshold=5)
+
+
+@pytest.mark.parametrize('env', [
+    {'CLUSTER_HEALTH_CHECK_PATH': 'health'},
+    {'CLUSTER_HEALTH_CHECK_INTERVAL_SECONDS': '4'},
+    {'CLUSTER_HEALTH_CHECK_TIMEOUT_SECONDS': '121'},
+    {'CLUSTER_HEALTH_CHECK_INTERVAL_SECONDS': '10',
+     'CLUSTER_HEALTH_CHECK_TIMEOUT_SECONDS': '10'},
+    {'CLUSTER_HEALTH_CHECK_HEALTHY_THRESHOLD': '1'},
+    {'CLUSTER_HEALTH_CHECK_UNHEALTHY_THRESHOLD': '11'},
+])
+def test_invalid_settings(env):
+    with pytest.raises(ValueError):
+        get_target_health_check(env, 'CLUSTER')
+
+
+def test_unknown_role():
+    with pytest.raises(ValueError):
+        get_target_health_check({}, 'KUBO')
+
+
+def test_grace_period():
+    assert get_health_check_grace_period_seconds({}) == 60
+    assert get_health_check_grace_period_seconds(
+        {'HEALTH_CHECK_GRACE_PERIOD_SECONDS': '0'}) == 0
+    with pytest.raises(ValueError):
+        get_health_check_grace_period_seconds(
+            {'HEALTH_CHECK_GRACE_PERIOD_SECONDS': '-1'})
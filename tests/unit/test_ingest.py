@@ -0,0 +1,236 @@
+import asyncio
+import base64
+import hashlib
+import json
+import re
+
+import pytest
+
+from ipfs_ingest import (ClusterApiError, ClusterClient, IngestItem, ingest,
+                         read_object_list, walk_directory)
+from ipfs_ingest.client import parse_add_output
+
+
+class FakeCluster:
+    """HTTP/1.1 keep-alive stand-in of the ipfs-cluster /add endpoint.
+
+    The CID of a file is the sha256 of its content. ``failures`` lists the
+    status codes returned before the requests succeed.
+    """
+
+    def __init__(self, failures=(), delay=0.0):
+        self.failures = list(failures)
+        self.delay = delay
+        self.requests = []
+        self.filenames = []
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.endpoint = f'http://127.0.0.1:{port}'
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode()
+                    if line == '\r\n':
+                        break
+                    key, _, value = line.partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers['content-length']))
+                self.requests.append((request_line.decode(), headers))
+                self.filenames.append(re.search(
+                    rb'filename="([^"]*)"', body).group(1).decode())
+
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                await asyncio.sleep(self.delay)
+                self.in_flight -= 1
+
+                if self.failures:
+                    status, response = self.failures.pop(0), b'unavailable'
+                else:
+                    boundary = headers['content-type'].split('boundary=')[1]
+                    content = body.split(b'\r\n\r\n', 1)[1].rsplit(
+                        f'\r\n--{boundary}--'.encode(), 1)[0]
+                    name = request_line.decode().split('name=')[1].split()[0]
+                    response = json.dumps({
+                        'name': name,
+                        'cid': hashlib.sha256(content).hexdigest(),
+                        'size': len(content),
+                    }).encode() + b'\n'
+                    status = 200
+                writer.write(f'HTTP/1.1 {status} X\r\nContent-Length: '
+                             f'{len(response)}\r\n\r\n'.encode() + response)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def run_ingest(items, failures=(), delay=0.0, credential=None, **kwargs):
+    async def run():
+        async with FakeCluster(failures, delay) as cluster:
+            results = []
+            report = await ingest(
+                items,
+                lambda: ClusterClient(cluster.endpoint, credential,
+                                      {'replication-min': '2'}),
+                backoff_seconds=0.01,
+                on_result=results.append,
+                **kwargs)
+            return cluster, report, results
+    return asyncio.run(run())
+
+
+def test_ingest_directory(tmp_path):
+    big = bytes(range(256)) * 4096
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'big.bin').write_bytes(big)
+    (tmp_path / 'a.txt').write_bytes(b'hello')
+    (tmp_path / 'empty').write_bytes(b'')
+
+    cluster, report, results = run_ingest(
+        walk_directory(str(tmp_path)), workers=2, chunk_size=64 * 1024)
+
+    assert report.files == 3
+    assert report.bytes == len(big) + 5
+    assert report.failed == 0
+    assert {r.item.name: r.cid for r in results} == {
+        'a.txt': hashlib.sha256(b'hello').hexdigest(),
+        'empty': hashlib.sha256(b'').hexdigest(),
+        'sub/big.bin': hashlib.sha256(big).hexdigest(),
+    }
+    assert all('replication-min=2' in r for r, _ in cluster.requests)
+    # Nested files are sent under their base name, the full name is in the
+    # name query parameter
+    assert sorted(cluster.filenames) == ['a.txt', 'big.bin', 'empty']
+    assert any('name=sub%2Fbig.bin' in r for r, _ in cluster.requests)
+    # One keep-alive connection per worker
+    assert cluster.connections <= 2
+
+
+def test_walk_directory_is_sorted(tmp_path):
+    for name in ['b', 'a', 'c/d']:
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_bytes(b'')
+
+    assert [i.name for i in walk_directory(str(tmp_path))] == ['a', 'b', 'c/d']
+    assert list(walk_directory(str(tmp_path / 'a'))) == [
+        IngestItem('a', str(tmp_path / 'a'))]
+
+
+def test_walk_missing_directory_fails(tmp_path):
+    with pytest.raises(ValueError):
+        list(walk_directory(str(tmp_path / 'missing')))
+
+
+def test_read_object_list():
+    lines = ['# objects\n', 's3://bucket/data/file.bin\n', '\n',
+             '/var/data/local.txt\n']
+
+    assert list(read_object_list(lines)) == [
+        IngestItem('data/file.bin', 's3://bucket/data/file.bin'),
+        IngestItem('local.txt', '/var/data/local.txt'),
+    ]
+
+
+def test_ingest_retries_unavailable(tmp_path):
+    (tmp_path / 'a').write_bytes(b'a')
+
+    cluster, report, results = run_ingest(
+        walk_directory(str(tmp_path)), failures=[503, 429], retries=2)
+
+    assert report.files == 1
+    assert report.retries == 2
+    assert results[0].attempts == 3
+
+
+def test_ingest_does_not_retry_client_errors(tmp_path):
+    (tmp_path / 'a').write_bytes(b'a')
+
+    cluster, report, results = run_ingest(
+        walk_directory(str(tmp_path)), failures=[400])
+
+    assert report.failed == 1
+    assert report.retries == 0
+    assert results[0].error.startswith('ClusterApiError: 400')
+    assert len(cluster.requests) == 1
+
+
+def test_ingest_gives_up_after_retries(tmp_path):
+    (tmp_path / 'a').write_bytes(b'a')
+
+    cluster, report, results = run_ingest(
+        walk_directory(str(tmp_path)), failures=[503] * 3, retries=1)
+
+    assert report.failed == 1
+    assert results[0].attempts == 2
+
+
+def test_ingest_missing_file_fails_item(tmp_path):
+    items = [IngestItem('missing', str(tmp_path / 'missing'))]
+
+    cluster, report, results = run_ingest(items)
+
+    assert report.failed == 1
+    assert report.retries == 0
+    assert results[0].attempts == 1
+    assert 'FileNotFoundError' in results[0].error
+    assert cluster.requests == []
+
+
+def test_ingest_concurrency_is_bounded(tmp_path):
+    for i in range(12):
+        (tmp_path / str(i)).write_bytes(b'x')
+
+    cluster, report, results = run_ingest(
+        walk_directory(str(tmp_path)), delay=0.02, workers=3)
+
+    assert report.files == 12
+    assert cluster.max_in_flight == 3
+
+
+def test_ingest_credential(tmp_path):
+    (tmp_path / 'a').write_bytes(b'a')
+
+    cluster, report, results = run_ingest(
+        walk_directory(str(tmp_path)), credential='admin:secret')
+
+    assert cluster.requests[0][1]['authorization'] == \
+        'Basic ' + base64.b64encode(b'admin:secret').decode()
+
+
+def test_ingest_invalid_workers():
+    with pytest.raises(ValueError):
+        asyncio.run(ingest([], lambda: None, workers=0))
+
+
+def test_client_invalid_endpoint():
+    with pytest.raises(ValueError):
+        ClusterClient('cluster.example.com:9094')
+
+
+def test_parse_add_output():
+    ndjson = b'{"name":"f","cid":"Qm1","size":3}\n'
+    listed = b'[{"name":"f","cid":{"/":"Qm1"},"size":3}]'
+
+    assert parse_add_output(ndjson, 'f')['cid'] == 'Qm1'
+    assert parse_add_output(listed, 'f')['cid'] == 'Qm1'
+    with pytest.raises(ClusterApiError):
+        parse_add_output(b'[]', 'f')
@@ -1,15 +1,1117 @@
+import glob
+import json
+import os
+
 import aws_cdk as core
 import aws_cdk.assertions as assertions
+import pytest
+from dotenv import dotenv_values
 
+from ipfs_cluster.cloudfront_prefix_list import context_key
 from ipfs_cluster.ipfs_cluster_fargate_stack import IpfsClusterFargateStack
+from ipfs_cluster.peer_layout import get_peer_layout
+
+IPFS_CLUSTER_ENV_FILE = 'ipfscluster.env'
+
+# 3 AZs are returned for the account/region below when no
+# availability-zones context is cached
+TEST_ENV = core.Environment(account='123456789012', region='us-east-1')
+AZ_COUNT = 3
+
+
+# Cached lookups, as found in cdk.context.json: no AWS call at synth time
+CONTEXT = {context_key('us-east-1'): 'pl-3b927c52'}
+
+
+def synth_stack(**env_overrides) -> IpfsClusterFargateStack:
+    ipfs_cluster_env = dotenv_values(dotenv_path=IPFS_CLUSTER_ENV_FILE)
+    ipfs_cluster_env.update(env_overrides)
+    app = core.App(context=CONTEXT)
+    return IpfsClusterFargateStack(app, "ipfs-cluster-fargate",
+                                   ipfs_cluster_env=ipfs_cluster_env,
+                                   env=TEST_ENV)
+
+
+def synth_template(**env_overrides) -> assertions.Template:
+    return assertions.Template.from_stack(synth_stack(**env_overrides))
+
+
+def test_ecs_services_created():
+    template = synth_template()
+    template.resource_count_is("AWS::ECS::Service", AZ_COUNT)
+
+
+def test_peer_layout_is_deterministic():
+    layout = get_peer_layout(3, 8)
+    assert layout == get_peer_layout(3, 8)
+    assert len(layout) == 24
+    assert sorted(p.index for p in layout) == list(range(24))
+    # The first node of each AZ keeps its historical index
+    assert [(p.index, p.az_index) for p in layout if p.node_index == 0] == \
+        [(0, 0), (1, 1), (2, 2)]
+    assert [p.index for p in layout if p.is_bootstrap] == [0]
+
+
+@pytest.mark.parametrize('node_per_az', [0, -1])
+def test_peer_layout_rejects_empty_az(node_per_az):
+    with pytest.raises(ValueError):
+        get_peer_layout(3, node_per_az)
+
+
+@pytest.mark.parametrize('node_per_az', [1, 4, 16])
+@pytest.mark.parametrize('one_zone_efs', ['True', 'False'])
+def test_node_per_az_scale_out(node_per_az, one_zone_efs):
+    template = synth_template(NODE_PER_AZ=str(node_per_az),
+                              ONE_ZONE_EFS=one_zone_efs)
+    peer_count = AZ_COUNT * node_per_az
+
+    template.resource_count_is("AWS::ECS::Service", peer_count)
+    template.resource_count_is("AWS::ECS::TaskDefinition", peer_count)
+    template.resource_count_is("AWS::EFS::AccessPoint", 2 * peer_count)
+    template.resource_count_is("AWS::ServiceDiscovery::Service", peer_count)
+    template.resource_count_is(
+        "AWS::EFS::FileSystem",
+        AZ_COUNT if one_zone_efs == 'True' else 1
+    )
+
+    # Every peer owns its own Kubo and ipfs-cluster repository
+    access_points = template.find_resources("AWS::EFS::AccessPoint")
+    paths = [ap['Properties']['RootDirectory']['Path']
+             for ap in access_points.values()]
+    assert len(set(paths)) == len(paths)
+
+    # Every peer has a unique name in the cluster
+    task_definitions = template.find_resources("AWS::ECS::TaskDefinition")
+    peer_names = []
+    for task_definition in task_definitions.values():
+        for container in task_definition['Properties']['ContainerDefinitions']:
+            for env in container.get('Environment', []):
+                if env['Name'] == 'CLUSTER_PEERNAME':
+                    peer_names.append(env['Value'])
+    assert sorted(peer_names) == \
+        sorted('IpfsCluster'+str(i) for i in range(peer_count))
+
+
+def test_task_size_profiles():
+    template = synth_template(TASK_SIZE='medium', BOOTSTRAP_TASK_SIZE='large',
+                              TASK_EPHEMERAL_STORAGE_GIB='50')
+    task_definitions = template.find_resources("AWS::ECS::TaskDefinition")
+    sizes = sorted((td['Properties']['Cpu'], td['Properties']['Memory'])
+                   for td in task_definitions.values())
+    assert sizes == [('2048', '4096'), ('2048', '4096'), ('4096', '8192')]
+    assert all(td['Properties']['EphemeralStorage'] == {'SizeInGiB': 50}
+               for td in task_definitions.values())
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "Cpu": "2048",
+        "ContainerDefinitions": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "Name": "IpfsKuboNode1",
+                "Cpu": 1536,
+                "MemoryReservation": 2560,
+            })
+        ])
+    })
+
+
+def test_invalid_task_size_fails_synth():
+    with pytest.raises(ValueError):
+        synth_template(TASK_SIZE='custom', TASK_CPU='1024',
+                       TASK_MEMORY_MIB='1024', KUBO_CPU='512',
+                       KUBO_MEMORY_RESERVATION_MIB='512', CLUSTER_CPU='512',
+                       CLUSTER_MEMORY_RESERVATION_MIB='512')
+
+
+def test_pinning_follows_task_size():
+    template = synth_template(TASK_SIZE='large', REPLICATION_FACTOR_MIN='2',
+                              REPLICATION_FACTOR_MAX='3')
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "ContainerDefinitions": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "Name": "IpfsCluster1",
+                "Environment": assertions.Match.array_with([
+                    {"Name": "CLUSTER_REPLICATIONFACTORMIN", "Value": "2"},
+                    {"Name": "CLUSTER_REPLICATIONFACTORMAX", "Value": "3"},
+                    {"Name": "CLUSTER_STATELESS_CONCURRENTPINS",
+                     "Value": "40"},
+                    # No CRDT batching without PINNING_PROFILE
+                    {"Name": "CLUSTER_CRDT_BATCHING_MAXBATCHSIZE",
+                     "Value": "0"},
+                    {"Name": "CLUSTER_CRDT_BATCHING_MAXBATCHAGE",
+                     "Value": "0s"},
+                ])
+            })
+        ])
+    })
+
+
+def test_pinning_profile_batches_crdt():
+    template = synth_template(PINNING_PROFILE='large')
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "ContainerDefinitions": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "Name": "IpfsCluster1",
+                "Environment": assertions.Match.array_with([
+                    {"Name": "CLUSTER_CRDT_BATCHING_MAXBATCHSIZE",
+                     "Value": "500"},
+                    {"Name": "CLUSTER_CRDT_BATCHING_MAXBATCHAGE",
+                     "Value": "5s"},
+                ])
+            })
+        ])
+    })
+
+
+def test_replication_over_peer_count_fails_synth():
+    with pytest.raises(ValueError):
+        synth_template(REPLICATION_FACTOR_MIN=str(AZ_COUNT + 1),
+                       REPLICATION_FACTOR_MAX=str(AZ_COUNT + 1))
+
+
+def test_health_checks():
+    template = synth_template(GATEWAY_HEALTH_CHECK_INTERVAL_SECONDS='10',
+                              GATEWAY_HEALTH_CHECK_HEALTHY_THRESHOLD='4',
+                              HEALTH_CHECK_GRACE_PERIOD_SECONDS='90')
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::TargetGroup", {
+            "Port": 8080,
+            "HealthCheckPath":
+                "/ipfs/QmUNLLsPACCz1vLxQVkXqqLX5R1X345qqfHbsf67hvA3Nn",
+            "HealthCheckIntervalSeconds": 10,
+            "HealthCheckTimeoutSeconds": 5,
+            "HealthyThresholdCount": 4,
+            "UnhealthyThresholdCount": 3,
+        })
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::TargetGroup", {
+            "Port": 9094,
+            "HealthCheckPath": "/health",
+            "Matcher": {"HttpCode": "204"},
+        })
+    services = template.find_resources("AWS::ECS::Service")
+    assert all(service['Properties']['HealthCheckGracePeriodSeconds'] == 90
+               for service in services.values())
+
+    # Liveness checks: no datastore read, no credential in the command
+    task_definitions = template.find_resources("AWS::ECS::TaskDefinition")
+    for task_definition in task_definitions.values():
+        for container in task_definition['Properties']['ContainerDefinitions']:
+            command = json.dumps(container.get('HealthCheck', {}))
+            assert 'dag stat' not in command
+            assert 'basic-auth' not in command
+            assert 'Ref' not in command
+
+
+def test_gateway_tier_disabled_by_default():
+    template = synth_template()
+    template.resource_count_is(
+        "AWS::ApplicationAutoScaling::ScalableTarget", 0)
+
+
+def test_gateway_tier():
+    template = synth_template(GATEWAY_TIER='True', GATEWAY_MIN_CAPACITY='2',
+                              GATEWAY_MAX_CAPACITY='10',
+                              GATEWAY_TARGET_RESPONSE_TIME_MS='250')
+    template.resource_count_is("AWS::ECS::Service", AZ_COUNT + 1)
+    template.has_resource_properties("AWS::ECS::Service", {
+        "DesiredCount": 2,
+        "DeploymentConfiguration": {
+            "MaximumPercent": 200,
+            "MinimumHealthyPercent": 100
+        },
+        "LoadBalancers": [
+            assertions.Match.object_like({
+                "ContainerName": "IpfsKuboGateway",
+                "ContainerPort": 8080
+            })
+        ]
+    })
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalableTarget", {
+            "MinCapacity": 2,
+            "MaxCapacity": 10
+        })
+    template.resource_count_is(
+        "AWS::ApplicationAutoScaling::ScalingPolicy", 3)
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalingPolicy", {
+            "TargetTrackingScalingPolicyConfiguration": {
+                "PredefinedMetricSpecification": {
+                    "PredefinedMetricType": "ALBRequestCountPerTarget"
+                }
+            }
+        })
+    template.has_resource_properties(
+        "AWS::ApplicationAutoScaling::ScalingPolicy", {
+            "TargetTrackingScalingPolicyConfiguration": {
+                "CustomizedMetricSpecification": assertions.Match.object_like({
+                    "MetricName": "TargetResponseTime"
+                }),
+                "TargetValue": 0.25
+            }
+        })
 
-# example tests. To run these tests, uncomment this file along with the example
-# resource in ipfs_cluster_fargate/ipfs_cluster_fargate_stack.py
-def test_sqs_queue_created():
-    app = core.App()
-    stack = IpfsClusterFargateStack(app, "ipfs-cluster-fargate")
+
+def test_gateway_peers_with_the_cluster_nodes():
+    template = synth_template(GATEWAY_TIER='True', NODE_PER_AZ='2')
+    environment = container_environment(
+        container_definition(template, 'IpfsKuboGateway'))
+    assert environment['IPFS_PROFILE'] == 'server'
+    addr_filters = json.loads(environment['KUBO_SWARM_ADDR_FILTERS'])
+    assert '/ip4/10.0.0.0/ipcidr/8' not in addr_filters
+    assert '/ip4/192.168.0.0/ipcidr/16' in addr_filters
+    peering_hosts = json.dumps(environment['KUBO_PEERING_HOSTS'])
+    for i in range(2 * AZ_COUNT):
+        assert 'IpfsSrv{}Cloudmap'.format(i) in peering_hosts
+
+
+def test_gateway_prefetch():
+    template = synth_template(
+        KUBO_IMAGE='public.ecr.aws/example/ipfs-efs',
+        GATEWAY_TIER='True', KUBO_PREFETCH='gateway',
+        KUBO_PREFETCH_S3_OBJECT='s3://hot-bucket/hot-cids.env',
+        GATEWAY_SLOW_START_SECONDS='120')
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "ContainerDefinitions": [
+            assertions.Match.object_like({
+                "Name": "IpfsKuboGateway",
+                "Environment": assertions.Match.array_with([
+                    {"Name": "KUBO_PREFETCH", "Value": "true"},
+                ]),
+                "EnvironmentFiles": [{
+                    "Type": "s3",
+                    "Value": {"Fn::Join": ["", [
+                        "arn:", {"Ref": "AWS::Partition"},
+                        ":s3:::hot-bucket/hot-cids.env"]]}
+                }],
+                "HealthCheck": assertions.Match.object_like({
+                    "Command": ["CMD-SHELL", assertions.Match.string_like_regexp(
+                        "^test ! -e /tmp/kubo-prefetch && wget")],
+                    "StartPeriod": 240
+                })
+            })
+        ]
+    })
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::TargetGroup", {
+            "Port": 8080,
+            "TargetGroupAttributes": assertions.Match.array_with([
+                {"Key": "slow_start.duration_seconds", "Value": "120"}
+            ])
+        })
+
+    # The peers are not warmed up
+    task_definitions = template.find_resources("AWS::ECS::TaskDefinition")
+    peer_containers = [
+        container
+        for td in task_definitions.values()
+        for container in td['Properties']['ContainerDefinitions']
+        if container['Name'] == 'IpfsKuboNode0']
+    assert 'EnvironmentFiles' not in peer_containers[0]
+    assert 'StartPeriod' not in peer_containers[0]['HealthCheck']
+
+
+def test_prefetch_all_tasks():
+    template = synth_template(KUBO_IMAGE='public.ecr.aws/example/ipfs-efs',
+                              KUBO_PREFETCH='all',
+                              KUBO_PREFETCH_LIST='/ipns/hot.example.com',
+                              KUBO_PREFETCH_TIMEOUT_SECONDS='60')
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "ContainerDefinitions": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "Name": "IpfsKuboNode2",
+                "Environment": assertions.Match.array_with([
+                    {"Name": "KUBO_PREFETCH_LIST",
+                     "Value": "/ipns/hot.example.com"},
+                ]),
+                "HealthCheck": assertions.Match.object_like({
+                    "StartPeriod": 120
+                })
+            })
+        ])
+    })
+
+
+def test_prefetch_with_stock_image_warns():
+    stack = synth_stack(KUBO_PREFETCH='all',
+                        KUBO_PREFETCH_LIST='/ipns/hot.example.com')
+    assertions.Annotations.from_stack(stack).has_warning(
+        '*', assertions.Match.string_like_regexp(
+            'KUBO_PREFETCH=all needs a KUBO_IMAGE built from '
+            'docker/Dockerfile_efs'))
+    # No warm-up health check the stock image would pass right away
+    container = container_definition(
+        assertions.Template.from_stack(stack), 'IpfsKuboNode0')
+    assert 'StartPeriod' not in container['HealthCheck']
+    assert 'KUBO_PREFETCH' not in container_environment(container)
+
+
+def test_prefetch_gateway_without_gateway_tier_fails_synth():
+    with pytest.raises(ValueError):
+        synth_template(KUBO_PREFETCH='gateway',
+                       KUBO_PREFETCH_LIST='/ipfs/bafyA')
+
+
+def _swarm_port_mappings(template, container_name):
+    return [
+        mapping
+        for td in template.find_resources("AWS::ECS::TaskDefinition").values()
+        for container in td['Properties']['ContainerDefinitions']
+        if container['Name'] == container_name
+        for mapping in container['PortMappings']
+        if mapping['ContainerPort'] == 4001]
+
+
+def test_swarm_tcp_only_by_default():
+    template = synth_template()
+    assert _swarm_port_mappings(template, 'IpfsKuboNode0') == [
+        {"ContainerPort": 4001, "Protocol": "tcp"}]
+    template.has_resource_properties("AWS::EC2::SecurityGroup", {
+        "SecurityGroupIngress": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "IpProtocol": "tcp", "FromPort": 4001, "ToPort": 4001,
+                "CidrIp": "0.0.0.0/0",
+            })
+        ])
+    })
+    assert '"IpProtocol": "udp"' not in json.dumps(template.to_json())
+
+
+def test_swarm_quic_and_webtransport():
+    template = synth_template(GATEWAY_TIER='True',
+                              KUBO_SWARM_TRANSPORTS='tcp,quic,webtransport')
+    for container_name in ('IpfsKuboNode0', 'IpfsKuboGateway'):
+        assert _swarm_port_mappings(template, container_name) == [
+            {"ContainerPort": 4001, "Protocol": "tcp"},
+            {"ContainerPort": 4001, "Protocol": "udp"},
+        ]
+    template.has_resource_properties("AWS::EC2::SecurityGroup", {
+        "SecurityGroupIngress": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "IpProtocol": "udp", "FromPort": 4001, "ToPort": 4001,
+                "CidrIp": "0.0.0.0/0",
+            })
+        ])
+    })
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "ContainerDefinitions": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "Name": "IpfsKuboNode1",
+                "Environment": assertions.Match.array_with([
+                    {"Name": "KUBO_SWARM_TRANSPORTS",
+                     "Value": "tcp,quic,webtransport"},
+                    {"Name": "KUBO_SWARM_ANNOUNCE_PUBLIC_IP", "Value": "true"},
+                ])
+            })
+        ])
+    })
+
+
+def test_swarm_transports_with_stock_image_warns():
+    stack = synth_stack(KUBO_SWARM_TRANSPORTS='tcp,quic')
+    assertions.Annotations.from_stack(stack).has_warning(
+        '*', assertions.Match.string_like_regexp(
+            'KUBO_SWARM_TRANSPORTS=tcp,quic needs a KUBO_IMAGE built from'))
+    assertions.Annotations.from_stack(synth_stack()).has_no_warning(
+        '*', assertions.Match.string_like_regexp('KUBO_SWARM_TRANSPORTS'))
+
+
+def test_gateway_cache_behaviors():
+    template = synth_template(CLOUDFRONT_ORIGIN_SHIELD_REGION='us-east-1')
+    template.resource_count_is("AWS::CloudFront::CachePolicy", 2)
+    template.has_resource_properties("AWS::CloudFront::CachePolicy", {
+        "CachePolicyConfig": assertions.Match.object_like({
+            "DefaultTTL": 365 * 24 * 3600,
+            "ParametersInCacheKeyAndForwardedToOrigin": {
+                "CookiesConfig": {"CookieBehavior": "none"},
+                "EnableAcceptEncodingBrotli": True,
+                "EnableAcceptEncodingGzip": True,
+                "HeadersConfig": {"HeaderBehavior": "none"},
+                "QueryStringsConfig": {"QueryStringBehavior": "none"}
+            }
+        })
+    })
+    template.has_resource_properties("AWS::CloudFront::CachePolicy", {
+        "CachePolicyConfig": assertions.Match.object_like({
+            "DefaultTTL": 60,
+            "MaxTTL": 60
+        })
+    })
+    template.has_resource_properties("AWS::CloudFront::Distribution", {
+        "DistributionConfig": assertions.Match.object_like({
+            "CacheBehaviors": [
+                assertions.Match.object_like({
+                    "PathPattern": "/ipfs/*", "Compress": True}),
+                assertions.Match.object_like({
+                    "PathPattern": "/ipns/*", "Compress": True}),
+            ],
+            "Origins": [
+                assertions.Match.object_like({
+                    "OriginShield": {
+                        "Enabled": True,
+                        "OriginShieldRegion": "us-east-1"
+                    }
+                })
+            ]
+        })
+    })
+
+
+def test_gateway_ipfs_ttl():
+    template = synth_template(CLOUDFRONT_IPFS_TTL_DAYS='1')
+    template.has_resource_properties("AWS::CloudFront::CachePolicy", {
+        "CachePolicyConfig": assertions.Match.object_like({
+            "MinTTL": 24 * 3600,
+            "DefaultTTL": 24 * 3600,
+            "MaxTTL": 24 * 3600
+        })
+    })
+
+
+@pytest.mark.parametrize('ttl_days', ['0', '-1'])
+def test_gateway_ipfs_ttl_below_min_fails_synth(ttl_days):
+    with pytest.raises(ValueError):
+        synth_template(CLOUDFRONT_IPFS_TTL_DAYS=ttl_days)
+
+
+def test_kubo_block_cache():
+    template = synth_template(KUBO_IMAGE='public.ecr.aws/example/ipfs-efs',
+                              KUBO_BLOCK_CACHE='True',
+                              KUBO_BLOCK_CACHE_SIZE_GIB='100')
+    task_definitions = template.find_resources("AWS::ECS::TaskDefinition")
+    assert all(td['Properties']['EphemeralStorage'] == {'SizeInGiB': 120}
+               for td in task_definitions.values())
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "ContainerDefinitions": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "Name": "IpfsKuboNode0",
+                "Image": "public.ecr.aws/example/ipfs-efs",
+                "Environment": assertions.Match.array_with([
+                    {"Name": "KUBO_BLOCK_CACHE", "Value": "true"},
+                    {"Name": "KUBO_BLOCK_CACHE_SIZE_GIB", "Value": "100"},
+                ])
+            })
+        ])
+    })
+
+
+def test_kubo_block_cache_too_large():
+    with pytest.raises(ValueError, match='ephemeral storage'):
+        synth_template(KUBO_IMAGE='public.ecr.aws/example/ipfs-efs',
+                       KUBO_BLOCK_CACHE='True',
+                       KUBO_BLOCK_CACHE_SIZE_GIB='190')
+
+
+def test_kubo_block_cache_with_stock_image_warns():
+    stack = synth_stack(KUBO_BLOCK_CACHE='True',
+                        KUBO_BLOCK_CACHE_SIZE_GIB='100')
+    assertions.Annotations.from_stack(stack).has_warning(
+        '*', assertions.Match.string_like_regexp(
+            'KUBO_BLOCK_CACHE needs a KUBO_IMAGE built from '
+            'docker/Dockerfile_efs'))
     template = assertions.Template.from_stack(stack)
+    assert all('EphemeralStorage' not in td['Properties']
+               for td in template.find_resources(
+                   "AWS::ECS::TaskDefinition").values())
+    assert 'KUBO_BLOCK_CACHE' not in container_environment(
+        container_definition(template, 'IpfsKuboNode0'))
+
+
+def test_efs_bursting_alarms():
+    template = synth_template()
+    template.resource_count_is("AWS::CloudWatch::Alarm", 2 * AZ_COUNT)
+    template.has_resource_properties("AWS::CloudWatch::Alarm", {
+        "MetricName": "BurstCreditBalance",
+        "Threshold": 100 * 1024 ** 3,
+    })
+    template.has_resource_properties("AWS::CloudWatch::Alarm", {
+        "MetricName": "PercentIOLimit",
+        "Threshold": 90,
+    })
+
+
+@pytest.mark.parametrize('throughput_mode, expected', [
+    ('elastic', {"ThroughputMode": "elastic"}),
+    ('provisioned', {"ThroughputMode": "provisioned",
+                     "ProvisionedThroughputInMibps": 128}),
+])
+def test_efs_throughput_mode(throughput_mode, expected):
+    template = synth_template(
+        ONE_ZONE_EFS='False',
+        EFS_THROUGHPUT_MODE=throughput_mode,
+        EFS_PROVISIONED_THROUGHPUT_MIBPS='128'
+        if throughput_mode == 'provisioned' else '',
+        EFS_LIFECYCLE_POLICY='AFTER_30_DAYS')
+    template.has_resource_properties("AWS::EFS::FileSystem", dict(
+        expected,
+        LifecyclePolicies=[{"TransitionToIA": "AFTER_30_DAYS"}]
+    ))
+    # No burst credits outside of the bursting mode
+    template.resource_count_is("AWS::CloudWatch::Alarm", 1)
+
+
+def test_kubo_resources_environment():
+    template = synth_template(TASK_SIZE='large', GATEWAY_TIER='True',
+                              GATEWAY_TASK_SIZE='medium')
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "ContainerDefinitions": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "Name": "IpfsKuboNode0",
+                "Environment": assertions.Match.array_with([
+                    {"Name": "KUBO_TASK_CPU", "Value": "3072"},
+                    {"Name": "KUBO_MEMORY_MIB", "Value": "6144"},
+                ]),
+                "Ulimits": [{"Name": "nofile", "SoftLimit": 65536,
+                             "HardLimit": 65536}]
+            })
+        ])
+    })
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "ContainerDefinitions": [
+            assertions.Match.object_like({
+                "Name": "IpfsKuboGateway",
+                "Environment": assertions.Match.array_with([
+                    {"Name": "KUBO_TASK_CPU", "Value": "2048"},
+                    {"Name": "KUBO_MEMORY_MIB", "Value": "4096"},
+                ])
+            })
+        ]
+    })
+
+
+@pytest.mark.parametrize('kubo_image, warns', [
+    ('ipfs/kubo:master-latest', True),
+    ('public.ecr.aws/example/ipfs-efs', False),
+])
+def test_kubo_resources_with_stock_image_warns(kubo_image, warns):
+    annotations = assertions.Annotations.from_stack(
+        synth_stack(KUBO_IMAGE=kubo_image))
+    message = assertions.Match.string_like_regexp(
+        'Sizing the Kubo resource and connection managers')
+    if warns:
+        annotations.has_warning('*', message)
+    else:
+        annotations.has_no_warning('*', message)
+
+
+def _references(value):
+    if isinstance(value, dict):
+        for key, child in value.items():
+            if key == 'Ref':
+                yield child
+            elif key == 'Fn::GetAtt':
+                yield child[0]
+            else:
+                yield from _references(child)
+    elif isinstance(value, list):
+        for child in value:
+            yield from _references(child)
+
+
+def service_depth(template: assertions.Template) -> int:
+    """Longest chain of ECS services CloudFormation creates one after the
+    other. Each service waits for its tasks to be stable, so the chain
+    length is what bounds the cluster deployment time."""
+    resources = template.to_json()['Resources']
+    depths = {}
+
+    def depth(logical_id):
+        if logical_id not in depths:
+            resource = resources[logical_id]
+            depends_on = resource.get('DependsOn', [])
+            if isinstance(depends_on, str):
+                depends_on = [depends_on]
+            parents = set(depends_on) | set(_references(resource))
+            depths[logical_id] = max(
+                [depth(p) for p in parents if p in resources], default=0
+            ) + (resource['Type'] == 'AWS::ECS::Service')
+        return depths[logical_id]
+
+    return max(depth(logical_id) for logical_id in resources)
+
+
+def container_definition(template: assertions.Template, name: str) -> dict:
+    for task_definition in template.find_resources(
+            "AWS::ECS::TaskDefinition").values():
+        for container in task_definition['Properties']['ContainerDefinitions']:
+            if container['Name'] == name:
+                return container
+    raise KeyError(name)
+
+
+def container_environment(container: dict) -> dict:
+    return {e['Name']: e['Value'] for e in container.get('Environment', [])}
+
+
+def test_parallel_bootstrap():
+    serial = synth_template(NODE_PER_AZ='4')
+    parallel = synth_template(NODE_PER_AZ='4', CLUSTER_BOOTSTRAP_MODE='parallel')
+    assert service_depth(serial) == 2
+    assert service_depth(parallel) == 1
+
+    # The first peer of each AZ is a seed peer with a well-known identity
+    assert 'ClusterId1' not in serial.to_json()['Parameters']
+    parameters = parallel.to_json()['Parameters']
+    for i in range(1, AZ_COUNT):
+        assert parameters['ClusterId'+str(i)]['NoEcho'] is True
+        assert parameters['ClusterPrivateKey'+str(i)]['NoEcho'] is True
+        seed = container_definition(parallel, 'IpfsCluster'+str(i))
+        assert container_environment(seed)['CLUSTER_ID'] == \
+            {'Ref': 'ClusterId'+str(i)}
+        assert 'CLUSTER_PRIVATEKEY' in [s['Name'] for s in seed['Secrets']]
+    assert 'ClusterId'+str(AZ_COUNT) not in parameters
+    assert 'CLUSTER_ID' not in container_environment(
+        container_definition(parallel, 'IpfsCluster'+str(AZ_COUNT)))
+
+    # Every peer joins through the seed peers, without a shell wrapper
+    for i in (0, 1, AZ_COUNT):
+        container = container_definition(parallel, 'IpfsCluster'+str(i))
+        assert 'EntryPoint' not in container
+        assert container['Command'] == ['daemon']
+        peer_addresses = json.dumps(
+            container_environment(container)['CLUSTER_PEERADDRESSES'])
+        seeds = [j for j in range(AZ_COUNT) if j != i]
+        assert peer_addresses.count('/dns4/') == len(seeds)
+        for j in seeds:
+            assert 'IpfsSrv{}Cloudmap'.format(j) in peer_addresses
+            assert '"ClusterId{}"'.format(j or '') in peer_addresses
+
+
+def test_invalid_bootstrap_mode_fails_synth():
+    with pytest.raises(ValueError, match='CLUSTER_BOOTSTRAP_MODE'):
+        synth_template(CLUSTER_BOOTSTRAP_MODE='eager')
+
+
+def test_cloud_map_records():
+    template = synth_template()
+    template.has_resource_properties("AWS::ServiceDiscovery::Service", {
+        "DnsConfig": assertions.Match.object_like({
+            "DnsRecords": [{"Type": "A", "TTL": 10}]
+        }),
+        "HealthCheckCustomConfig": {"FailureThreshold": 1}
+    })
+
+
+def test_cloud_map_srv_records():
+    template = synth_template(CLOUD_MAP_SRV_RECORDS='True',
+                              CLOUD_MAP_DNS_TTL_SECONDS='5',
+                              CLOUD_MAP_FAILURE_THRESHOLD='3')
+    services = template.find_resources("AWS::ServiceDiscovery::Service")
+    assert len(services) == AZ_COUNT
+    for service in services.values():
+        assert service['Properties']['DnsConfig']['DnsRecords'] == [
+            {"Type": "A", "TTL": 5}, {"Type": "SRV", "TTL": 5}]
+        assert service['Properties']['HealthCheckCustomConfig'] == {
+            "FailureThreshold": 3}
+    template.has_resource_properties("AWS::ECS::Service", {
+        "ServiceRegistries": [
+            assertions.Match.object_like({
+                "ContainerName": "IpfsCluster0",
+                "ContainerPort": 9096
+            })
+        ]
+    })
+
+
+def test_arm64_tasks():
+    template = synth_template(TASK_CPU_ARCHITECTURE='arm64', GATEWAY_TIER='True')
+    task_definitions = template.find_resources("AWS::ECS::TaskDefinition")
+    assert len(task_definitions) == AZ_COUNT + 1
+    assert all(td['Properties']['RuntimePlatform'] == {
+        "CpuArchitecture": "ARM64",
+        "OperatingSystemFamily": "LINUX"
+    } for td in task_definitions.values())
+
+
+def test_invalid_cpu_architecture_fails_synth():
+    with pytest.raises(ValueError, match='TASK_CPU_ARCHITECTURE'):
+        synth_template(TASK_CPU_ARCHITECTURE='riscv64')
+
+
+def test_on_demand_by_default():
+    template = synth_template(GATEWAY_TIER='True')
+    services = template.find_resources("AWS::ECS::Service")
+    assert all(service['Properties']['LaunchType'] == 'FARGATE'
+               for service in services.values())
+    template.has_resource_properties("AWS::ElasticLoadBalancingV2::TargetGroup", {
+        "TargetGroupAttributes": assertions.Match.array_with([{
+            "Key": "deregistration_delay.timeout_seconds",
+            "Value": "60"
+        }])
+    })
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "ContainerDefinitions": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "Name": "IpfsCluster1",
+                "StopTimeout": 120
+            })
+        ])
+    })
+
+
+def test_fargate_spot():
+    template = synth_template(GATEWAY_TIER='True',
+                              FOLLOWER_FARGATE_SPOT_WEIGHT='1',
+                              GATEWAY_FARGATE_SPOT_WEIGHT='3')
+    services = template.find_resources("AWS::ECS::Service")
+    strategies = {
+        logical_id: service['Properties'].get('CapacityProviderStrategy')
+        for logical_id, service in services.items()
+    }
+    bootstrap = [logical_id for logical_id in strategies
+                 if logical_id.startswith('IpfsSrv0')]
+    assert len(bootstrap) == 1
+    assert strategies.pop(bootstrap[0]) is None
+    assert services[bootstrap[0]]['Properties']['LaunchType'] == 'FARGATE'
+    assert sorted(strategies.values(), key=lambda s: s[1]['Weight']) == [
+        [{"CapacityProvider": "FARGATE", "Base": 0, "Weight": 1},
+         {"CapacityProvider": "FARGATE_SPOT", "Weight": 1}],
+        [{"CapacityProvider": "FARGATE", "Base": 0, "Weight": 1},
+         {"CapacityProvider": "FARGATE_SPOT", "Weight": 1}],
+        [{"CapacityProvider": "FARGATE", "Base": 1, "Weight": 1},
+         {"CapacityProvider": "FARGATE_SPOT", "Weight": 3}],
+    ]
+
+
+def test_no_dashboard_by_default():
+    template = synth_template()
+    template.resource_count_is("AWS::CloudWatch::Dashboard", 0)
+    template.resource_count_is("AWS::CloudFront::MonitoringSubscription", 0)
+
+
+def test_dashboard():
+    template = synth_template(CLOUDWATCH_DASHBOARD='True')
+    template.resource_count_is("AWS::CloudWatch::Dashboard", 1)
+    template.resource_count_is("AWS::CloudFront::MonitoringSubscription", 2)
+    template.resource_count_is("AWS::ECS::Cluster", 1)
+    cluster = list(template.find_resources("AWS::ECS::Cluster").values())[0]
+    assert 'ClusterSettings' not in cluster.get('Properties', {})
+
+
+@pytest.mark.parametrize('kubo_image', [
+    'ipfs/kubo:master-latest', 'docker.io/ipfs/kubo:v0.18.1',
+    'ipfs/kubo@sha256:0123',
+])
+def test_no_restart_to_ready_metric_with_stock_image(kubo_image):
+    template = synth_template(KUBO_IMAGE=kubo_image)
+    template.resource_count_is("AWS::Logs::MetricFilter", 0)
+
+
+def test_restart_to_ready_metric():
+    template = synth_template(
+        KUBO_IMAGE='123456789012.dkr.ecr.us-east-1.amazonaws.com/kubo-efs:1',
+        KUBO_REPO_VERIFY='True')
+    template.has_resource_properties("AWS::Logs::MetricFilter", {
+        "FilterPattern": '{ $.event = "kubo_ready" }',
+        "MetricTransformations": [{
+            "MetricNamespace": "IPFS",
+            "MetricName": "KuboRestartToReadySeconds",
+            "MetricValue": "$.restart_to_ready_seconds"
+        }]
+    })
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "ContainerDefinitions": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "Name": "IpfsKuboNode0",
+                "Environment": assertions.Match.array_with([
+                    {"Name": "KUBO_REPO_VERIFY", "Value": "true"},
+                ])
+            })
+        ])
+    })
+
+
+def test_metrics_sidecar():
+    template = synth_template(METRICS_SIDECAR='True', CONTAINER_INSIGHTS='True',
+                              GATEWAY_TIER='True')
+    template.has_resource_properties("AWS::ECS::Cluster", {
+        "ClusterSettings": [{"Name": "containerInsights", "Value": "enabled"}]
+    })
+    task_definitions = template.find_resources("AWS::ECS::TaskDefinition")
+    assert len(task_definitions) == AZ_COUNT + 1
+    for task_definition in task_definitions.values():
+        sidecars = [c for c in task_definition['Properties']['ContainerDefinitions']
+                    if c['Name'] == 'AdotCollector']
+        assert len(sidecars) == 1
+        assert sidecars[0]['Essential'] is False
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "ContainerDefinitions": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "Name": "IpfsCluster0",
+                "Environment": assertions.Match.array_with([
+                    {"Name": "CLUSTER_METRICS_ENABLESTATS", "Value": "true"},
+                ])
+            })
+        ])
+    })
+
+
+def test_cloudfront_prefix_list_override():
+    template = synth_template(CLOUDFRONT_PREFIX_LIST_ID='pl-00000000')
+    template.has_resource_properties("AWS::EC2::SecurityGroupIngress", {
+        "SourcePrefixListId": "pl-00000000"
+    })
+
+
+def test_peer_logical_ids_are_stable():
+    # Logical IDs and families of the deployed stacks, before the peers
+    # moved to IpfsPeer: changing them replaces the services and the
+    # access points holding the repos
+    template = synth_template()
+    resources = template.to_json()['Resources']
+    for logical_id, resource_type in [
+        ('IpfsEfs0IpfsKuboAp0AEB26C6A', 'AWS::EFS::AccessPoint'),
+        ('IpfsEfs0IpfsClusterAp0EE818CF3', 'AWS::EFS::AccessPoint'),
+        ('IpfsFargateTask18DE2336D', 'AWS::ECS::TaskDefinition'),
+        ('IpfsSrv0Service330871F1', 'AWS::ECS::Service'),
+        ('IpfsSrv0CloudmapService7D5BEBA3', 'AWS::ServiceDiscovery::Service'),
+    ]:
+        assert resources[logical_id]['Type'] == resource_type
+    assert resources['IpfsFargateTask18DE2336D']['Properties']['Family'] == \
+        'ipfsclusterfargateIpfsFargateTask183E43594'
+
+
+def test_peers_split_into_nested_stacks():
+    ipfs_cluster_env = dotenv_values(dotenv_path=IPFS_CLUSTER_ENV_FILE)
+    ipfs_cluster_env.update(NODE_PER_AZ='30', METRICS_SIDECAR='True')
+    app = core.App(context=CONTEXT)
+    IpfsClusterFargateStack(app, "ipfs-cluster-fargate",
+                            ipfs_cluster_env=ipfs_cluster_env,
+                            env=TEST_ENV)
+    assembly = app.synth()
+    template_files = glob.glob(
+        os.path.join(assembly.directory, '*.template.json'))
+    assert len(template_files) > 1
+
+    services = 0
+    for template_file in template_files:
+        # CloudFormation resource and template size quotas
+        assert os.path.getsize(template_file) < 1024 * 1024
+        with open(template_file) as f:
+            resources = json.load(f)['Resources']
+        assert len(resources) < 500
+        services += sum(1 for r in resources.values()
+                        if r['Type'] == 'AWS::ECS::Service')
+    assert services == AZ_COUNT * 30
+
+
+def test_internal_api_alb():
+    template = synth_template(INTERNAL_API='True',
+                              INTERNAL_API_IDLE_TIMEOUT_SECONDS='900')
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::LoadBalancer", {
+            "Scheme": "internal",
+            "LoadBalancerAttributes": assertions.Match.array_with([
+                {"Key": "idle_timeout.timeout_seconds", "Value": "900"}
+            ])
+        })
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::TargetGroup", {
+            "Port": 5001,
+            "HealthCheckPath": "/api/v0/version",
+        })
+    # Every peer is registered to the internal REST API and RPC API
+    for service in template.find_resources("AWS::ECS::Service").values():
+        ports = [lb['ContainerPort']
+                 for lb in service['Properties']['LoadBalancers']]
+        assert sorted(ports) == [5001, 8080, 9094, 9094]
+    # ipfs-cluster keeps idle connections open longer than the ALB
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "ContainerDefinitions": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "Name": "IpfsCluster0",
+                "Environment": assertions.Match.array_with([
+                    {"Name": "CLUSTER_RESTAPI_IDLETIMEOUT", "Value": "960s"},
+                ])
+            })
+        ])
+    })
+    assert 'IpfsInternalApiEndpoint' in template.to_json()['Outputs']
+
+
+def test_internal_api_nlb():
+    template = synth_template(INTERNAL_API='True',
+                              INTERNAL_API_LOAD_BALANCER='nlb')
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::LoadBalancer", {
+            "Type": "network",
+            "Scheme": "internal",
+        })
+    template.resource_count_is("AWS::ElasticLoadBalancingV2::Listener", 4)
+    template.has_resource_properties("AWS::EC2::SecurityGroup", {
+        "SecurityGroupIngress": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "FromPort": 9094,
+                "CidrIp": {"Fn::GetAtt": [assertions.Match.any_value(),
+                                          "CidrBlock"]},
+            })
+        ])
+    })
+
+
+def test_no_internal_api_by_default():
+    template = synth_template()
+    template.resource_count_is("AWS::ElasticLoadBalancingV2::LoadBalancer", 1)
+
+
+@pytest.mark.parametrize('env', [
+    {'INTERNAL_API_LOAD_BALANCER': 'gwlb'},
+    {'INTERNAL_API_IDLE_TIMEOUT_SECONDS': '4001'},
+])
+def test_invalid_internal_api_fails_synth(env):
+    with pytest.raises(ValueError):
+        synth_template(INTERNAL_API='True', **env)
+
+
+def test_accelerated_routing():
+    stack = synth_stack(KUBO_IMAGE='public.ecr.aws/example/ipfs-efs',
+                        KUBO_ROUTING_PROFILE='accelerated',
+                        KUBO_REPROVIDER_STRATEGY='pinned', TASK_SIZE='large')
+    assertions.Template.from_stack(stack).has_resource_properties(
+        "AWS::ECS::TaskDefinition", {
+            "ContainerDefinitions": assertions.Match.array_with([
+                assertions.Match.object_like({
+                    "Name": "IpfsKuboNode0",
+                    "Environment": assertions.Match.array_with([
+                        {"Name": "KUBO_ACCELERATED_DHT_CLIENT",
+                         "Value": "true"},
+                        {"Name": "KUBO_REPROVIDER_STRATEGY", "Value": "pinned"},
+                    ])
+                })
+            ])
+        })
+    assertions.Annotations.from_stack(stack).has_no_warning(
+        '*', assertions.Match.string_like_regexp('KUBO_ROUTING_PROFILE'))
+
+
+def test_routing_with_stock_image_warns():
+    stack = synth_stack(KUBO_REPROVIDER_STRATEGY='pinned')
+    assertions.Annotations.from_stack(stack).has_warning(
+        '*', assertions.Match.string_like_regexp(
+            'KUBO_REPROVIDER_STRATEGY needs a KUBO_IMAGE built from'))
+    assertions.Annotations.from_stack(synth_stack()).has_no_warning(
+        '*', assertions.Match.string_like_regexp('KUBO_ROUTING_PROFILE'))
+
+
+def test_accelerated_routing_warns_on_small_tasks():
+    stack = synth_stack(KUBO_ROUTING_PROFILE='accelerated')
+    assertions.Annotations.from_stack(stack).has_warning(
+        '*', assertions.Match.string_like_regexp(
+            'KUBO_ROUTING_PROFILE=accelerated with 768 cpu units'))
+
+
+def test_az_aware_allocation():
+    template = synth_template(GATEWAY_CROSS_ZONE='False')
+    tags = sorted(
+        env['Value']
+        for td in template.find_resources("AWS::ECS::TaskDefinition").values()
+        for container in td['Properties']['ContainerDefinitions']
+        for env in container.get('Environment', [])
+        if env['Name'] == 'CLUSTER_TAGS_TAGS')
+    assert len(tags) == AZ_COUNT
+    assert len(set(tags)) == AZ_COUNT
+    assert all(tag.startswith('group:default,az:') for tag in tags)
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "ContainerDefinitions": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "Name": "IpfsCluster0",
+                "Environment": assertions.Match.array_with([
+                    {"Name": "CLUSTER_BALANCED_ALLOCATEBY",
+                     "Value": "tag:az,freespace"},
+                ])
+            })
+        ])
+    })
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::TargetGroup", {
+            "Port": 8080,
+            "TargetGroupAttributes": assertions.Match.array_with([
+                {"Key": "load_balancing.cross_zone.enabled", "Value": "false"}
+            ])
+        })
+
+
+def test_gateway_cross_zone_by_default():
+    template = synth_template()
+    assert 'load_balancing.cross_zone.enabled' not in json.dumps(
+        template.to_json())
+
+
+def test_private_subnets():
+    template = synth_template(TASK_SUBNETS='private', NAT_GATEWAYS='1',
+                              KUBO_SWARM_TRANSPORTS='tcp,quic',
+                              GATEWAY_TIER='True')
+    template.resource_count_is("AWS::EC2::NatGateway", 1)
+    services = template.find_resources("AWS::ECS::Service")
+    assert len(services) == AZ_COUNT + 1
+    for service in services.values():
+        network = service['Properties']['NetworkConfiguration'][
+            'AwsvpcConfiguration']
+        assert network['AssignPublicIp'] == 'DISABLED'
+        assert all('private' in json.dumps(subnet).lower()
+                   for subnet in network['Subnets'])
+
+    # The swarm port of each peer is published on its own NLB listener
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::LoadBalancer", {
+            "Type": "network",
+            "Scheme": "internet-facing",
+        })
+    listeners = template.find_resources(
+        "AWS::ElasticLoadBalancingV2::Listener", {
+            "Properties": {"Protocol": "TCP_UDP"}})
+    assert sorted(listener['Properties']['Port']
+                  for listener in listeners.values()) == \
+        [4001 + i for i in range(AZ_COUNT)]
+    template.has_resource_properties(
+        "AWS::ElasticLoadBalancingV2::TargetGroup", {
+            "Port": 4001,
+            "Protocol": "TCP_UDP",
+            "TargetType": "ip",
+            "HealthCheckProtocol": "TCP",
+        })
+    template.has_resource_properties("AWS::ECS::TaskDefinition", {
+        "ContainerDefinitions": assertions.Match.array_with([
+            assertions.Match.object_like({
+                "Name": "IpfsKuboNode2",
+                "Environment": assertions.Match.array_with([
+                    {"Name": "KUBO_SWARM_ANNOUNCE_PUBLIC_IP", "Value": "false"},
+                    {"Name": "KUBO_SWARM_ANNOUNCE_HOST",
+                     "Value": assertions.Match.any_value()},
+                    {"Name": "KUBO_SWARM_ANNOUNCE_PORT", "Value": "4003"},
+                ])
+            })
+        ])
+    })
+    assert 'IpfsSwarmEndpoint' in template.to_json()['Outputs']
+
+
+def test_public_subnets_by_default():
+    template = synth_template()
+    template.resource_count_is("AWS::EC2::NatGateway", 0)
+    template.resource_count_is("AWS::EC2::VPCEndpoint", 0)
+    template.resource_count_is("AWS::ElasticLoadBalancingV2::LoadBalancer", 1)
+    services = template.find_resources("AWS::ECS::Service")
+    assert all(
+        service['Properties']['NetworkConfiguration']['AwsvpcConfiguration'][
+            'AssignPublicIp'] == 'ENABLED'
+        for service in services.values())
+
+
+def test_vpc_endpoints():
+    template = synth_template(VPC_ENDPOINTS='True')
+    template.has_resource_properties("AWS::EC2::VPCEndpoint", {
+        "VpcEndpointType": "Gateway",
+        "ServiceName": assertions.Match.any_value(),
+    })
+    template.resource_count_is("AWS::EC2::VPCEndpoint", 5)
+    for service in ('ecr.api', 'ecr.dkr', 'logs', 'secretsmanager'):
+        template.has_resource_properties("AWS::EC2::VPCEndpoint", {
+            "VpcEndpointType": "Interface",
+            "ServiceName": f'com.amazonaws.us-east-1.{service}',
+            "PrivateDnsEnabled": True,
+        })
+
 
-#     template.has_resource_properties("AWS::SQS::Queue", {
-#         "VisibilityTimeout": 300
-#     })
+def test_private_subnets_over_listener_quota_fails_synth():
+    with pytest.raises(ValueError):
+        synth_template(TASK_SUBNETS='private', NODE_PER_AZ='17')
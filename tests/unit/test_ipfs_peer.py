@@ -0,0 +1,22 @@
+from ipfs_cluster.ipfs_peer import (MAX_RESOURCES_PER_STACK, PEER_RESOURCES,
+                                    SWARM_LISTENER_RESOURCES,
+                                    kubo_resources_environment,
+                                    max_peers_per_stack)
+
+
+def test_max_peers_per_stack():
+    empty = max_peers_per_stack(0)
+    assert empty > 0
+    assert empty * PEER_RESOURCES < MAX_RESOURCES_PER_STACK
+    assert max_peers_per_stack(100) < empty
+    assert max_peers_per_stack(MAX_RESOURCES_PER_STACK) == 0
+    with_listener = max_peers_per_stack(
+        0, PEER_RESOURCES + SWARM_LISTENER_RESOURCES)
+    assert 0 < with_listener < empty
+
+
+def test_kubo_resources_environment():
+    assert kubo_resources_environment(1024, 3072) == {
+        'KUBO_TASK_CPU': '1024',
+        'KUBO_MEMORY_MIB': '3072',
+    }
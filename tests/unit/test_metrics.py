@@ -0,0 +1,35 @@
+import json
+
+from ipfs_cluster.metrics import (CLUSTER_METRICS_PORT,
+                                  cluster_metrics_environment,
+                                  get_adot_config)
+
+
+def test_adot_config_scrapes_kubo_and_cluster():
+    config = json.loads(get_adot_config('IpfsCluster1', 'IPFS', 'metrics'))
+    scrape_configs = config['receivers']['prometheus']['config']['scrape_configs']
+    assert [c['job_name'] for c in scrape_configs] == ['kubo', 'ipfs-cluster']
+    assert scrape_configs[0]['metrics_path'] == '/debug/metrics/prometheus'
+    assert all(c['static_configs'][0]['labels'] == {'peer': 'IpfsCluster1'}
+               for c in scrape_configs)
+
+    emf = config['exporters']['awsemf']
+    assert emf['namespace'] == 'IPFS'
+    assert emf['log_group_name'] == 'metrics'
+    selectors = emf['metric_declarations'][0]['metric_name_selectors']
+    assert '^(flatfs|s3|leveldb)_datastore_.*' in selectors
+    # The collector expands $ in its configuration
+    assert '$' not in json.dumps(config)
+
+
+def test_adot_config_gateway_only_scrapes_kubo():
+    config = json.loads(get_adot_config('IpfsKuboGateway', 'IPFS', 'metrics',
+                                        scrape_cluster=False))
+    scrape_configs = config['receivers']['prometheus']['config']['scrape_configs']
+    assert [c['job_name'] for c in scrape_configs] == ['kubo']
+
+
+def test_cluster_metrics_endpoint_matches_scrape_target():
+    environment = cluster_metrics_environment()
+    assert environment['CLUSTER_METRICS_PROMETHEUSENDPOINT'].endswith(
+        f'/tcp/{CLUSTER_METRICS_PORT}')
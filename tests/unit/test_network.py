@@ -0,0 +1,30 @@
+import pytest
+
+from ipfs_cluster.network import (MAX_SWARM_LISTENERS, NetworkConfig,
+                                  get_network_config, validate_network_config)
+
+
+def test_public_by_default():
+    config = get_network_config({'NAT_GATEWAYS': '2'})
+    assert config == NetworkConfig()
+    validate_network_config(config, MAX_SWARM_LISTENERS + 1)
+
+
+def test_private_subnets():
+    config = get_network_config({'TASK_SUBNETS': 'Private',
+                                 'NAT_GATEWAYS': '', 'VPC_ENDPOINTS': 'true'})
+    assert config == NetworkConfig(private_subnets=True, vpc_endpoints=True)
+    assert get_network_config({'TASK_SUBNETS': 'private',
+                               'NAT_GATEWAYS': '1'}).nat_gateways == 1
+    validate_network_config(config, MAX_SWARM_LISTENERS)
+    with pytest.raises(ValueError):
+        validate_network_config(config, MAX_SWARM_LISTENERS + 1)
+
+
+@pytest.mark.parametrize('env', [
+    {'TASK_SUBNETS': 'isolated'},
+    {'TASK_SUBNETS': 'private', 'NAT_GATEWAYS': '0'},
+])
+def test_invalid_settings(env):
+    with pytest.raises(ValueError):
+        get_network_config(env)
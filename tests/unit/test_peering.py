@@ -0,0 +1,84 @@
+import json
+import os
+import subprocess
+
+import pytest
+
+from ipfs_cluster.peering import (SERVER_PROFILE_ADDR_FILTERS,
+                                  gateway_peering_environment,
+                                  peering_hosts_environment,
+                                  server_addr_filters)
+
+CONFIG_PEERING = os.path.join(os.path.dirname(__file__),
+                              '..', '..', 'docker', '004-config_peering.sh')
+
+
+def test_server_addr_filters_leave_the_vpc_out():
+    filters = server_addr_filters('10.0.0.0/16')
+    assert '/ip4/10.0.0.0/ipcidr/8' not in filters
+    assert '/ip4/172.16.0.0/ipcidr/12' in filters
+    assert '/ip6/fc00::/ipcidr/7' in filters
+    assert len(filters) == len(SERVER_PROFILE_ADDR_FILTERS) - 1
+    assert '/ip4/192.168.0.0/ipcidr/16' not in \
+        server_addr_filters('192.168.10.0/24')
+
+
+def test_gateway_peering_environment():
+    environment = gateway_peering_environment('10.0.0.0/16')
+    assert json.loads(environment['KUBO_SWARM_ADDR_FILTERS']) == \
+        server_addr_filters('10.0.0.0/16')
+    assert environment['KUBO_PEERING_TIMEOUT_SECONDS'] == '30'
+    assert peering_hosts_environment(['a.ns', 'b.ns']) == {
+        'KUBO_PEERING_HOSTS': 'a.ns,b.ns'}
+
+
+@pytest.fixture
+def ipfs_config(tmp_path):
+    """Run the init script with an ipfs command recording its config calls
+    and a wget answering the RPC API of the hosts starting with 'up'."""
+    calls = tmp_path / 'calls'
+    ipfs = tmp_path / 'ipfs'
+    ipfs.write_text('#!/bin/sh\n'
+                    'shift\n'
+                    '[ "$1" = "--json" ] && shift\n'
+                    f'echo "$1=$2" >> {calls}\n')
+    ipfs.chmod(0o755)
+    wget = tmp_path / 'wget'
+    wget.write_text('#!/bin/sh\n'
+                    'for _arg; do _url="$_arg"; done\n'
+                    'case "$_url" in\n'
+                    '    http://up*) _host=${_url#http://}; '
+                    'echo "{\\"ID\\": \\"12D3Koo${_host%%.*}\\", '
+                    '\\"AgentVersion\\": \\"kubo\\"}" ;;\n'
+                    '    *) exit 1 ;;\n'
+                    'esac\n')
+    wget.chmod(0o755)
+
+    def run(**env):
+        subprocess.run(
+            ['sh', CONFIG_PEERING], check=True, capture_output=True,
+            env=dict(os.environ, PATH=f'{tmp_path}:{os.environ["PATH"]}',
+                     **env))
+        if not calls.exists():
+            return {}
+        return dict(line.split('=', 1)
+                    for line in calls.read_text().splitlines())
+
+    return run
+
+
+def test_script_without_hosts_leaves_the_config(ipfs_config):
+    assert ipfs_config() == {}
+
+
+def test_script_peers_with_the_nodes(ipfs_config):
+    environment = dict(gateway_peering_environment('10.0.0.0/16'),
+                       KUBO_PEERING_TIMEOUT_SECONDS='0')
+    config = ipfs_config(KUBO_PEERING_HOSTS='up0.ns,down1.ns,up2.ns',
+                         **environment)
+    assert json.loads(config['Swarm.AddrFilters']) == \
+        server_addr_filters('10.0.0.0/16')
+    assert json.loads(config['Peering.Peers']) == [
+        {'ID': '12D3Kooup0', 'Addrs': ['/dns4/up0.ns/tcp/4001']},
+        {'ID': '12D3Kooup2', 'Addrs': ['/dns4/up2.ns/tcp/4001']},
+    ]
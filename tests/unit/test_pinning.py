@@ -0,0 +1,97 @@
+import pytest
+
+from ipfs_cluster.pinning import (PINNING_PROFILES, PinningConfig,
+                                  get_pinning_config,
+                                  informer_tags_environment,
+                                  pinning_environment, pinning_profile)
+from ipfs_cluster.task_size import TASK_SIZE_PROFILES, TaskSize
+
+
+@pytest.mark.parametrize('profile', ['small', 'medium', 'large'])
+def test_profiles(profile):
+    config = get_pinning_config({}, profile, 3)
+    assert config == PINNING_PROFILES[profile]
+    assert config.replication_factor_min == -1
+
+
+def test_profiles_grow_with_the_task_size():
+    configs = [PINNING_PROFILES[p] for p in ['small', 'medium', 'large']]
+    assert configs == sorted(configs, key=lambda c: c.concurrent_pins)
+
+
+def test_custom_task_size_profile():
+    custom = TaskSize(2048, 8192, 1536, 4096, 512, 2048)
+    assert pinning_profile('custom', custom) == 'medium'
+    assert pinning_profile('custom', custom._replace(cpu=512)) == 'small'
+    assert pinning_profile('LARGE', TASK_SIZE_PROFILES['large']) == 'large'
+
+
+def test_overrides():
+    config = get_pinning_config({
+        'REPLICATION_FACTOR_MIN': '2',
+        'REPLICATION_FACTOR_MAX': '3',
+        'PINTRACKER_CONCURRENT_PINS': '15',
+        'PINTRACKER_MAX_PIN_QUEUE_SIZE': '',
+        'CRDT_BATCHING_MAX_BATCH_SIZE': '0',
+        'CRDT_BATCHING_MAX_BATCH_AGE_SECONDS': '0',
+        'ALLOCATOR_ALLOCATE_BY': 'tag:group, freespace',
+    }, 'small', 3)
+    assert config == PinningConfig(
+        replication_factor_min=2, replication_factor_max=3,
+        concurrent_pins=15, max_pin_queue_size=100000,
+        crdt_max_batch_size=0, crdt_max_batch_age_seconds=0,
+        allocate_by=('tag:group', 'freespace'))
+
+
+def test_crdt_batching_off_without_profile():
+    config = get_pinning_config({}, 'large', 3, crdt_batching=False)
+    assert config == PINNING_PROFILES['large']._replace(
+        crdt_max_batch_size=0, crdt_max_batch_age_seconds=0)
+    config = get_pinning_config({
+        'CRDT_BATCHING_MAX_BATCH_SIZE': '50',
+        'CRDT_BATCHING_MAX_BATCH_AGE_SECONDS': '2',
+    }, 'large', 3, crdt_batching=False)
+    assert (config.crdt_max_batch_size,
+            config.crdt_max_batch_age_seconds) == (50, 2)
+
+
+def test_pinning_environment():
+    environment = pinning_environment(PINNING_PROFILES['medium'])
+    assert environment == {
+        'CLUSTER_REPLICATIONFACTORMIN': '-1',
+        'CLUSTER_REPLICATIONFACTORMAX': '-1',
+        'CLUSTER_STATELESS_CONCURRENTPINS': '20',
+        'CLUSTER_STATELESS_MAXPINQUEUESIZE': '500000',
+        'CLUSTER_CRDT_BATCHING_MAXBATCHSIZE': '250',
+        'CLUSTER_CRDT_BATCHING_MAXBATCHAGE': '5s',
+        'CLUSTER_BALANCED_ALLOCATEBY': 'tag:az,freespace',
+    }
+    assert pinning_environment(PinningConfig(allocate_by=(
+        'pinqueue',)))['CLUSTER_BALANCED_ALLOCATEBY'] == 'pinqueue'
+
+
+def test_informer_tags_environment():
+    assert informer_tags_environment('us-east-1b') == {
+        'CLUSTER_TAGS_TAGS': 'group:default,az:us-east-1b'}
+
+
+@pytest.mark.parametrize('env', [
+    {'REPLICATION_FACTOR_MIN': '0', 'REPLICATION_FACTOR_MAX': '1'},
+    {'REPLICATION_FACTOR_MIN': '2', 'REPLICATION_FACTOR_MAX': '-1'},
+    {'REPLICATION_FACTOR_MIN': '3', 'REPLICATION_FACTOR_MAX': '2'},
+    {'REPLICATION_FACTOR_MIN': '4', 'REPLICATION_FACTOR_MAX': '4'},
+    {'PINTRACKER_CONCURRENT_PINS': '0'},
+    {'PINTRACKER_MAX_PIN_QUEUE_SIZE': '-5'},
+    {'CRDT_BATCHING_MAX_BATCH_SIZE': '0'},
+    {'CRDT_BATCHING_MAX_BATCH_AGE_SECONDS': '-1'},
+    {'ALLOCATOR_ALLOCATE_BY': 'disk'},
+    {'ALLOCATOR_ALLOCATE_BY': ' , '},
+])
+def test_invalid_settings(env):
+    with pytest.raises(ValueError):
+        get_pinning_config(env, 'small', 3)
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        get_pinning_config({}, 'custom', 3)
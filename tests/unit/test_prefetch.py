@@ -0,0 +1,86 @@
+import gzip
+import io
+
+import pytest
+
+from ipfs_cluster.prefetch import (MAX_PREFETCH_CIDS_BYTES, PrefetchConfig,
+                                   get_prefetch_config, hot_paths, main,
+                                   prefetch_environment, read_cloudfront_log,
+                                   write_prefetch_env_file)
+
+LOG = """#Version: 1.0
+#Fields: date time x-edge-location sc-bytes c-ip cs-method cs(Host) cs-uri-stem sc-status cs(Referer)
+2026-10-01\t00:00:01\tIAD89-C1\t100\t1.2.3.4\tGET\td1.cloudfront.net\t/ipfs/bafyA\t200\t-
+2026-10-01\t00:00:02\tIAD89-C1\t100\t1.2.3.4\tGET\td1.cloudfront.net\t/ipfs/bafyB/index.html\t200\t-
+2026-10-01\t00:00:03\tIAD89-C1\t100\t1.2.3.4\tGET\td1.cloudfront.net\t/ipfs/bafyA\t304\t-
+2026-10-01\t00:00:04\tIAD89-C1\t100\t1.2.3.4\tGET\td1.cloudfront.net\t/ipfs/bafyC\t504\t-
+2026-10-01\t00:00:05\tIAD89-C1\t100\t1.2.3.4\tGET\td1.cloudfront.net\t/favicon.ico\t200\t-
+"""
+
+
+def test_disabled_by_default():
+    assert get_prefetch_config({}) is None
+    assert get_prefetch_config({'KUBO_PREFETCH': 'OFF'}) is None
+
+
+def test_config():
+    config = get_prefetch_config({
+        'KUBO_PREFETCH': 'all',
+        'KUBO_PREFETCH_S3_OBJECT': 's3://my-bucket/warm/hot-cids.env',
+        'KUBO_PREFETCH_LIST': '/ipns/hot.example.com',
+        'KUBO_PREFETCH_CONCURRENCY': '16',
+        'KUBO_PREFETCH_TIMEOUT_SECONDS': '',
+    })
+    assert config == PrefetchConfig(
+        tasks='all', s3_bucket='my-bucket', s3_key='warm/hot-cids.env',
+        ipfs_list='/ipns/hot.example.com', concurrency=16)
+    assert config.health_check_start_period_seconds <= 300
+    assert prefetch_environment(config) == {
+        'KUBO_PREFETCH': 'true',
+        'KUBO_PREFETCH_CONCURRENCY': '16',
+        'KUBO_PREFETCH_MAX_CIDS': '1000',
+        'KUBO_PREFETCH_TIMEOUT_SECONDS': '180',
+        'KUBO_PREFETCH_LIST': '/ipns/hot.example.com',
+    }
+
+
+@pytest.mark.parametrize('env', [
+    {'KUBO_PREFETCH': 'peers', 'KUBO_PREFETCH_LIST': '/ipfs/bafyA'},
+    {'KUBO_PREFETCH': 'gateway'},
+    {'KUBO_PREFETCH': 'gateway', 'KUBO_PREFETCH_S3_OBJECT': 's3://b/hot.txt'},
+    {'KUBO_PREFETCH': 'gateway', 'KUBO_PREFETCH_LIST': 'bafyA'},
+    {'KUBO_PREFETCH': 'gateway', 'KUBO_PREFETCH_LIST': '/ipfs/bafyA',
+     'KUBO_PREFETCH_TIMEOUT_SECONDS': '241'},
+    {'KUBO_PREFETCH': 'gateway', 'KUBO_PREFETCH_LIST': '/ipfs/bafyA',
+     'KUBO_PREFETCH_CONCURRENCY': '0'},
+])
+def test_invalid_settings(env):
+    with pytest.raises(ValueError):
+        get_prefetch_config(env)
+
+
+def test_hot_paths_from_cloudfront_log():
+    paths = list(read_cloudfront_log(io.StringIO(LOG)))
+    assert paths == ['/ipfs/bafyA', '/ipfs/bafyB/index.html', '/ipfs/bafyA']
+    assert hot_paths(paths, 1) == ['/ipfs/bafyA']
+
+
+def test_env_file_fits_in_one_variable():
+    output = io.StringIO()
+    paths = [f'/ipfs/bafy{i:060d}' for i in range(5000)]
+    count = write_prefetch_env_file(paths, output)
+    assert 0 < count < len(paths)
+    line = output.getvalue()
+    assert line.startswith('KUBO_PREFETCH_CIDS=/ipfs/bafy')
+    assert len(line) <= MAX_PREFETCH_CIDS_BYTES + 1
+    assert len(line.split('=', 1)[1].split()) == count
+
+
+def test_main(tmp_path, capsys):
+    log = tmp_path / 'E2ABC.2026-10-01-00.abcd.gz'
+    with gzip.open(log, 'wt') as f:
+        f.write(LOG)
+
+    assert main([str(log), '--top', '2']) == 0
+    assert capsys.readouterr().out == \
+        'KUBO_PREFETCH_CIDS=/ipfs/bafyA /ipfs/bafyB/index.html\n'
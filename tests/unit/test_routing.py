@@ -0,0 +1,45 @@
+import pytest
+
+from ipfs_cluster.routing import (RoutingConfig, get_routing_config,
+                                  routing_environment,
+                                  routing_task_size_warning)
+from ipfs_cluster.task_size import TASK_SIZE_PROFILES
+
+
+def test_standard_by_default():
+    config = get_routing_config({'KUBO_REPROVIDER_STRATEGY': ''})
+    assert config == RoutingConfig()
+    assert routing_environment(config) == {
+        'KUBO_ACCELERATED_DHT_CLIENT': 'false'}
+    assert routing_task_size_warning(config, 768, 1536) is None
+
+
+def test_accelerated():
+    config = get_routing_config({'KUBO_ROUTING_PROFILE': 'Accelerated',
+                                 'KUBO_REPROVIDER_STRATEGY': 'Roots'})
+    assert config == RoutingConfig(accelerated_dht_client=True,
+                                   reprovider_strategy='roots')
+    assert routing_environment(config) == {
+        'KUBO_ACCELERATED_DHT_CLIENT': 'true',
+        'KUBO_REPROVIDER_STRATEGY': 'roots',
+    }
+
+
+@pytest.mark.parametrize('profile,warns', [
+    ('small', True), ('medium', True), ('large', False),
+])
+def test_task_size_warning(profile, warns):
+    size = TASK_SIZE_PROFILES[profile]
+    warning = routing_task_size_warning(
+        RoutingConfig(accelerated_dht_client=True), size.kubo_cpu,
+        size.memory_limit_mib - size.cluster_memory_reservation_mib)
+    assert (warning is not None) == warns
+
+
+@pytest.mark.parametrize('env', [
+    {'KUBO_ROUTING_PROFILE': 'fast'},
+    {'KUBO_REPROVIDER_STRATEGY': 'everything'},
+])
+def test_invalid_settings(env):
+    with pytest.raises(ValueError):
+        get_routing_config(env)
@@ -0,0 +1,103 @@
+import os
+import subprocess
+
+import pytest
+
+from ipfs_cluster.swarm import (SwarmConfig, get_swarm_config,
+                                swarm_announce_environment, swarm_environment,
+                                swarm_listener_port)
+
+CONFIG_SWARM = os.path.join(os.path.dirname(__file__),
+                            '..', '..', 'docker', '003-config_swarm.sh')
+
+
+def test_tcp_by_default():
+    config = get_swarm_config({})
+    assert config == SwarmConfig(transports=('tcp',))
+    assert not config.udp
+    assert swarm_environment(config) == {
+        'KUBO_SWARM_TRANSPORTS': 'tcp',
+        'KUBO_SWARM_ANNOUNCE_PUBLIC_IP': 'true',
+    }
+
+
+def test_quic():
+    config = get_swarm_config(
+        {'KUBO_SWARM_TRANSPORTS': ' TCP, quic,webtransport,quic '},
+        announce_public_ip=False)
+    assert config.transports == ('tcp', 'quic', 'webtransport')
+    assert config.udp
+    assert swarm_environment(config) == {
+        'KUBO_SWARM_TRANSPORTS': 'tcp,quic,webtransport',
+        'KUBO_SWARM_ANNOUNCE_PUBLIC_IP': 'false',
+    }
+
+
+@pytest.mark.parametrize('transports', [
+    'tcp,websocket', 'quic', 'tcp,webtransport',
+])
+def test_invalid_transports(transports):
+    with pytest.raises(ValueError):
+        get_swarm_config({'KUBO_SWARM_TRANSPORTS': transports})
+
+
+@pytest.fixture
+def ipfs_config(tmp_path):
+    """Run the init script with an ipfs command recording its config calls."""
+    calls = tmp_path / 'calls'
+    ipfs = tmp_path / 'ipfs'
+    ipfs.write_text('#!/bin/sh\n'
+                    'shift\n'
+                    '[ "$1" = "--json" ] && shift\n'
+                    f'echo "$1=$2" >> {calls}\n')
+    ipfs.chmod(0o755)
+
+    def run(**env):
+        subprocess.run(
+            ['sh', CONFIG_SWARM], check=True, capture_output=True,
+            env=dict(os.environ, PATH=f'{tmp_path}:{os.environ["PATH"]}',
+                     **env))
+        return dict(line.split('=', 1)
+                    for line in calls.read_text().splitlines())
+
+    return run
+
+
+def test_script_tcp_only(ipfs_config):
+    config = ipfs_config()
+    assert config['Addresses.Swarm'] == \
+        '["/ip4/0.0.0.0/tcp/4001", "/ip6/::/tcp/4001"]'
+    assert config['Swarm.Transports.Network.QUIC'] == 'false'
+    assert config['Swarm.Transports.Network.WebTransport'] == 'false'
+    assert config['Addresses.AppendAnnounce'] == '[]'
+
+
+def test_script_announces_public_ip(ipfs_config):
+    config = ipfs_config(KUBO_SWARM_TRANSPORTS='tcp,quic,webtransport',
+                         KUBO_SWARM_PUBLIC_IP='203.0.113.7')
+    assert '"/ip6/::/udp/4001/quic-v1"' in config['Addresses.Swarm']
+    assert config['Swarm.Transports.Network.QUIC'] == 'true'
+    assert config['Swarm.Transports.Network.WebTransport'] == 'true'
+    assert config['Addresses.AppendAnnounce'] == (
+        '["/ip4/203.0.113.7/tcp/4001", '
+        '"/ip4/203.0.113.7/udp/4001/quic-v1", '
+        '"/ip4/203.0.113.7/udp/4001/quic-v1/webtransport"]')
+
+
+def test_script_without_public_ip(ipfs_config):
+    # The lookup URL does not answer: AutoNAT finds the addresses later
+    config = ipfs_config(KUBO_SWARM_TRANSPORTS='tcp,quic',
+                         KUBO_SWARM_ANNOUNCE_PUBLIC_IP='true',
+                         KUBO_SWARM_PUBLIC_IP_URL='http://127.0.0.1:9/')
+    assert config['Addresses.AppendAnnounce'] == '[]'
+
+
+def test_script_announces_load_balancer(ipfs_config):
+    environment = swarm_announce_environment('swarm.elb.amazonaws.com',
+                                             swarm_listener_port(2))
+    config = ipfs_config(KUBO_SWARM_TRANSPORTS='tcp,quic',
+                         KUBO_SWARM_ANNOUNCE_PUBLIC_IP='false', **environment)
+    assert '"/ip4/0.0.0.0/udp/4001/quic-v1"' in config['Addresses.Swarm']
+    assert config['Addresses.AppendAnnounce'] == (
+        '["/dns4/swarm.elb.amazonaws.com/tcp/4003", '
+        '"/dns4/swarm.elb.amazonaws.com/udp/4003/quic-v1"]')
@@ -0,0 +1,56 @@
+import pytest
+
+from ipfs_cluster.task_size import (
+    TASK_SIZE_PROFILES,
+    TaskSize,
+    get_task_size,
+    validate_task_size,
+)
+
+CUSTOM_ENV = {
+    'TASK_CPU': '2048',
+    'TASK_MEMORY_MIB': '16384',
+    'KUBO_CPU': '1536',
+    'KUBO_MEMORY_RESERVATION_MIB': '8192',
+    'CLUSTER_CPU': '512',
+    'CLUSTER_MEMORY_RESERVATION_MIB': '6144',
+}
+
+
+@pytest.mark.parametrize('profile', sorted(TASK_SIZE_PROFILES))
+def test_profiles_are_valid(profile):
+    validate_task_size(TASK_SIZE_PROFILES[profile])
+
+
+def test_small_is_historical_size():
+    task_size = get_task_size({}, 'Small')
+    assert (task_size.cpu, task_size.memory_limit_mib) == (1024, 2048)
+    assert task_size.ephemeral_storage_gib is None
+
+
+def test_custom_profile():
+    task_size = get_task_size(
+        dict(CUSTOM_ENV, TASK_EPHEMERAL_STORAGE_GIB='100'), 'custom')
+    assert task_size == TaskSize(2048, 16384, 1536, 8192, 512, 6144, 100)
+
+
+def test_ephemeral_storage_applies_to_presets():
+    task_size = get_task_size({'TASK_EPHEMERAL_STORAGE_GIB': '200'}, 'large')
+    assert task_size.ephemeral_storage_gib == 200
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError, match='Unknown task size profile'):
+        get_task_size({}, 'huge')
+
+
+@pytest.mark.parametrize('override, match', [
+    ({'TASK_CPU': '3072'}, 'Invalid Fargate task cpu'),
+    ({'TASK_MEMORY_MIB': '2048'}, 'Invalid Fargate task memory'),
+    ({'KUBO_CPU': '2048'}, 'cpu exceed the task cpu'),
+    ({'KUBO_MEMORY_RESERVATION_MIB': '12288'}, 'memory reservations exceed'),
+    ({'TASK_EPHEMERAL_STORAGE_GIB': '500'}, 'Invalid Fargate ephemeral storage'),
+])
+def test_invalid_custom_profile(override, match):
+    with pytest.raises(ValueError, match=match):
+        get_task_size(dict(CUSTOM_ENV, **override), 'custom')